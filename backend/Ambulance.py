@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, List, Any
+from typing import Optional
 
 class Ambulance(BaseModel):
   model_config = ConfigDict(from_attributes=True)
@@ -13,7 +13,6 @@ class Ambulance(BaseModel):
   driver_id: Optional[int] = None
   base_hospital_id: Optional[int] = None
   available_at: Optional[str] = None
-  route_to_assigned_unit: Optional[List[Any]] = None
 
 class AmbulanceUpdate(BaseModel):
   id: int
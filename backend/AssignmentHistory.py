@@ -0,0 +1,214 @@
+import json
+from datetime import datetime
+from sqlalchemy import event, inspect, select, insert, update, delete, or_, func, text
+from models import IncidentDB, AmbulanceDB, IncidentAssignmentDB
+
+_table = IncidentAssignmentDB.__table__
+
+RELEASED = "released"
+UNASSIGNED = "unassigned"
+RESOLVED = "resolved"
+RECONCILED = "reconciled"
+
+
+class AssignmentHistory:
+    """
+    Keeps incident_assignments in step with IncidentDB.assigned_units. A row is opened when
+    a unit is dispatched to an incident and closed (released_at, release_reason) when the
+    ambulance becomes available again, is taken off the incident or the incident is resolved.
+    Dispatches add the row themselves with open(), carrying the unit's routes; units assigned
+    by hand get one from the flush. Closed rows stay as the dispatch history; they only go
+    away with their incident.
+    """
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.open_statuses = [statuses.ACTIVE, statuses.QUEUED, statuses.ASSIGNED]
+
+    def _changed(self, obj, *columns):
+        state = inspect(obj)
+        return any(state.attrs[column].history.has_changes() for column in columns)
+
+    def track(self, session_factory):
+        """Open and close assignment rows in the flush that dispatches, releases or resolves."""
+
+        @event.listens_for(session_factory, "after_flush")
+        def update_assignments(session, flush_context):
+            now = datetime.now()
+            conn = None
+            # Units dispatched in this flush: they get a new row even if they served the incident before
+            dispatched = set()
+            for ambulance in session.dirty:
+                if isinstance(ambulance, AmbulanceDB) and self._changed(ambulance, "status"):
+                    conn = conn or session.connection()
+                    if ambulance.status == self.statuses.BUSY:
+                        dispatched.add(ambulance.id)
+                    elif ambulance.status == self.statuses.AVAILABLE:
+                        conn.execute(update(_table).where(
+                            _table.c.ambulance_id == ambulance.id, _table.c.released_at.is_(None),
+                        ).values(released_at=now, release_reason=RELEASED))
+
+            for incident in session.deleted:
+                if isinstance(incident, IncidentDB):
+                    conn = conn or session.connection()
+                    conn.execute(delete(_table).where(_table.c.incident_id == incident.id))
+
+            incidents = [obj for obj in session.new if isinstance(obj, IncidentDB)]
+            incidents += [
+                obj for obj in session.dirty
+                if isinstance(obj, IncidentDB) and self._changed(obj, "assigned_units", "status")
+            ]
+            for incident in incidents:
+                conn = conn or session.connection()
+                units = set(incident.assigned_units or [])
+                rows = conn.execute(
+                    select(_table.c.ambulance_id, _table.c.released_at).where(_table.c.incident_id == incident.id)
+                ).all()
+                known = {ambulance_id for ambulance_id, _ in rows}
+                open_units = {ambulance_id for ambulance_id, released_at in rows if released_at is None}
+
+                if incident.status == self.statuses.RESOLVED:
+                    closing, reason, opening = open_units, RESOLVED, set()
+                else:
+                    closing, reason = open_units - units, UNASSIGNED
+                    opening = {unit for unit in units - open_units if unit not in known or unit in dispatched}
+                if closing:
+                    conn.execute(update(_table).where(
+                        _table.c.incident_id == incident.id, _table.c.ambulance_id.in_(closing),
+                        _table.c.released_at.is_(None),
+                    ).values(released_at=now, release_reason=reason))
+                if opening:
+                    conn.execute(insert(_table), [
+                        {"incident_id": incident.id, "ambulance_id": unit, "assigned_at": now} for unit in opening
+                    ])
+
+    def open(self, incident_id, ambulance_id, route_to_incident=None, route_to_hospital=None):
+        """Row of a unit being dispatched, with its encoded routes. Add it in the dispatching session."""
+        return IncidentAssignmentDB(
+            incident_id=incident_id, ambulance_id=ambulance_id, assigned_at=datetime.now(),
+            route_to_incident=route_to_incident, route_to_hospital=route_to_hospital,
+        )
+
+    async def record_arrival(self, db, ambulance_id, incident_id, column):
+        """Stamp arrived_at_incident or arrived_at_hospital on the unit's open row."""
+        await db.execute(update(_table).where(
+            _table.c.ambulance_id == ambulance_id, _table.c.incident_id == incident_id,
+            _table.c.released_at.is_(None),
+        ).values({column: datetime.now()}))
+
+    async def current_incident(self, db, ambulance_id):
+        """The open incident an ambulance is assigned to, or None. Served by the (ambulance_id, released_at) index."""
+        return await db.scalar(select(IncidentDB).join(_table, _table.c.incident_id == IncidentDB.id).where(
+            _table.c.ambulance_id == ambulance_id,
+            _table.c.released_at.is_(None),
+            IncidentDB.status.in_(self.open_statuses),
+        ).order_by(_table.c.assigned_at.desc()).limit(1))
+
+    async def routes(self, db, incident_id):
+        """Encoded routes of the incident's units keyed by ambulance id; a unit sent twice keeps its last ones."""
+        rows = await db.execute(select(
+            _table.c.ambulance_id, _table.c.route_to_incident, _table.c.route_to_hospital,
+        ).where(_table.c.incident_id == incident_id).order_by(_table.c.id))
+        to_incident, to_hospital = {}, {}
+        for ambulance_id, route_to_incident, route_to_hospital in rows:
+            to_incident[str(ambulance_id)] = route_to_incident
+            to_hospital[str(ambulance_id)] = route_to_hospital
+        return to_incident, to_hospital
+
+    def _active(self):
+        """Open assignment of the outer query's ambulance on an incident that is still open."""
+        return select(_table.c.id).join(IncidentDB, IncidentDB.id == _table.c.incident_id).where(
+            _table.c.ambulance_id == AmbulanceDB.id,
+            _table.c.released_at.is_(None),
+            IncidentDB.status.in_(self.open_statuses),
+        ).exists()
+
+    async def zombie_ambulances(self, db):
+        """Ids of BUSY ambulances without an open assignment, in one query."""
+        return (await db.scalars(select(AmbulanceDB.id).where(
+            AmbulanceDB.status == self.statuses.BUSY, ~self._active(),
+        ))).all()
+
+    async def close_stale(self, db):
+        """Close open rows whose incident is gone or closed or whose ambulance is not busy. Returns how many."""
+        incident_open = select(IncidentDB.id).where(
+            IncidentDB.id == _table.c.incident_id, IncidentDB.status.in_(self.open_statuses),
+        ).exists()
+        ambulance_busy = select(AmbulanceDB.id).where(
+            AmbulanceDB.id == _table.c.ambulance_id, AmbulanceDB.status == self.statuses.BUSY,
+        ).exists()
+        result = await db.execute(update(_table).where(
+            _table.c.released_at.is_(None), or_(~incident_open, ~ambulance_busy),
+        ).values(released_at=datetime.now(), release_reason=RECONCILED))
+        return result.rowcount
+
+    def backfill(self, db):
+        """
+        Build the rows of incidents dispatched before the table existed. Open incidents keep
+        the units that are still busy; the rest is recorded as history. Returns the rows written.
+        """
+        busy = {ambulance_id for ambulance_id, in db.query(AmbulanceDB.id).filter(
+            AmbulanceDB.status == self.statuses.BUSY
+        )}
+        rows = []
+        incidents = db.query(
+            IncidentDB.id, IncidentDB.status, IncidentDB.assigned_units, IncidentDB.started_at, IncidentDB.ended_at,
+        ).filter(IncidentDB.assigned_units.isnot(None))
+        for incident_id, status, units, started_at, ended_at in incidents:
+            for unit in units or []:
+                row = {
+                    "incident_id": incident_id, "ambulance_id": unit, "assigned_at": started_at,
+                    "released_at": None, "release_reason": None,
+                }
+                if status == self.statuses.RESOLVED:
+                    row.update(released_at=ended_at or started_at, release_reason=RESOLVED)
+                elif status not in self.open_statuses or unit not in busy:
+                    row.update(released_at=started_at, release_reason=RELEASED)
+                rows.append(row)
+        if rows:
+            db.execute(insert(_table), rows)
+        db.commit()
+        return len(rows)
+
+    def migrate_routes(self, db, store_route):
+        """
+        Move the routes incidents kept in their route_to_incident/route_to_hospital JSON
+        columns onto the rows of the units they belong to (the last row of each unit), and
+        clear the columns. Coordinate arrays are encoded with store_route on the way.
+        Routes of units no longer on the incident are dropped. Returns the incidents moved.
+        """
+        columns = {column["name"] for column in inspect(db.bind).get_columns("incidents")}
+        if not {"route_to_incident", "route_to_hospital"} <= columns:
+            return 0
+        legacy = db.execute(text(
+            "SELECT id, route_to_incident, route_to_hospital FROM incidents"
+            " WHERE route_to_incident IS NOT NULL OR route_to_hospital IS NOT NULL"
+        )).all()
+        for incident_id, to_incident, to_hospital in legacy:
+            latest = dict(db.execute(
+                select(_table.c.ambulance_id, func.max(_table.c.id))
+                .where(_table.c.incident_id == incident_id).group_by(_table.c.ambulance_id)
+            ).all())
+            legs = {"route_to_incident": _load_json(to_incident), "route_to_hospital": _load_json(to_hospital)}
+            for ambulance_id, row_id in latest.items():
+                values = {}
+                for column, routes in legs.items():
+                    route = routes.get(str(ambulance_id))
+                    if route:
+                        values[column] = route if isinstance(route, str) else store_route(route)
+                if values:
+                    db.execute(update(_table).where(_table.c.id == row_id).values(**values))
+        if legacy:
+            db.execute(text(
+                "UPDATE incidents SET route_to_incident = NULL, route_to_hospital = NULL"
+                " WHERE route_to_incident IS NOT NULL OR route_to_hospital IS NOT NULL"
+            ))
+        db.commit()
+        return len(legacy)
+
+
+def _load_json(value):
+    """Routes of a legacy JSON column: a dict, or the JSON text of one when read through text()."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value or {}
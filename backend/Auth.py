@@ -0,0 +1,137 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt costs 100-300ms of CPU per call. It runs on this many threads (bcrypt releases
+# the GIL), so logins queue up there instead of stalling the event loop.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+# Without a configured secret tokens are signed with a random key and die with the process
+SESSION_SECRET = os.getenv("SESSION_SECRET", "").encode() or secrets.token_bytes(32)
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "12"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def hash_password(password: str):
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str):
+    if not plain_password or not hashed_password:
+        return False
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _bcrypt_pool, pwd_context.verify, plain_password, hashed_password
+        )
+    except ValueError:
+        # Not a hash passlib knows
+        return False
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def password_fingerprint(hashed_password):
+    """Signed into tokens, so changing the password invalidates the sessions issued before."""
+    return hashlib.sha256((hashed_password or "").encode()).hexdigest()[:16]
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(SESSION_SECRET, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user):
+    """Signed session token for a user who just logged in. Returns (token, expiry as a unix time)."""
+    expires_at = int(time.time() + SESSION_TTL_HOURS * 3600)
+    payload = _b64encode(json.dumps({
+        "uid": user.id, "role": user.role, "exp": expires_at, "pwd": password_fingerprint(user.password),
+    }, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}", expires_at
+
+
+def read_token(token):
+    """The payload of a token with a valid signature that has not expired, else None."""
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+class Session:
+    __slots__ = ("user_id", "role", "expires_at")
+
+    def __init__(self, user_id, role, expires_at):
+        self.user_id = user_id
+        self.role = role
+        self.expires_at = expires_at
+
+
+class SessionCache:
+    """
+    Tokens already checked against the users table, so a request carrying one is a dict
+    lookup. Entries of a user are dropped when their password or role changes.
+    """
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE):
+        self.max_size = max_size
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None or session.expires_at < time.time():
+                if session is not None:
+                    del self._sessions[token]
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(token)
+            self.hits += 1
+            return session
+
+    def put(self, token, session):
+        with self._lock:
+            self._sessions[token] = session
+            self._sessions.move_to_end(token)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            for token in [token for token, session in self._sessions.items() if session.user_id == user_id]:
+                del self._sessions[token]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._sessions),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
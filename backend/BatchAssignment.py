@@ -0,0 +1,167 @@
+import math
+
+# Severity 1 is the most critical. A minute of delay at a severity 1 incident
+# costs as much as eight minutes at a severity 4 one.
+SEVERITY_WEIGHTS = {1: 8, 2: 4, 3: 2, 4: 1}
+
+# Cost of leaving a unit slot unserved in this round, in weighted seconds.
+# Ambulances further away than this are not worth sending, the incident waits instead.
+UNSERVED_PENALTY_SECONDS = 2 * 3600
+
+UNREACHABLE = 1e12
+
+
+def severity_weight(severity):
+    return SEVERITY_WEIGHTS.get(severity, 1)
+
+
+def hungarian(cost):
+    """
+    Minimum cost assignment for a rectangular matrix with no more rows than columns.
+    Returns the column chosen for every row.
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    inf = float("inf")
+    # Potentials and matching are 1-indexed, column 0 is the virtual start
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                cur = row[j - 1] - ui0 - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            assignment[match[j] - 1] = j - 1
+    return assignment
+
+
+def _solve_slots(slots, incidents, durations, n_ambulances):
+    """One assignment round: every slot gets an ambulance index, or None when left unserved."""
+    cost = []
+    for i in slots:
+        weight = severity_weight(incidents[i][0])
+        row = []
+        for a in range(n_ambulances):
+            duration = durations[a][i]
+            row.append(weight * duration if duration is not None else UNREACHABLE)
+        # One "unserved" column per slot so every row can always be matched
+        row.extend([weight * UNSERVED_PENALTY_SECONDS] * len(slots))
+        cost.append(row)
+
+    columns = hungarian(cost)
+    return [
+        a if a < n_ambulances and cost[r][a] < UNREACHABLE else None
+        for r, a in enumerate(columns)
+    ]
+
+
+def solve_assignment(incidents, capacities, durations, max_rounds=10):
+    """
+    Severity-weighted assignment of ambulances to incidents.
+
+    incidents: (severity, patients) per incident.
+    capacities: patient capacity per ambulance.
+    durations: durations[a][i] in seconds from ambulance a to incident i, None if unreachable.
+
+    Each incident is split into unit "slots", starting from the fewest units that could
+    carry its patients. After each round incidents left short of capacity get another
+    slot while ambulances are still free, and the whole assignment is solved again.
+    Returns the list of assigned ambulance indices per incident, closest first.
+    """
+    if not incidents or not capacities:
+        return [[] for _ in incidents]
+
+    max_capacity = max(capacities) or 1
+    slot_counts = [max(1, math.ceil((patients or 1) / max_capacity)) for _, patients in incidents]
+
+    for _ in range(max_rounds):
+        slots = [i for i, count in enumerate(slot_counts) for _ in range(count)]
+        chosen = _solve_slots(slots, incidents, durations, len(capacities))
+
+        plan = [[] for _ in incidents]
+        unserved = set()
+        for i, a in zip(slots, chosen):
+            if a is None:
+                unserved.add(i)
+            else:
+                plan[i].append(a)
+
+        free = len(capacities) - sum(len(units) for units in plan)
+        grown = False
+        for i, (_, patients) in enumerate(incidents):
+            if free <= 0:
+                break
+            covered = sum(capacities[a] for a in plan[i])
+            if i not in unserved and covered < (patients or 1):
+                slot_counts[i] += 1
+                free -= 1
+                grown = True
+        if not grown:
+            break
+
+    for i, units in enumerate(plan):
+        units.sort(key=lambda a: durations[a][i])
+    return plan
+
+
+def greedy_assignment(incidents, capacities, durations):
+    """
+    The one-incident-at-a-time strategy: incidents in priority order each take the
+    closest free ambulances until their patients are covered.
+    """
+    order = sorted(range(len(incidents)), key=lambda i: incidents[i][0])
+    free = set(range(len(capacities)))
+    plan = [[] for _ in incidents]
+    for i in order:
+        patients = incidents[i][1] or 1
+        reachable = sorted(
+            (a for a in free if durations[a][i] is not None),
+            key=lambda a: durations[a][i]
+        )
+        covered = 0
+        for a in reachable:
+            if covered >= patients:
+                break
+            plan[i].append(a)
+            free.discard(a)
+            covered += capacities[a]
+    return plan
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class BootSequence:
+    """
+    Timings of the startup phases. The API accepts requests once the essential state is
+    loaded; the other phases run in the background and the app is ready (/health/ready)
+    when every required phase has finished.
+    """
+
+    def __init__(self, required=()):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.required = set(required)
+        self.ready_after_ms = None
+
+    def _ms(self, since):
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    @property
+    def ready(self):
+        return all(self.phases.get(name, {}).get("status") == "done" for name in self.required)
+
+    @asynccontextmanager
+    async def phase(self, name):
+        started = time.perf_counter()
+        self.phases[name] = {"status": "running", "started_at_ms": self._ms(self.started)}
+        try:
+            yield
+        except Exception as e:
+            self.phases[name].update(status="failed", duration_ms=self._ms(started), error=str(e))
+            logger.error(f"Boot phase '{name}' failed after {self._ms(started)}ms: {e}")
+            raise
+        self.phases[name].update(status="done", duration_ms=self._ms(started))
+        logger.info(f"Boot phase '{name}' done in {self._ms(started)}ms")
+        if self.ready_after_ms is None and self.ready:
+            self.ready_after_ms = self._ms(self.started)
+            logger.info(f"Ready {self.ready_after_ms}ms after boot")
+
+    def background(self, name, work, *args, after=()):
+        """Run work(*args) as a phase in its own task, once the `after` tasks have finished."""
+        self.phases[name] = {"status": "waiting"}
+
+        async def run():
+            await asyncio.gather(*after, return_exceptions=True)
+            try:
+                async with self.phase(name):
+                    await work(*args)
+            except Exception:
+                pass  # logged and recorded by phase()
+
+        return asyncio.create_task(run())
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "ready_after_ms": self.ready_after_ms,
+            "uptime_seconds": round(time.perf_counter() - self.started, 1),
+            "phases": self.phases,
+        }
@@ -0,0 +1,115 @@
+import hashlib
+from datetime import datetime
+from threading import Lock
+from sqlalchemy import event, func
+from models import IncidentDB, AmbulanceDB, HospitalDB, EmergencyCentersDB, PatientDB, UserDB, TombstoneDB
+
+VERSIONED = {
+    "incidents": IncidentDB,
+    "ambulances": AmbulanceDB,
+    "hospitals": HospitalDB,
+    "emergency_centers": EmergencyCentersDB,
+    "patients": PatientDB,
+    "users": UserDB,
+}
+
+_TABLE_BY_MODEL = {model: table for table, model in VERSIONED.items()}
+
+
+class ChangeVersions:
+    """
+    One counter shared by every entity table. Each insert or update stamps the row with
+    the next value and each delete leaves a tombstone with it, so "what changed since
+    version N" is a single indexed query per table.
+
+    Rows are stamped when they are flushed, which is not the order transactions commit in,
+    so the version handed to readers stops below any version whose transaction is still open.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = 0
+        self._latest = dict.fromkeys(VERSIONED, 0)
+        # version -> table, for the versions stamped by transactions that have not ended yet
+        self._open = {}
+
+    def load(self, db):
+        """Pick up where the counter was before a restart."""
+        latest = {}
+        for table, model in VERSIONED.items():
+            rows = db.query(func.max(model.version)).scalar() or 0
+            deleted = db.query(func.max(TombstoneDB.version)).filter(TombstoneDB.table_name == table).scalar() or 0
+            latest[table] = max(rows, deleted)
+        with self._lock:
+            self._latest = latest
+            self._version = max(latest.values())
+
+    def next(self, table, session=None):
+        """The next version. Stamped in a session, it is held open until the session's transaction ends."""
+        with self._lock:
+            self._version += 1
+            self._latest[table] = self._version
+            if session is not None:
+                self._open[self._version] = table
+                session.info.setdefault("open_versions", []).append(self._version)
+            return self._version
+
+    def latest(self, table):
+        """
+        The version a reader of the table can resume from: every change up to it is committed
+        or rolled back. A transaction that flushed early and commits late holds it back, so a
+        `since` client never moves past rows that are not visible yet.
+        """
+        with self._lock:
+            held = [version for version, name in self._open.items() if name == table]
+            return min(self._latest[table], min(held) - 1) if held else self._latest[table]
+
+    def etag(self, table, shape=None):
+        """
+        Weak ETag of the table's latest version. `shape` (the query's parameters) keeps
+        responses of differently filtered or projected requests from sharing a validator.
+        """
+        if shape is None:
+            return f'W/"{table}-{self.latest(table)}"'
+        digest = hashlib.sha1(repr(shape).encode()).hexdigest()[:12]
+        return f'W/"{table}-{self.latest(table)}-{digest}"'
+
+    def _close(self, versions):
+        with self._lock:
+            for version in versions:
+                self._open.pop(version, None)
+
+    def track(self, session_factory):
+        """
+        Stamp the rows a session is about to write and record tombstones for its deletes.
+        The versions are released to readers when the session's transaction ends.
+        """
+
+        @event.listens_for(session_factory, "before_flush")
+        def stamp_versions(session, flush_context, instances):
+            for row in list(session.new):
+                table = _TABLE_BY_MODEL.get(type(row))
+                if table:
+                    row.version = self.next(table, session)
+            for row in list(session.dirty):
+                table = _TABLE_BY_MODEL.get(type(row))
+                if table and session.is_modified(row):
+                    row.version = self.next(table, session)
+            for row in list(session.deleted):
+                table = _TABLE_BY_MODEL.get(type(row))
+                if table:
+                    session.add(TombstoneDB(
+                        table_name=table,
+                        entity_id=row.id,
+                        version=self.next(table, session),
+                        deleted_at=datetime.now(),
+                    ))
+
+        @event.listens_for(session_factory, "after_transaction_end")
+        def release_versions(session, transaction):
+            # Fires after the commit is done (or the rollback); savepoints end inside the transaction
+            if transaction.parent is None:
+                self._close(session.info.pop("open_versions", []))
+
+    def stats(self):
+        return {"version": self._version, "tables": dict(self._latest), "open_versions": len(self._open)}
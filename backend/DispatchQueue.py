@@ -0,0 +1,101 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+
+
+class DispatchQueue:
+    """
+    In-process priority queue of queued incidents, ordered by (severity, started_at).
+    Producers push incidents or call notify() when an ambulance frees up; the queue
+    processor sleeps on wait() until one of those happens.
+    """
+
+    def __init__(self, wait_history=500):
+        self._heap = []
+        # incident_id -> (severity, started_ts, enqueued_at)
+        self._entries = {}
+        self._wake = asyncio.Event()
+        self._wait_times = deque(maxlen=wait_history)
+        self.enqueued_total = 0
+        self.dispatched_total = 0
+        self.wakeups = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, incident_id):
+        return incident_id in self._entries
+
+    def push(self, incident_id, severity, started_at=None, enqueued_at=None):
+        """
+        Queue an incident (or update its priority). `enqueued_at` carries over the
+        original queue time when an incident is put back after a partial dispatch.
+        """
+        started_ts = started_at.timestamp() if started_at else time.time()
+        severity = severity if severity is not None else 0
+        existing = self._entries.get(incident_id)
+        if enqueued_at is None:
+            enqueued_at = existing[2] if existing else time.monotonic()
+        if not existing:
+            self.enqueued_total += 1
+        self._entries[incident_id] = (severity, started_ts, enqueued_at)
+        if not existing or existing[:2] != (severity, started_ts):
+            heapq.heappush(self._heap, (severity, started_ts, incident_id))
+        self._wake.set()
+
+    def remove(self, incident_id):
+        # Heap items are dropped lazily when they reach the top
+        self._entries.pop(incident_id, None)
+
+    def pop(self):
+        """(incident_id, enqueued_at) of the highest priority incident, or None when empty."""
+        while self._heap:
+            severity, started_ts, incident_id = heapq.heappop(self._heap)
+            entry = self._entries.get(incident_id)
+            if entry is None or entry[:2] != (severity, started_ts):
+                continue
+            del self._entries[incident_id]
+            return incident_id, entry[2]
+        return None
+
+    def take(self, incident_id):
+        """Remove an incident served out of priority order. Returns its enqueued_at, or None."""
+        entry = self._entries.pop(incident_id, None)
+        return entry[2] if entry else None
+
+    def record_dispatch(self, enqueued_at):
+        """Count a dispatch out of the queue. Returns how long the incident waited, in seconds."""
+        waited = time.monotonic() - enqueued_at
+        self._wait_times.append(waited)
+        self.dispatched_total += 1
+        return waited
+
+    def notify(self):
+        """Wake the processor, e.g. because an ambulance became available."""
+        self._wake.set()
+
+    async def wait(self, timeout):
+        """Wait for a push/notify. Returns False if the timeout expired first."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+            woken = True
+        except asyncio.TimeoutError:
+            woken = False
+        self._wake.clear()
+        self.wakeups += 1
+        return woken
+
+    def metrics(self):
+        now = time.monotonic()
+        waiting = [now - entry[2] for entry in self._entries.values()]
+        recent = list(self._wait_times)
+        return {
+            "depth": len(self._entries),
+            "oldest_wait_seconds": round(max(waiting), 1) if waiting else 0.0,
+            "recent_mean_wait_seconds": round(sum(recent) / len(recent), 1) if recent else 0.0,
+            "recent_max_wait_seconds": round(max(recent), 1) if recent else 0.0,
+            "enqueued_total": self.enqueued_total,
+            "dispatched_total": self.dispatched_total,
+            "wakeups": self.wakeups,
+        }
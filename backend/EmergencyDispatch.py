@@ -1,5 +1,6 @@
 import logging
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.responses import PlainTextResponse, JSONResponse
 from Incident import *
 from Ambulance import *
 from Patient import *
@@ -10,42 +11,285 @@ from Hospital import *
 from EmergencyCenter import *
 from LoginRequest import *
 from PasswordCheck import *
+import HttpClient
+import Metrics
+from Auth import hash_password, verify_password, issue_token, read_token, password_fingerprint, Session, SessionCache
+import Polyline
+from RouteStore import get_stored_route, invalidate_location, refresh_route_store, warm_eta_cache
+from BootSequence import BootSequence
+from GeocodeCache import geocode_cache, geocode, load_geocode_cache, import_gazetteer, flush_geocode_hits, run_geocode_hit_flush, GEOCODE_GAZETTEER
+from SpatialIndex import SpatialIndex
+from DispatchQueue import DispatchQueue
+from BatchAssignment import solve_assignment
+from FleetState import FleetState
+from ChangeVersions import ChangeVersions
+from ListQuery import ListQuery
+from IncidentStats import IncidentStats
+from AssignmentHistory import AssignmentHistory
+from PatientLinks import PatientLinks
+from LiveUpdates import Broadcaster, TOPICS, RESYNC, Snapshot, row_to_dict, encode
+from MovementEngine import MovementEngine, Leg, mission_legs, TO_INCIDENT, ON_SCENE, TO_HOSPITAL, AT_HOSPITAL, RETURNING
 import models
 from models import *
-from database import engine, SessionLocal
-from sqlalchemy import text, func
-from sqlalchemy.orm import Session
+from database import engine, SessionLocal, AsyncSessionLocal, add_missing_columns, drop_removed_columns
+from sqlalchemy import text, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime, timedelta
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 import atexit
 import asyncio
-from passlib.context import CryptContext
+import json
+import os
+import time
+
+# Read back by /logs for the Logs page
+DISPATCH_LOG_FILE = os.getenv("DISPATCH_LOG_FILE", "dispatch.log")
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
     handlers=[
-        logging.FileHandler("dispatch.log"),
+        logging.FileHandler(DISPATCH_LOG_FILE),
         logging.StreamHandler()
     ]
 )
 
 logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, which would flood dispatch.log and the Logs page
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 app = FastAPI()
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+# Never written: the return leg is driven from the route store or fetched per dispatch
+drop_removed_columns({"ambulances": ["route_to_assigned_unit"]}, engine)
+
+# The app takes traffic once interrupted missions are recovered (and the local graph is loaded)
+boot = BootSequence(required=["state", "recovery"] + (["local_routing"] if LOCAL_ROUTING_GRAPH else []))
+
+# Metrics, scraped from /metrics in the Prometheus text format. The gauges are read at scrape
+# time, so they may name objects defined further down.
+
+DISPATCH_PHASE_SECONDS = Metrics.Histogram(
+    "dispatch_phase_seconds", "Time spent in each phase of a dispatch.", ("path", "phase")
+)
+DISPATCH_SECONDS = Metrics.Histogram(
+    "dispatch_seconds", "Total processing time of a dispatch.", ("path",)
+)
+DISPATCHES = Metrics.Counter(
+    "dispatches_total", "Incidents dispatched, by path and the incident status afterwards.", ("path", "status")
+)
+AMBULANCE_PHASE_SECONDS = Metrics.Histogram(
+    "ambulance_dispatch_phase_seconds", "Time spent preparing the mission of a single ambulance.", ("phase",)
+)
+QUEUE_WAIT_SECONDS = Metrics.Histogram(
+    "dispatch_queue_wait_seconds", "Time queued incidents waited before being dispatched.",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+QUEUE_DRAIN_SECONDS = Metrics.Histogram(
+    "dispatch_queue_drain_seconds", "Duration of one pass of the queue processor."
+)
+RECONCILIATION_FIXES = Metrics.Counter(
+    "assignment_reconciliation_fixes_total", "Inconsistencies fixed by the assignment reconciliation, by kind.", ("kind",)
+)
+RECONCILIATION_SECONDS = Metrics.Histogram(
+    "assignment_reconciliation_seconds", "Duration of one assignment reconciliation pass."
+)
+HTTP_REQUEST_SECONDS = Metrics.Histogram(
+    "http_request_seconds", "Latency of API requests by route.", ("method", "route", "status")
+)
+
+Metrics.Gauge("dispatch_queue_depth", "Incidents waiting in the dispatch queue.").set_function(
+    lambda: len(dispatch_queue)
+)
+Metrics.Gauge("dispatch_queue_oldest_wait_seconds", "Wait so far of the oldest queued incident.").set_function(
+    lambda: dispatch_queue.metrics()["oldest_wait_seconds"]
+)
+Metrics.Gauge("movement_missions", "Ambulances on a mission, by phase.", ("phase",)).set_function(
+    lambda: movement_engine.stats()["phases"]
+)
+Metrics.Gauge("movement_last_tick_seconds", "Duration of the last movement engine tick.").set_function(
+    lambda: movement_engine.last_tick_ms / 1000
+)
+Metrics.Gauge("fleet_pending_positions", "Ambulance positions not yet flushed to the database.").set_function(
+    lambda: fleet_state.stats()["pending_positions"]
+)
+Metrics.Gauge("live_clients", "Connected /ws/live clients.").set_function(lambda: len(broadcaster))
+Metrics.Gauge("eta_cache_entries", "Entries in the travel time cache.").set_function(
+    lambda: get_eta_cache_stats()["size"]
+)
+Metrics.Gauge("eta_cache_hit_ratio", "Hit ratio of the travel time cache since startup.").set_function(
+    lambda: get_eta_cache_stats()["hit_ratio"]
+)
+Metrics.Gauge("ready", "1 once the startup recovery is done and the app takes traffic.").set_function(
+    lambda: int(boot.ready)
+)
+Metrics.Gauge("boot_phase_seconds", "Duration of each finished startup phase.", ("phase",)).set_function(
+    lambda: {(name,): phase["duration_ms"] / 1000 for name, phase in boot.phases.items() if "duration_ms" in phase}
+)
+Metrics.Gauge("geocode_cache_entries", "Addresses in the geocode cache.").set_function(
+    lambda: geocode_cache.stats()["size"]
+)
+Metrics.Gauge("geocode_cache_hit_ratio", "Hit ratio of exact geocode cache lookups since startup.").set_function(
+    lambda: geocode_cache.stats()["hit_ratio"]
+)
+
 
 @app.on_event("startup")
 async def startup_event():
+    # 1. Only the state every handler reads is loaded before the server accepts requests
+    async with boot.phase("state"):
+        db = AsyncSessionLocal()
+        try:
+            await db.run_sync(change_versions.load)
+            # Recover the fleet from the last flushed state before anything reads it
+            fleet_state.load((await db.scalars(select(AmbulanceDB))).all())
+            await load_spatial_indexes(db)
+            # First start after the rollups were introduced; statistics would be wrong without them
+            if not await db.scalar(select(IncidentStatsHourlyDB.id).limit(1)):
+                rollup_rows = await db.run_sync(incident_stats.rebuild)
+                if rollup_rows:
+                    logger.info(f"Statistics rollups built: {rollup_rows} hourly rows")
+            # Likewise the assignment rows, which recovery relies on, and the patient links
+            if not await db.scalar(select(IncidentAssignmentDB.id).limit(1)):
+                assignment_rows = await db.run_sync(assignment_history.backfill)
+                if assignment_rows:
+                    logger.info(f"Assignment history built: {assignment_rows} rows")
+            if not await db.scalar(select(IncidentPatientDB.id).limit(1)):
+                patient_links_rows = await db.run_sync(patient_links.backfill)
+                if patient_links_rows:
+                    logger.info(f"Patient links built: {patient_links_rows} rows")
+        finally:
+            await db.close()
+    asyncio.create_task(fleet_state.run_write_behind())
+    asyncio.create_task(run_geocode_hit_flush())
+    asyncio.create_task(movement_engine.run())
+
+    # 2. Start the background queue processor and the periodic assignment reconciliation
+    asyncio.create_task(process_queue_background())
+    asyncio.create_task(run_reconciliation())
+
+    # 3. The rest in parallel, in the background. Recovery routes the units back to base, so it
+    #    waits for the local graph if there is one.
+    routing = [boot.background("local_routing", load_routing_graph)] if LOCAL_ROUTING_GRAPH else []
+    boot.background("recovery", recover_interrupted_missions, after=routing)
+    boot.background("eta_cache", warm_travel_times)
+    boot.background("geocode_cache", with_session, load_geocode_cache)
+    boot.background("route_migration", migrate_stored_routes)
+    # Precompute the hospital <-> base routes that are still missing
+    boot.background("route_store", refresh_route_store, after=routing)
+    if GEOCODE_GAZETTEER:
+        boot.background("gazetteer", import_configured_gazetteer)
+
+
+async def with_session(work):
+    db = AsyncSessionLocal()
+    try:
+        return await work(db)
+    finally:
+        await db.close()
+
+
+async def load_routing_graph():
+    router = await asyncio.to_thread(load_local_router)
+    logger.info(f"Local routing graph loaded: {router.node_count} nodes")
+
+
+async def recover_interrupted_missions():
+    await with_session(cleanup_stale_missions)
+
+
+async def warm_travel_times():
+    pairs = await warm_eta_cache()
+    logger.info(f"Travel time cache warmed with {pairs} stored routes")
+
+
+def _migrate_stored_routes():
     db = SessionLocal()
     try:
-        await cleanup_stale_missions(db)
+        return assignment_history.migrate_routes(db, store_route)
     finally:
         db.close()
 
-    # 2. Start the background queue processor
-    asyncio.create_task(process_queue_background())
+
+async def migrate_stored_routes():
+    migrated = await asyncio.to_thread(_migrate_stored_routes)
+    if migrated:
+        logger.info(f"Moved the routes of {migrated} incidents to their assignment rows")
+
+
+async def import_configured_gazetteer():
+    imported = await import_gazetteer(GEOCODE_GAZETTEER)
+    logger.info(f"Street gazetteer imported: {imported} names from {GEOCODE_GAZETTEER}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    fleet_state.flush()
+    await flush_geocode_hits()
+    await HttpClient.close_client()
+
+# When set, every endpoint but the public ones needs an "Authorization: Bearer <token>" header
+# (websockets pass the token on the handshake instead, see authenticate_websocket)
+REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "false").lower() == "true"
+PUBLIC_PATHS = {"/login", "/health", "/health/live", "/health/ready", "/metrics", "/docs", "/openapi.json"}
+
+session_cache = SessionCache()
+
+
+async def authenticate(token):
+    """The session of a token issued by /login, or None. A cache miss costs one user lookup, never bcrypt."""
+    session = session_cache.get(token)
+    if session:
+        return session
+    claims = read_token(token)
+    if not claims:
+        return None
+    db = AsyncSessionLocal()
+    try:
+        user = await db.scalar(select(UserDB).filter(UserDB.id == claims["uid"]))
+    finally:
+        await db.close()
+    if not user or user.role != claims["role"] or password_fingerprint(user.password) != claims["pwd"]:
+        return None
+    session = Session(user.id, user.role, claims["exp"])
+    session_cache.put(token, session)
+    return session
+
+
+# Declared before the CORS middleware so that CORS wraps it and a 401 still carries its headers
+@app.middleware("http")
+async def authenticate_request(request: Request, call_next):
+    request.state.session = None
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        request.state.session = await authenticate(token)
+    if REQUIRE_AUTH and request.state.session is None and request.method != "OPTIONS" \
+            and request.url.path not in PUBLIC_PATHS:
+        return JSONResponse({"detail": "Not authenticated"}, status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return await call_next(request)
+
+
+async def authenticate_websocket(websocket: WebSocket):
+    """
+    The session of a websocket handshake, which the http middleware never sees. Browsers cannot
+    set headers on a websocket, so the token comes as ?token= or as the subprotocol pair
+    "bearer, <token>". Returns (session or None, subprotocol to accept with).
+    """
+    offered = [name.strip() for name in websocket.headers.get("sec-websocket-protocol", "").split(",") if name.strip()]
+    subprotocol = None
+    token = websocket.query_params.get("token")
+    if len(offered) >= 2 and offered[0].lower() == "bearer":
+        subprotocol, token = offered[0], token or offered[1]
+    return (await authenticate(token) if token else None), subprotocol
+
+
+async def refuse_websocket(websocket: WebSocket, subprotocol, reason):
+    """Close a handshake with 1008 (policy violation) so the client sees why instead of a bare 403."""
+    await websocket.accept(subprotocol=subprotocol)
+    await websocket.close(code=1008, reason=reason)
+
 
 # CORS configuration
 app.add_middleware(
@@ -54,14 +298,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Change-Version", "X-Next-Cursor"],
 )
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    db = AsyncSessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
 
 
 class Status:
@@ -75,12 +320,12 @@ class Status:
 
 # Helper functions for incidents
 
-def get_incident_by_id(incident_id: int, db: Session = Depends(get_db)):
-    incident = db.query(IncidentDB).filter(IncidentDB.id == incident_id).first()
+async def get_incident_by_id(incident_id: int, db: AsyncSession = Depends(get_db)):
+    incident = await db.scalar(select(IncidentDB).filter(IncidentDB.id == incident_id))
     return incident
 
 
-def create_incident_in_db(incident: Incident, db: Session = Depends(get_db)):
+async def create_incident_in_db(incident: Incident, db: AsyncSession = Depends(get_db)):
     db_incident = IncidentDB(
         severity=incident.severity,
         status=incident.status,
@@ -94,16 +339,14 @@ def create_incident_in_db(incident: Incident, db: Session = Depends(get_db)):
         assigned_hospital=incident.assigned_hospital,
         patient_ids=incident.patient_ids,
         needs_UPU=incident.needs_UPU,
-        route_to_incident=incident.route_to_incident, 
-        route_to_hospital=incident.route_to_hospital,
     )
     db.add(db_incident)
-    db.commit()
-    db.refresh(db_incident)
+    await db.commit()
+    await db.refresh(db_incident)
     return db_incident
 
 
-def convert_incident_to_response(db_incident: Incident, db: Session = Depends(get_db)):
+def convert_incident_to_response(db_incident: Incident, db: AsyncSession = Depends(get_db)):
     start_str = db_incident.started_at.isoformat() if db_incident.started_at else None
     end_str = db_incident.ended_at.isoformat() if db_incident.ended_at else None
     created = Incident(
@@ -124,38 +367,66 @@ def convert_incident_to_response(db_incident: Incident, db: Session = Depends(ge
     return created
 
 
-def update_incident_in_db(db_incident: Incident, updated_incident: IncidentUpdate, db: Session = Depends(get_db)):
+async def update_incident_in_db(db_incident: Incident, updated_incident: IncidentUpdate, db: AsyncSession = Depends(get_db)):
     update_data = updated_incident.dict(exclude_unset=True)
 
     for key, value in update_data.items():
         if hasattr(db_incident, key):
             setattr(db_incident, key, value)
 
-    db.commit()
-    db.refresh(db_incident)
+    await db.commit()
+    await db.refresh(db_incident)
     return db_incident
 
 
-def delete_incident_in_db(incident_id: int, db: Session = Depends(get_db)):
-    incident = get_incident_by_id(incident_id, db)
+async def delete_incident_in_db(incident_id: int, db: AsyncSession = Depends(get_db)):
+    incident = await get_incident_by_id(incident_id, db)
     if not incident:
         return False
-    db.delete(incident)
-    db.commit()
+    await db.delete(incident)
+    await db.commit()
     return True
 
 
+# Incident routes are stored as encoded polylines, simplified to a tolerance in meters
+
+ROUTE_STORE_TOLERANCE_METERS = float(os.getenv("ROUTE_STORE_TOLERANCE_METERS", "1"))
+# Routes requested for a map zoom are simplified to stay below this many pixels of error
+ROUTE_SIMPLIFY_PIXELS = float(os.getenv("ROUTE_SIMPLIFY_PIXELS", "1"))
+
+
+def store_route(route):
+    if not route:
+        return route
+    return Polyline.encode(Polyline.simplify(route, ROUTE_STORE_TOLERANCE_METERS))
+
+
+def load_routes(stored, encoded=False, zoom=None):
+    """Stored routes keyed by ambulance id, as coordinates or polylines, optionally simplified for a zoom."""
+    routes = {}
+    for amb_id, route in (stored or {}).items():
+        if not encoded and zoom is None:
+            routes[amb_id] = Polyline.decode_route(route)
+            continue
+        points = Polyline.decode_route(route) or []
+        if zoom is not None and points:
+            tolerance = Polyline.tolerance_for_zoom(zoom, points[0][1], ROUTE_SIMPLIFY_PIXELS)
+            points = Polyline.simplify(points, tolerance)
+        routes[amb_id] = Polyline.encode(points) if encoded else points
+    return routes
+
+
 # Helper functions for ambulances
 
-def get_ambulance_by_id(ambulance_id: int, db: Session = Depends(get_db)):
-    ambulance = db.query(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id).first()
+async def get_ambulance_by_id(ambulance_id: int, db: AsyncSession = Depends(get_db)):
+    ambulance = await db.scalar(select(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id))
     if not ambulance:
         logger.warning(f"Ambulance with ID {ambulance_id} was not found.")
         raise HTTPException(status_code=404, detail="Ambulance was not found")
-    return ambulance
+    return fleet_state.overlay(ambulance)
 
 
-def create_ambulance_in_db(ambulance: Ambulance, db: Session = Depends(get_db)):
+async def create_ambulance_in_db(ambulance: Ambulance, db: AsyncSession = Depends(get_db)):
     db_ambulance = AmbulanceDB(
         status=ambulance.status,
         lat=ambulance.lat,
@@ -168,13 +439,13 @@ def create_ambulance_in_db(ambulance: Ambulance, db: Session = Depends(get_db)):
         base_hospital_id=ambulance.base_hospital_id
     )
     db.add(db_ambulance)
-    db.commit()
-    db.refresh(db_ambulance)
+    await db.commit()
+    await db.refresh(db_ambulance)
     logger.info(f"Ambulance with ID {db_ambulance.id} was successfully added to database.")
     return db_ambulance
 
 
-def convert_ambulance_to_response(ambulance: Ambulance, db: Session = Depends(get_db)):
+def convert_ambulance_to_response(ambulance: Ambulance, db: AsyncSession = Depends(get_db)):
     db_ambulance = Ambulance(
         id=ambulance.id,
         status=ambulance.status,
@@ -190,35 +461,167 @@ def convert_ambulance_to_response(ambulance: Ambulance, db: Session = Depends(ge
     return db_ambulance
 
 
-def update_ambulance_in_db(ambulance: Ambulance, updated_ambulance: AmbulanceUpdate, db: Session = Depends(get_db)):
+async def update_ambulance_in_db(ambulance: Ambulance, updated_ambulance: AmbulanceUpdate, db: AsyncSession = Depends(get_db)):
     update_data = updated_ambulance.dict(exclude_unset=True)
 
     for key, value in update_data.items():
         if hasattr(ambulance, key):
             setattr(ambulance, key, value)
 
-    db.commit()
-    db.refresh(ambulance)
+    await db.commit()
+    await db.refresh(ambulance)
     return ambulance
 
 
-def get_available_ambulances(db: Session):
+async def get_available_ambulances(db: AsyncSession):
     """Get all ambulances with 'Available' status"""
-    available = db.query(AmbulanceDB).filter(
+    # populate_existing: the queue drain's session lives on, and a unit it saw earlier may have
+    # been sent by another session since; a stale cached status would hide that
+    available = (await db.scalars(select(AmbulanceDB).filter(
         AmbulanceDB.status == Status.AVAILABLE
-    ).all()
-    return available
+    ).execution_options(populate_existing=True))).all()
+    return [fleet_state.overlay(amb) for amb in available]
+
+
+# Every entity change gets a version number so clients can ask only for what changed
+
+change_versions = ChangeVersions()
+change_versions.track(SessionLocal)
+
+
+def parse_fields(model, fields: Optional[str]):
+    """Column names asked for with ?fields=a,b,c (id is always included), or None for the default."""
+    if not fields:
+        return None
+    columns = model.__table__.columns.keys()
+    names = ["id"] + [name for name in (part.strip() for part in fields.split(",")) if name and name != "id"]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+async def versioned_rows(request: Request, response: Response, model, since: Optional[int], db: AsyncSession,
+                   fields: Optional[str] = None, listing: Optional[ListQuery] = None, load_rows=None):
+    """
+    The whole table, or with `since` only the rows changed after that version plus the ids
+    deleted since. Answers 304 when the client's ETag is still the table's latest version
+    for the same query (fields, since and listing parameters).
+    `fields` limits the columns read and returned and `listing` filters, sorts and pages the
+    rows (the next page's cursor goes in X-Next-Cursor). `load_rows` replaces the database
+    read for tables served from memory.
+    """
+    table = model.__tablename__
+    columns = parse_fields(model, fields)
+    listing = listing or ListQuery()
+    sort_column, _ = listing.sort_column(model)
+    # The cursor is built from the sort column, so it is read even when not asked for
+    selected = columns + [sort_column] if columns and sort_column not in columns else columns
+
+    # Read the version before the rows: a change in between is sent twice, never missed
+    version = change_versions.latest(table)
+    headers = {
+        "ETag": change_versions.etag(table, (columns, since, listing.shape())),
+        "X-Change-Version": str(version),
+        "Cache-Control": "no-cache",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    if load_rows:
+        rows = load_rows()
+        if since is not None:
+            rows = [row for row in rows if (row["version"] or 0) > since]
+        rows = listing.apply_rows(model, rows)
+    else:
+        query = select(*(model.__table__.c[column] for column in selected)) if columns else select(model)
+        if since is not None:
+            query = query.filter(model.version > since)
+        result = await db.execute(listing.apply(model, query))
+        rows = [row._asdict() for row in result] if columns else result.scalars().all()
+
+    rows, next_cursor = listing.page(model, rows)
+    if columns and (load_rows or selected != columns):
+        rows = [{column: row.get(column) for column in columns} for row in rows]
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    response.headers.update(headers)
+
+    if since is None:
+        return rows
+    deleted = (await db.scalars(select(TombstoneDB.entity_id).filter(
+        TombstoneDB.table_name == table, TombstoneDB.version > since
+    ))).all()
+    return {"version": version, "changed": rows, "deleted": deleted}
+
+
+# Live ambulance positions are kept in memory and written to the database in batches
+
+fleet_state = FleetState(change_versions)
+fleet_state.track(SessionLocal)
+
+
+def move_ambulance(ambulance_id, lon, lat):
+    fleet_state.move(ambulance_id, lon, lat)
+    ambulance_index.upsert(ambulance_id, lon, lat)
+
+
+# Spatial pre-filtering: only the closest candidates are sent to the routing matrix
+
+DISPATCH_AMBULANCE_CANDIDATES = int(os.getenv("DISPATCH_AMBULANCE_CANDIDATES", "8"))
+DISPATCH_HOSPITAL_CANDIDATES = int(os.getenv("DISPATCH_HOSPITAL_CANDIDATES", "3"))
+
+ambulance_index = SpatialIndex()
+hospital_index = SpatialIndex()
+
+
+async def load_spatial_indexes(db: AsyncSession):
+    ambulance_index.clear()
+    for amb in await db.scalars(select(AmbulanceDB)):
+        ambulance_index.upsert(amb.id, amb.lon, amb.lat)
+    hospital_index.clear()
+    for hospital in await db.scalars(select(HospitalDB)):
+        hospital_index.upsert(hospital.id, hospital.lon, hospital.lat)
+
+
+def nearest_ambulance_candidates(ambulances, incident, k=DISPATCH_AMBULANCE_CANDIDATES):
+    """
+    The k ambulances closest to the incident in a straight line, widened until
+    their combined capacity covers the patients.
+    """
+    by_id = {amb.id: amb for amb in ambulances}
+    for amb in ambulances:
+        if amb.id not in ambulance_index:
+            ambulance_index.upsert(amb.id, amb.lon, amb.lat)
+
+    needed = incident.nr_patients or 1
+    while True:
+        nearest = ambulance_index.nearest(incident.lon, incident.lat, k, allowed=by_id)
+        capacity = sum(by_id[amb_id].capacity or 0 for amb_id, _ in nearest)
+        if capacity >= needed or len(nearest) < k:
+            break
+        k *= 2
+    return [by_id[amb_id] for amb_id, _ in nearest]
+
+
+def nearest_hospital_candidates(hospitals, incident, k=DISPATCH_HOSPITAL_CANDIDATES):
+    by_id = {hospital.id: hospital for hospital in hospitals}
+    for hospital in hospitals:
+        if hospital.id not in hospital_index:
+            hospital_index.upsert(hospital.id, hospital.lon, hospital.lat)
+    nearest = hospital_index.nearest(incident.lon, incident.lat, k, allowed=by_id)
+    return [by_id[hospital_id] for hospital_id, _ in nearest]
 
 
 # Hospital helper functions
 
-def get_hospital_by_id(hospital_id: int, db: Session = Depends(get_db)):
-    hospital = db.query(HospitalDB).filter(HospitalDB.id == hospital_id).first()
+async def get_hospital_by_id(hospital_id: int, db: AsyncSession = Depends(get_db)):
+    hospital = await db.scalar(select(HospitalDB).filter(HospitalDB.id == hospital_id))
     return hospital
 
-def create_hospital_in_db(hospital: Hospital, db: Session = Depends(get_db)):
-    max_hospital_id = db.query(func.max(HospitalDB.id)).scalar() or 0
-    max_center_id = db.query(func.max(EmergencyCentersDB.id)).scalar() or 0
+async def create_hospital_in_db(hospital: Hospital, db: AsyncSession = Depends(get_db)):
+    max_hospital_id = await db.scalar(select(func.max(HospitalDB.id))) or 0
+    max_center_id = await db.scalar(select(func.max(EmergencyCentersDB.id))) or 0
     new_id = max(max_hospital_id, max_center_id) + 1
 
     db_hospital = HospitalDB(
@@ -229,12 +632,12 @@ def create_hospital_in_db(hospital: Hospital, db: Session = Depends(get_db)):
         lon=hospital.lon
     )
     db.add(db_hospital)
-    db.commit()
-    db.refresh(db_hospital)
+    await db.commit()
+    await db.refresh(db_hospital)
     logger.info(f"Hospital with ID {db_hospital.id} was successfully added to database.")
     return db_hospital
 
-def convert_hospital_to_response(hospital: Hospital, db: Session = Depends(get_db)):
+def convert_hospital_to_response(hospital: Hospital, db: AsyncSession = Depends(get_db)):
     db_hospital = Hospital(
         id=hospital.id,
         name=hospital.name,
@@ -244,47 +647,47 @@ def convert_hospital_to_response(hospital: Hospital, db: Session = Depends(get_d
     )
     return db_hospital
 
-def update_hospital_in_db(hospital: Hospital, updated_hospital: Hospital, db: Session = Depends(get_db)):
+async def update_hospital_in_db(hospital: Hospital, updated_hospital: Hospital, db: AsyncSession = Depends(get_db)):
     hospital.name = updated_hospital.name
     hospital.type = updated_hospital.type
     hospital.lat = updated_hospital.lat
     hospital.lon = updated_hospital.lon
 
-    db.commit()
-    db.refresh(hospital)
+    await db.commit()
+    await db.refresh(hospital)
     return hospital
 
-def filter_hospitals_by_type(incident: Incident, db: Session = Depends(get_db)):
+async def filter_hospitals_by_type(incident: Incident, db: AsyncSession = Depends(get_db)):
     if incident.needs_UPU:
-        return db.query(HospitalDB).filter(HospitalDB.type == "UPU").all()
+        return (await db.scalars(select(HospitalDB).filter(HospitalDB.type == "UPU"))).all()
     
     incident_type_lower = incident.type.lower() if incident.type else ""
     
     if "tbc" in incident_type_lower or "respiratory" in incident_type_lower or "pulmonary" in incident_type_lower:
-        hospitals = db.query(HospitalDB).filter(HospitalDB.type == "TBC").all()
+        hospitals = (await db.scalars(select(HospitalDB).filter(HospitalDB.type == "TBC"))).all()
         if hospitals: 
             return hospitals
 
     elif "infectious" in incident_type_lower or "contagious" in incident_type_lower or "psychiatric" in incident_type_lower:
-        hospitals = db.query(HospitalDB).filter(
+        hospitals = (await db.scalars(select(HospitalDB).filter(
         (HospitalDB.type.icontains("Infectious")) | 
         (HospitalDB.type.icontains("Psychiatric")) | 
         (HospitalDB.type.icontains("Contagious"))
-    ).all()
+    ))).all()
         if hospitals:
            return hospitals
 
-    return db.query(HospitalDB).filter(HospitalDB.type == "UPU").all()
+    return (await db.scalars(select(HospitalDB).filter(HospitalDB.type == "UPU"))).all()
 
 # Emergency Center helper functions
 
-def get_emergency_center_by_id(emergency_center_id: int, db: Session = Depends(get_db)):
-    emergency_center = db.query(EmergencyCentersDB).filter(EmergencyCentersDB.id == emergency_center_id).first()
+async def get_emergency_center_by_id(emergency_center_id: int, db: AsyncSession = Depends(get_db)):
+    emergency_center = await db.scalar(select(EmergencyCentersDB).filter(EmergencyCentersDB.id == emergency_center_id))
     return emergency_center
 
-def create_emergency_center_in_db(emergency_center: EmergencyCenter, db: Session = Depends(get_db)):
-    max_hospital_id = db.query(func.max(HospitalDB.id)).scalar() or 0
-    max_center_id = db.query(func.max(EmergencyCentersDB.id)).scalar() or 0
+async def create_emergency_center_in_db(emergency_center: EmergencyCenter, db: AsyncSession = Depends(get_db)):
+    max_hospital_id = await db.scalar(select(func.max(HospitalDB.id))) or 0
+    max_center_id = await db.scalar(select(func.max(EmergencyCentersDB.id))) or 0
     new_id = max(max_hospital_id, max_center_id) + 1
 
     db_emergency_center = EmergencyCentersDB(
@@ -294,12 +697,12 @@ def create_emergency_center_in_db(emergency_center: EmergencyCenter, db: Session
         lon=emergency_center.lon
     )
     db.add(db_emergency_center)
-    db.commit()
-    db.refresh(db_emergency_center)
+    await db.commit()
+    await db.refresh(db_emergency_center)
     logger.info(f"Emergency Center with ID {db_emergency_center.id} was successfully added to database.")
     return db_emergency_center
 
-def convert_emergency_center_to_response(emergency_center: EmergencyCenter, db: Session = Depends(get_db)):
+def convert_emergency_center_to_response(emergency_center: EmergencyCenter, db: AsyncSession = Depends(get_db)):
     db_emergency_center = EmergencyCenter(
         id=emergency_center.id,
         name=emergency_center.name,
@@ -308,23 +711,23 @@ def convert_emergency_center_to_response(emergency_center: EmergencyCenter, db:
     )
     return db_emergency_center
 
-def update_emergency_center_in_db(emergency_center: EmergencyCenter, updated_emergency_center: EmergencyCenterUpdate, db: Session = Depends(get_db)):
+async def update_emergency_center_in_db(emergency_center: EmergencyCenter, updated_emergency_center: EmergencyCenterUpdate, db: AsyncSession = Depends(get_db)):
     update_data = updated_emergency_center.dict(exclude_unset=True)
 
     for key, value in update_data.items():
         if hasattr(emergency_center, key):
             setattr(emergency_center, key, value)
 
-    db.commit()
-    db.refresh(emergency_center)
+    await db.commit()
+    await db.refresh(emergency_center)
     return emergency_center
 
 # Patient helper functions
-def get_patient_by_id(patient_id: int, db: Session = Depends(get_db)):
-    patient = db.query(PatientDB).filter(PatientDB.id == patient_id).first()
+async def get_patient_by_id(patient_id: int, db: AsyncSession = Depends(get_db)):
+    patient = await db.scalar(select(PatientDB).filter(PatientDB.id == patient_id))
     return patient
 
-def create_patient_in_db(patient: Patient, db: Session = Depends(get_db)):
+async def create_patient_in_db(patient: Patient, db: AsyncSession = Depends(get_db)):
     db_patient = PatientDB(
         name=patient.name,
         age=patient.age,
@@ -332,12 +735,12 @@ def create_patient_in_db(patient: Patient, db: Session = Depends(get_db)):
         medical_history=patient.medical_history
     )
     db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
+    await db.commit()
+    await db.refresh(db_patient)
     logger.info(f"Patient with ID {db_patient.id} was successfully added to database.")
     return db_patient
 
-def convert_patient_to_response(patient: Patient, db: Session = Depends(get_db)):
+def convert_patient_to_response(patient: Patient, db: AsyncSession = Depends(get_db)):
     db_patient = Patient(
         id=patient.id,
         name=patient.name,
@@ -347,24 +750,24 @@ def convert_patient_to_response(patient: Patient, db: Session = Depends(get_db))
     )
     return db_patient
 
-def update_patient_in_db(patient: Patient, updated_patient: PatientUpdate, db: Session = Depends(get_db)):
+async def update_patient_in_db(patient: Patient, updated_patient: PatientUpdate, db: AsyncSession = Depends(get_db)):
     update_data = updated_patient.dict(exclude_unset=True)
 
     for key, value in update_data.items():
         if hasattr(patient, key):
             setattr(patient, key, value)
 
-    db.commit()
-    db.refresh(patient)
+    await db.commit()
+    await db.refresh(patient)
     return patient
 
 # User helper functions
-def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+async def get_user_by_id(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(UserDB).filter(UserDB.id == user_id))
     return user
 
-def create_user_in_db(user: User, db: Session = Depends(get_db)):
-    password_hashed = hash_password(user.password)
+async def create_user_in_db(user: User, db: AsyncSession = Depends(get_db)):
+    password_hashed = await hash_password(user.password)
     db_user = UserDB(
         username=user.username,
         password=password_hashed,
@@ -372,12 +775,12 @@ def create_user_in_db(user: User, db: Session = Depends(get_db)):
         badge_number=user.badge_number
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     logger.info(f"User with ID {db_user.id} was successfully added to database.")
     return db_user
 
-def convert_user_to_response(user: User, db: Session = Depends(get_db)):
+def convert_user_to_response(user: User, db: AsyncSession = Depends(get_db)):
     db_user = User(
         id=user.id,
         username=user.username,
@@ -387,70 +790,117 @@ def convert_user_to_response(user: User, db: Session = Depends(get_db)):
     )
     return db_user
 
-def update_user_in_db(user: User, updated_user: User, db: Session = Depends(get_db)):
+async def update_user_in_db(user: User, updated_user: User, db: AsyncSession = Depends(get_db)):
     user.username = updated_user.username
-    password_hashed = hash_password(updated_user.password)
-    user.password = password_hashed
+    # Clients send the stored hash back when the password was not changed
+    password_changed = bool(updated_user.password) and updated_user.password != user.password
+    if password_changed:
+        user.password = await hash_password(updated_user.password)
+    role_changed = user.role != updated_user.role
     user.role = updated_user.role
     user.badge_number = updated_user.badge_number
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    if password_changed or role_changed:
+        session_cache.revoke_user(user.id)
     return user
 
 # Login helper functions
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
 @app.post("/check_password")
-def verify_password(data: PasswordCheck):
-    return pwd_context.verify(data.plain_password, data.hashed_password)
+async def check_password(data: PasswordCheck):
+    return await verify_password(data.plain_password, data.hashed_password)
 
 # API ENDPOINTS
 
 # Incident Endpoints
 
 @app.post("/create_incident", response_model=Incident)
-async def create_incident(incident: Incident, db: Session = Depends(get_db)):
+async def create_incident(incident: Incident, db: AsyncSession = Depends(get_db)):
     incident.started_at = datetime.now()
-    db_incident = create_incident_in_db(incident, db)
+    db_incident = await create_incident_in_db(incident, db)
     created_incident = convert_incident_to_response(db_incident, db)
     logger.info(f"Incident created: {created_incident}")
     return created_incident
 
 
 @app.get("/incidents")
-async def incidents(db: Session = Depends(get_db)):
-    all_incidents = db.query(IncidentDB).all()
-    return all_incidents
+async def incidents(request: Request, response: Response, since: Optional[int] = None, fields: Optional[str] = None,
+                    listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    return await versioned_rows(request, response, IncidentDB, since, db, fields, listing)
+
+
+@app.get("/incidents/{incident_id}/routes")
+async def incident_routes(incident_id: int, format: str = "coordinates", zoom: Optional[float] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Route geometry of an incident's units, keyed by ambulance id. Not part of /incidents.
+    format=encoded returns polylines instead of [[lon, lat], ...]; zoom drops the points
+    that would not be visible at that map zoom.
+    """
+    if format not in ("coordinates", "encoded"):
+        raise HTTPException(status_code=400, detail="format must be 'coordinates' or 'encoded'")
+    to_incident, to_hospital = await assignment_history.routes(db, incident_id)
+    if not to_incident and not await db.scalar(select(IncidentDB.id).filter(IncidentDB.id == incident_id)):
+        logger.warning(f"Incident with ID {incident_id} was not found.")
+        raise HTTPException(status_code=404, detail="Incident not found")
+    encoded = format == "encoded"
+    return {
+        "id": incident_id,
+        "route_to_incident": load_routes(to_incident, encoded, zoom),
+        "route_to_hospital": load_routes(to_hospital, encoded, zoom),
+    }
+
+
+@app.get("/incidents/{incident_id}/assignments")
+async def incident_assignments(incident_id: int, db: AsyncSession = Depends(get_db)):
+    """Every unit dispatched to the incident, when, and when and why it was released (None while on it)."""
+    rows = (await db.scalars(select(IncidentAssignmentDB).filter(
+        IncidentAssignmentDB.incident_id == incident_id
+    ).order_by(IncidentAssignmentDB.assigned_at, IncidentAssignmentDB.id))).all()
+    if not rows and not await db.scalar(select(IncidentDB.id).filter(IncidentDB.id == incident_id)):
+        logger.warning(f"Incident with ID {incident_id} was not found.")
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return [
+        {
+            "ambulance_id": row.ambulance_id,
+            "assigned_at": row.assigned_at,
+            "arrived_at_incident": row.arrived_at_incident,
+            "arrived_at_hospital": row.arrived_at_hospital,
+            "released_at": row.released_at,
+            "release_reason": row.release_reason,
+        } for row in rows
+    ]
 
 
 @app.put("/update_incident", response_model=Incident)
-async def update_incident(updated_incident: IncidentUpdate, db: Session = Depends(get_db)):
-    db_incident = get_incident_by_id(updated_incident.id, db)
+async def update_incident(updated_incident: IncidentUpdate, db: AsyncSession = Depends(get_db)):
+    db_incident = await get_incident_by_id(updated_incident.id, db)
     if not db_incident:
         logger.warning(f"Incident with ID {updated_incident.id} was not found.")
         raise HTTPException(status_code=404, detail="Incident not found")
     
-    updated = update_incident_in_db(db_incident, updated_incident, db)
+    updated = await update_incident_in_db(db_incident, updated_incident, db)
+    if updated.status == Status.QUEUED:
+        enqueue_incident(updated)
+    else:
+        dispatch_queue.remove(updated.id)
     logger.info(f"Incident with ID {updated.id} was successfully updated!")
     return convert_incident_to_response(updated,db)
 
 
 @app.delete("/delete_incident")
-async def delete_incident(incident_id: int, db: Session = Depends(get_db)):
-    incident = db.query(IncidentDB).filter(IncidentDB.id == incident_id).first()
+async def delete_incident(incident_id: int, db: AsyncSession = Depends(get_db)):
+    incident = await db.scalar(select(IncidentDB).filter(IncidentDB.id == incident_id))
     if not incident:
         logger.warning(f"Incident with ID {incident_id} was not found.")
         raise HTTPException(status_code=404, detail="Incident not found")
 
     assigned_units = list(incident.assigned_units or [])
     
-    db.delete(incident)
-    db.commit()
+    await db.delete(incident)
+    await db.commit()
+    dispatch_queue.remove(incident_id)
 
     for amb_id in assigned_units:
         await cancel_and_return_to_base(amb_id, db)
@@ -461,243 +911,379 @@ async def delete_incident(incident_id: int, db: Session = Depends(get_db)):
 # Ambulance Endpoints
 
 @app.post("/create_ambulance", response_model=Ambulance)
-async def create_ambulance(ambulance: Ambulance, db: Session = Depends(get_db)):
-    db_ambulance = create_ambulance_in_db(ambulance, db)
+async def create_ambulance(ambulance: Ambulance, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    db_ambulance = await create_ambulance_in_db(ambulance, db)
+    ambulance_index.upsert(db_ambulance.id, db_ambulance.lon, db_ambulance.lat)
+    if db_ambulance.status == Status.AVAILABLE:
+        notify_ambulance_available()
     created_ambulance = convert_ambulance_to_response(db_ambulance, db)
+    background_tasks.add_task(refresh_route_store)
     return created_ambulance
 
 
 @app.get("/ambulances")
-async def list_ambulances(db: Session = Depends(get_db)):
-    ambulances = db.query(AmbulanceDB).all()
-    return ambulances
+async def list_ambulances(request: Request, response: Response, since: Optional[int] = None, fields: Optional[str] = None,
+                          listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    return await versioned_rows(request, response, AmbulanceDB, since, db, fields, listing, load_rows=fleet_state.all)
 
 
 @app.put("/update_ambulance")
-async def update_ambulance(updated_ambulance: AmbulanceUpdate, db: Session = Depends(get_db)):
-    ambulance = get_ambulance_by_id(updated_ambulance.id, db)
+async def update_ambulance(updated_ambulance: AmbulanceUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    ambulance = await get_ambulance_by_id(updated_ambulance.id, db)
     if not ambulance:
         logger.warning(f"Ambulance with ID {updated_ambulance.id} was not found.")
         raise HTTPException(status_code=404, detail="Ambulance not found")
     
-    updated = update_ambulance_in_db(ambulance, updated_ambulance, db)
+    old_base = (ambulance.default_lon, ambulance.default_lat)
+    updated = await update_ambulance_in_db(ambulance, updated_ambulance, db)
+    ambulance_index.upsert(updated.id, updated.lon, updated.lat)
+    if updated.status == Status.AVAILABLE:
+        notify_ambulance_available()
+    if (updated.default_lon, updated.default_lat) != old_base:
+        await invalidate_location(db, *old_base)
+        background_tasks.add_task(refresh_route_store)
     updated_response = convert_ambulance_to_response(updated, db)
     logger.info(f"Ambulance with ID {updated.id} was successfully updated!")
     return updated_response
 
 
 @app.delete("/delete_ambulance")
-async def delete_ambulance(ambulance_id: int, db: Session = Depends(get_db)):
-    db_deleted_ambulance = db.query(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id).first()
+async def delete_ambulance(ambulance_id: int, db: AsyncSession = Depends(get_db)):
+    db_deleted_ambulance = await db.scalar(select(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id))
     if not db_deleted_ambulance:
         logger.warning(f"Ambulance with ID {ambulance_id} was not found.")
         raise HTTPException(status_code=404, detail="Ambulance not found")
 
-    db.delete(db_deleted_ambulance)
-    db.commit()
+    await db.delete(db_deleted_ambulance)
+    await db.commit()
+    ambulance_index.remove(ambulance_id)
     logger.info(f"Ambulance with ID {ambulance_id} was successfully deleted!")
     return {"msg": "Ambulance was successfully deleted"}
 
 
 @app.get("/ambulance_status/{ambulance_id}")
-async def ambulance_status(ambulance_id: int, db: Session = Depends(get_db)):
+async def ambulance_status(ambulance_id: int):
     """Get current status of an ambulance"""
-    ambulance = get_ambulance_by_id(ambulance_id, db)
+    ambulance = fleet_state.get(ambulance_id)
+    if not ambulance:
+        logger.warning(f"Ambulance with ID {ambulance_id} was not found.")
+        raise HTTPException(status_code=404, detail="Ambulance was not found")
 
     return {
-        "id": ambulance.id,
-        "status": ambulance.status,
-        "current_lat": ambulance.lat,
-        "current_lon": ambulance.lon,
-        "base_lat": ambulance.default_lat,
-        "base_lon": ambulance.default_lon
+        "id": ambulance["id"],
+        "status": ambulance["status"],
+        "current_lat": ambulance["lat"],
+        "current_lon": ambulance["lon"],
+        "base_lat": ambulance["default_lat"],
+        "base_lon": ambulance["default_lon"]
     }
 
+
+@app.get("/ambulances/{ambulance_id}/current_incident")
+async def ambulance_current_incident(ambulance_id: int, db: AsyncSession = Depends(get_db)):
+    """The open incident the ambulance is assigned to, or null when it is on none."""
+    if not fleet_state.get(ambulance_id):
+        logger.warning(f"Ambulance with ID {ambulance_id} was not found.")
+        raise HTTPException(status_code=404, detail="Ambulance was not found")
+    incident = await assignment_history.current_incident(db, ambulance_id)
+    return convert_incident_to_response(incident, db) if incident else None
+
 # Hospital Endpoints
 
 @app.post("/create_hospital", response_model=Hospital)
-async def create_hospital(hospital: Hospital, db: Session = Depends(get_db)):
-    hospiital = create_hospital_in_db(hospital, db)
+async def create_hospital(hospital: Hospital, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    hospiital = await create_hospital_in_db(hospital, db)
+    hospital_index.upsert(hospiital.id, hospiital.lon, hospiital.lat)
     created_hospital = convert_hospital_to_response(hospiital, db) 
+    background_tasks.add_task(refresh_route_store)
     return created_hospital
 
 @app.get("/hospitals")
-async def list_hospitals(db: Session = Depends(get_db)):
-    hospitals = db.query(HospitalDB).all()
-    return hospitals
+async def list_hospitals(request: Request, response: Response, since: Optional[int] = None, fields: Optional[str] = None,
+                         listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    return await versioned_rows(request, response, HospitalDB, since, db, fields, listing)
 
 @app.put("/update_hospital")
-async def update_hospital(updated_hospital: Hospital, db: Session = Depends(get_db)):
-    hospital = get_hospital_by_id(updated_hospital.id, db)
+async def update_hospital(updated_hospital: Hospital, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    hospital = await get_hospital_by_id(updated_hospital.id, db)
     if not hospital:
         logger.warning(f"Hospital with ID {updated_hospital.id} was not found.")
         raise HTTPException(status_code=404, detail="Hospital not found")
     
-    updated = update_hospital_in_db(hospital, updated_hospital, db)
+    old_location = (hospital.lon, hospital.lat)
+    updated = await update_hospital_in_db(hospital, updated_hospital, db)
+    hospital_index.upsert(updated.id, updated.lon, updated.lat)
+    if (updated.lon, updated.lat) != old_location:
+        await invalidate_location(db, *old_location)
+        background_tasks.add_task(refresh_route_store)
     logger.info(f"Hospital with ID {updated.id} was successfully updated!")
     return updated
 
 @app.delete("/delete_hospital")
-async def delete_hospital(hospital_id: int, db: Session = Depends(get_db)):
-    hospital = get_hospital_by_id(hospital_id, db)
+async def delete_hospital(hospital_id: int, db: AsyncSession = Depends(get_db)):
+    hospital = await get_hospital_by_id(hospital_id, db)
     if not hospital:
         logger.warning(f"Hospital with ID {hospital_id} was not found.")
         raise HTTPException(status_code=404, detail="Hospital not found")
 
-    db.delete(hospital)
-    db.commit()
+    location = (hospital.lon, hospital.lat)
+    await db.delete(hospital)
+    await db.commit()
+    hospital_index.remove(hospital_id)
+    await invalidate_location(db, *location)
     logger.info(f"Hospital with ID {hospital_id} was successfully deleted!")
     return {"msg": "Hospital was successfully deleted"}
 
 # Emergency Center Endpoints
 @app.post("/create_emergency_center", response_model=EmergencyCenter)
-async def create_emergency_center(emergency_center: EmergencyCenter, db: Session = Depends(get_db)):
-    emergency_center_db = create_emergency_center_in_db(emergency_center, db)
+async def create_emergency_center(emergency_center: EmergencyCenter, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    emergency_center_db = await create_emergency_center_in_db(emergency_center, db)
     created_emergency_center = convert_emergency_center_to_response(emergency_center_db, db) 
+    background_tasks.add_task(refresh_route_store)
     return created_emergency_center
 
 @app.get("/emergency_centers")
-async def list_emergency_centers(db: Session = Depends(get_db)):
-    emergency_centers = db.query(EmergencyCentersDB).all()
-    return emergency_centers
+async def list_emergency_centers(request: Request, response: Response, since: Optional[int] = None, fields: Optional[str] = None,
+                                 listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    return await versioned_rows(request, response, EmergencyCentersDB, since, db, fields, listing)
 
 @app.put("/update_emergency_center")
-async def update_emergency_center(updated_emergency_center: EmergencyCenterUpdate, db: Session = Depends(get_db)):
-    emergency_center = get_emergency_center_by_id(updated_emergency_center.id, db)
+async def update_emergency_center(updated_emergency_center: EmergencyCenterUpdate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    emergency_center = await get_emergency_center_by_id(updated_emergency_center.id, db)
     if not emergency_center:
         logger.warning(f"Emergency Center with ID {updated_emergency_center.id} was not found.")
         raise HTTPException(status_code=404, detail="Emergency Center not found")
     
-    updated = update_emergency_center_in_db(emergency_center, updated_emergency_center, db)
+    old_location = (emergency_center.lon, emergency_center.lat)
+    updated = await update_emergency_center_in_db(emergency_center, updated_emergency_center, db)
+    if (updated.lon, updated.lat) != old_location:
+        await invalidate_location(db, *old_location)
+        background_tasks.add_task(refresh_route_store)
     logger.info(f"Emergency Center with ID {updated.id} was successfully updated!")
     return updated
 
 @app.delete("/delete_emergency_center")
-async def delete_emergency_center(emergency_center_id: int, db: Session = Depends(get_db)):
-    emergency_center = get_emergency_center_by_id(emergency_center_id, db)
+async def delete_emergency_center(emergency_center_id: int, db: AsyncSession = Depends(get_db)):
+    emergency_center = await get_emergency_center_by_id(emergency_center_id, db)
     if not emergency_center:
         logger.warning(f"Emergency Center with ID {emergency_center_id} was not found.")
         raise HTTPException(status_code=404, detail="Emergency Center not found")
 
-    db.delete(emergency_center)
-    db.commit()
+    location = (emergency_center.lon, emergency_center.lat)
+    await db.delete(emergency_center)
+    await db.commit()
+    await invalidate_location(db, *location)
     logger.info(f"Emergency Center with ID {emergency_center_id} was successfully deleted!")
     return {"msg": "Emergency Center was successfully deleted"}
 
 # Patients endpoints
 
 @app.post("/create_patient", response_model=Patient)
-async def create_patient(patient: Patient, db: Session = Depends(get_db)):
-    patient_db = create_patient_in_db(patient, db)
+async def create_patient(patient: Patient, db: AsyncSession = Depends(get_db)):
+    patient_db = await create_patient_in_db(patient, db)
     created_patient = convert_patient_to_response(patient_db, db)
     return created_patient
 
 @app.get("/patients")
-async def list_patients(db: Session = Depends(get_db)):
-    patients = db.query(PatientDB).all()
-    return patients
+async def list_patients(request: Request, response: Response, since: Optional[int] = None, fields: Optional[str] = None,
+                        listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    return await versioned_rows(request, response, PatientDB, since, db, fields, listing)
+
+@app.get("/patients/{patient_id}/incidents")
+async def patient_incidents(patient_id: int, db: AsyncSession = Depends(get_db)):
+    incidents = await patient_links.incidents(db, patient_id)
+    if not incidents and not await get_patient_by_id(patient_id, db):
+        logger.warning(f"Patient with ID {patient_id} was not found.")
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return [convert_incident_to_response(incident, db) for incident in incidents]
 
 @app.put("/update_patient")
-async def update_patient(updated_patient: Patient, db: Session = Depends(get_db)):
-    patient = get_patient_by_id(updated_patient.id, db)
+async def update_patient(updated_patient: Patient, db: AsyncSession = Depends(get_db)):
+    patient = await get_patient_by_id(updated_patient.id, db)
     if not patient:
         logger.warning(f"Patient with ID {updated_patient.id} was not found.")
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    updated = update_patient_in_db(patient, updated_patient, db)
+    updated = await update_patient_in_db(patient, updated_patient, db)
     logger.info(f"Patient with ID {updated.id} was successfully updated!")
     return updated
 
 @app.delete("/delete_patient")
-async def delete_patient(patient_id: int, db: Session = Depends(get_db)):
-    patient = get_patient_by_id(patient_id, db)
+async def delete_patient(patient_id: int, db: AsyncSession = Depends(get_db)):
+    patient = await get_patient_by_id(patient_id, db)
     if not patient:
         logger.warning(f"Patient with ID {patient_id} was not found.")
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    db.delete(patient)
-    db.commit()
+    await db.delete(patient)
+    await db.commit()
     logger.info(f"Patient with ID {patient_id} was successfully deleted!")
     return {"msg": "Patient was successfully deleted"}
 
 # User Endpoints
 @app.post("/create_user")
-async def create_user(user: User, db: Session = Depends(get_db)):
-    user_db = create_user_in_db(user, db)
+async def create_user(user: User, db: AsyncSession = Depends(get_db)):
+    user_db = await create_user_in_db(user, db)
     created_user = convert_user_to_response(user_db, db)
     return created_user
 
 @app.get("/users")
-async def list_users(db: Session = Depends(get_db)):
-    users = db.query(UserDB).all()
-    return users
+async def list_users(request: Request, response: Response, since: Optional[int] = None, fields: Optional[str] = None,
+                     listing: ListQuery = Depends(), db: AsyncSession = Depends(get_db)):
+    return await versioned_rows(request, response, UserDB, since, db, fields, listing)
 
 @app.put("/update_user")
-async def update_user(updated_user: User, db: Session = Depends(get_db)):
-    user = get_user_by_id(updated_user.id, db)
+async def update_user(updated_user: User, db: AsyncSession = Depends(get_db)):
+    user = await get_user_by_id(updated_user.id, db)
     if not user:
         logger.warning(f"User with ID {updated_user.id} was not found.")
         raise HTTPException(status_code=404, detail="User not found")
     
-    updated = update_user_in_db(user, updated_user, db)
+    updated = await update_user_in_db(user, updated_user, db)
     logger.info(f"User with ID {updated.id} was successfully updated!")
     return updated
 
 @app.delete("/delete_user")
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = get_user_by_id(user_id, db)
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await get_user_by_id(user_id, db)
     if not user:
         logger.warning(f"User with ID {user_id} was not found.")
         raise HTTPException(status_code=404, detail="User not found")
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    session_cache.revoke_user(user_id)
     logger.info(f"User with ID {user_id} was successfully deleted!")
     return {"msg": "User was successfully deleted"}
 
 @app.post("/login")
-async def check_login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.username == login_data.username).first()
+async def check_login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(UserDB).filter(UserDB.username == login_data.username))
 
-    if not user or not verify_password(PasswordCheck(plain_password=login_data.password, hashed_password=user.password)):
+    if not user or not await verify_password(login_data.password, user.password):
         logger.warning(f"Login failed for user {login_data.username}")
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
+    token, expires_at = issue_token(user)
     logger.info(f"User {login_data.username} logged in successfully")
-    return {"msg": "Login successful", "user_id": user.id, "role": user.role}
+    return {"msg": "Login successful", "user_id": user.id, "role": user.role, "token": token, "expires_at": expires_at}
+
+@app.get("/session")
+async def current_session(request: Request):
+    """Who the bearer token belongs to; lets the frontend check a stored token is still valid."""
+    session = request.state.session
+    if not session:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return {"user_id": session.user_id, "role": session.role, "expires_at": session.expires_at}
 
 # Emergency Dispatch Endpoints
 
+class DispatchClaim:
+    """
+    The incidents and units one dispatch works on, from choosing them until its commit marks
+    the units BUSY; other dispatches skip them meanwhile. Claiming never awaits, so on the event
+    loop checking and taking a unit is one step, while the ETA and route lookups of concurrent
+    dispatches still overlap. Without it two dispatches could read the same free unit and both
+    send it, the second mission silently replacing the first.
+    """
+    units = set()
+    incidents = set()
+
+    def __init__(self):
+        self._units = []
+        self._incidents = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        DispatchClaim.units.difference_update(self._units)
+        DispatchClaim.incidents.difference_update(self._incidents)
+
+    def incident(self, incident_id):
+        """Take an incident. False if another dispatch is working on it."""
+        if incident_id in DispatchClaim.incidents:
+            return False
+        DispatchClaim.incidents.add(incident_id)
+        self._incidents.append(incident_id)
+        return True
+
+    @staticmethod
+    def _free(ambulance_id):
+        # The fleet state is updated when a dispatch commits, so a unit read as Available
+        # before another dispatch sent it is not taken again
+        state = fleet_state.get(ambulance_id)
+        return ambulance_id not in DispatchClaim.units and state is not None and state["status"] == Status.AVAILABLE
+
+    def free(self, ambulances):
+        """The ambulances no other dispatch has taken."""
+        return [amb for amb in ambulances if self._free(amb.id)]
+
+    def take(self, ranked, needed=None):
+        """
+        Take (ambulance, eta) pairs in order, skipping the ones taken since they were ranked,
+        until their capacity covers `needed` (every free one without it).
+        """
+        selected = []
+        covered = 0
+        for amb, eta in ranked:
+            if needed is not None and covered >= needed:
+                break
+            if not self._free(amb.id):
+                continue
+            DispatchClaim.units.add(amb.id)
+            self._units.append(amb.id)
+            selected.append((amb, eta))
+            covered += amb.capacity or 0
+        return selected
+
+
 @app.post("/dispatch/{incident_id}")
-async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    with DispatchClaim() as claim:
+        if not claim.incident(incident_id):
+            return {"msg": "Incident is already being dispatched"}
+        return await _dispatch_incident(incident_id, db, claim)
+
+
+async def _queue_without_units(incident, all_active_incidents, db: AsyncSession):
+    incident.status = Status.QUEUED
+    await db.commit()
+    await db.refresh(incident)
+    enqueue_incident(incident)
+    return {
+        "msg": "No available ambulances, incident added to queue",
+        "incident_id": incident.id,
+        "position_in_queue": all_active_incidents.index(incident) + 1,
+        "total_active_incidents": len(all_active_incidents)
+    }
+
+
+async def _dispatch_incident(incident_id: int, db: AsyncSession, claim: DispatchClaim):
     start_time = datetime.now()
-    incident = db.query(IncidentDB).filter(
+    phase_timings = {}
+    phase_start = time.perf_counter()
+    incident = await db.scalar(select(IncidentDB).filter(
         IncidentDB.id == incident_id,
         IncidentDB.status == Status.ACTIVE
-    ).first()
+    ))
 
     if not incident:
         logger.warning(f"Dispatch failed: Incident {incident_id} not found or not active")
         return {"msg": "Incident not found or already resolved"}
 
-    all_active_incidents = db.query(IncidentDB).filter(
+    all_active_incidents = (await db.scalars(select(IncidentDB).filter(
         IncidentDB.status == Status.ACTIVE
-    ).order_by(IncidentDB.severity).all()
+    ).order_by(IncidentDB.severity))).all()
 
-    available_ambulances = get_available_ambulances(db)
-    hospitals = filter_hospitals_by_type(incident, db)
+    available_ambulances = claim.free(await get_available_ambulances(db))
+    hospitals = await filter_hospitals_by_type(incident, db)
+    phase_timings["db_query_ms"] = _elapsed_ms(phase_start)
 
     if not available_ambulances:
         logger.warning(f"No available ambulances for incident {incident_id}, incident added to queue")
-        incident.status = Status.QUEUED
-        db.commit()
-        db.refresh(incident)
-        return {
-            "msg": "No available ambulances, incident added to queue",
-            "incident_id": incident_id,
-            "position_in_queue": all_active_incidents.index(incident) + 1,
-            "total_active_incidents": len(all_active_incidents)
-        }
+        record_dispatch_metrics("dispatch", phase_timings, None, [Status.QUEUED])
+        return await _queue_without_units(incident, all_active_incidents, db)
 
     num_ambulances = len(available_ambulances)
     num_incidents = len(all_active_incidents)
@@ -710,8 +1296,9 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
                 f"not in priority queue"
             )
             incident.status = Status.QUEUED
-            db.commit()
-            db.refresh(incident)
+            await db.commit()
+            await db.refresh(incident)
+            enqueue_incident(incident)
             return {
                 "msg": "Incident queued - higher priority incidents being handled first",
                 "incident_id": incident_id,
@@ -721,8 +1308,12 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
                 "available_ambulances": num_ambulances
             }
 
-    best_amb, best_eta, sorted_etas = get_eta(available_ambulances, incident)
-    closest_hospital, hospital_eta, _ = get_eta(hospitals, incident)
+    phase_start = time.perf_counter()
+    (best_amb, best_eta, sorted_etas), (closest_hospital, hospital_eta, _) = await asyncio.gather(
+        get_eta(nearest_ambulance_candidates(available_ambulances, incident), incident),
+        get_eta(nearest_hospital_candidates(hospitals, incident), incident),
+    )
+    phase_timings["eta_matrix_ms"] = _elapsed_ms(phase_start)
 
     if not best_amb or best_eta is None or not closest_hospital or hospital_eta is None:
         logger.warning(f"Could not calculate ETA for incident {incident_id}")
@@ -731,27 +1322,25 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
     victims = incident.nr_patients
 
     # Select ambulances until victim quota is met
-    selected = []
-    capacity_covered = 0
-    for amb, eta in sorted_etas:
-        if capacity_covered >= victims:
-            break
-        selected.append((amb, eta))
-        capacity_covered += amb.capacity
+    selected = claim.take(sorted_etas, victims)
+    if not selected:
+        logger.warning(f"Ambulances for incident {incident_id} were sent elsewhere meanwhile, incident added to queue")
+        record_dispatch_metrics("dispatch", phase_timings, None, [Status.QUEUED])
+        return await _queue_without_units(incident, all_active_incidents, db)
+    capacity_covered = sum(amb.capacity or 0 for amb, _ in selected)
 
     partially_covered = capacity_covered < victims
     dispatched_ids = []
     dispatch_details = []
-    routes_map = {}
-    hospital_routes_map = {}
 
-    for amb, eta in selected:
-        details = await _dispatch_single_ambulance(
-            amb, eta, incident, closest_hospital, hospital_eta, background_tasks, db
-        )
+    phase_start = time.perf_counter()
+    all_details = await _dispatch_ambulances(selected, incident, closest_hospital, hospital_eta)
+    phase_timings["route_geometry_ms"] = _elapsed_ms(phase_start)
 
-        routes_map[str(amb.id)] = details["route_to_incident"]
-        hospital_routes_map[str(amb.id)] = details["route_to_hospital"]
+    for (amb, eta), details in zip(selected, all_details):
+        db.add(assignment_history.open(
+            incident.id, amb.id, store_route(details["route_to_incident"]), store_route(details["route_to_hospital"])
+        ))
         dispatched_ids.append(details["ambulance_id"])
         dispatch_details.append(details)
 
@@ -765,6 +1354,7 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
         )
 
     # Only set ASSIGNED if fully covered, otherwise QUEUED with remaining victims
+    phase_start = time.perf_counter()
     remaining_victims = 0
     if partially_covered:
         remaining_victims = victims - capacity_covered
@@ -772,13 +1362,10 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
         incident.status = Status.QUEUED
         incident.assigned_units = dispatched_ids
         incident.assigned_hospital = closest_hospital.id
-        incident.route_to_incident = routes_map
-        incident.route_to_hospital = hospital_routes_map
         flag_modified(incident, "assigned_units")
-        flag_modified(incident, "route_to_incident")
-        flag_modified(incident, "route_to_hospital")
-        db.commit()
-        db.refresh(incident)
+        await db.commit()
+        await db.refresh(incident)
+        enqueue_incident(incident)
         logger.warning(
             f"Incident {incident_id} partially covered: {capacity_covered}/{victims} victims assigned. "
             f"Re-queued with {remaining_victims} remaining."
@@ -787,18 +1374,17 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
         incident.status = Status.ASSIGNED
         incident.assigned_units = dispatched_ids
         incident.assigned_hospital = closest_hospital.id
-        incident.route_to_incident = routes_map
-        incident.route_to_hospital = hospital_routes_map
         flag_modified(incident, "assigned_units")
-        flag_modified(incident, "route_to_incident")
-        flag_modified(incident, "route_to_hospital")
-        db.commit()
-        db.refresh(incident)
+        await db.commit()
+        await db.refresh(incident)
 
     end_time = datetime.now()
     incident.processing_time_seconds = (end_time - start_time).total_seconds()
-    db.commit()
-    
+    await db.commit()
+    phase_timings["commit_ms"] = _elapsed_ms(phase_start)
+    logger.info(f"Dispatch timings for incident {incident_id}: {phase_timings}")
+    record_dispatch_metrics("dispatch", phase_timings, incident.processing_time_seconds, [incident.status])
+
     return {
         "msg": (
             f"{len(selected)} ambulance(s) dispatched"
@@ -826,108 +1412,138 @@ async def dispatch(incident_id: int, background_tasks: BackgroundTasks, db: Sess
             "assigned_units": incident.assigned_units,
             "assigned_hospital": incident.assigned_hospital
         },
-        "processing_time_seconds": incident.processing_time_seconds
+        "processing_time_seconds": incident.processing_time_seconds,
+        "phase_timings_ms": phase_timings
     }
 
-CANCELLATION_TOKENS = {}
+async def cancel_and_return_to_base(ambulance_id: int, db: AsyncSession):
+    if movement_engine.cancel(ambulance_id):
+        logger.info(f"Cancelling active mission for ambulance {ambulance_id}")
 
-async def cancel_and_return_to_base(ambulance_id: int, db: Session):
-    if ambulance_id in CANCELLATION_TOKENS:
-        logger.info(f"Cancelling active animation task for ambulance {ambulance_id}")
-        CANCELLATION_TOKENS[ambulance_id].set()
-        del CANCELLATION_TOKENS[ambulance_id]
-        await asyncio.sleep(0.1)
-
-    ambulance = db.query(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id).first()
+    ambulance = await db.scalar(select(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id))
     if not ambulance:
         return
+    fleet_state.overlay(ambulance)
 
-    route_to_base = get_route_geometry(
-        ambulance.lon, ambulance.lat,
-        ambulance.default_lon, ambulance.default_lat
+    route_to_base, back_to_base_eta = await asyncio.gather(
+        get_route_geometry(
+            ambulance.lon, ambulance.lat,
+            ambulance.default_lon, ambulance.default_lat
+        ),
+        get_return_eta(ambulance),
     )
-    back_to_base_eta = get_return_eta(ambulance)
     if not route_to_base:
         route_to_base = [[ambulance.lon, ambulance.lat], [ambulance.default_lon, ambulance.default_lat]]
         back_to_base_eta = 1.0
 
     ambulance.status = Status.AVAILABLE
-    db.commit()
+    await db.commit()
+    notify_ambulance_available()
 
-    asyncio.create_task(
-        animate_return_to_base(
-            ambulance_id,
-            route_to_base,
-            back_to_base_eta
-        )
-    )
+    logger.info(f"Ambulance {ambulance_id} starting return to base...")
+    movement_engine.start(ambulance_id, [Leg(RETURNING, route_to_base, back_to_base_eta)])
 
-async def animate_return_to_base(ambulance_id: int, route_to_base, back_to_base_eta):
-    db = SessionLocal()
-    logger.info(f"Ambulance {ambulance_id} starting return-to-base animation...")
-    try:
-        ambulance = get_ambulance_by_id(ambulance_id, db)
-        if not ambulance:
-            return
-        
-        cancel_event = asyncio.Event()
-        CANCELLATION_TOKENS[ambulance_id] = cancel_event
+MAX_CONCURRENT_AMBULANCE_DISPATCHES = int(os.getenv("MAX_CONCURRENT_AMBULANCE_DISPATCHES", "4"))
 
-        point_counter = 0
-        commit_every_n_points = 3
 
-        for coord in route_to_base:
-            if cancel_event.is_set():
-                logger.info(f"Return-to-base animation for ambulance {ambulance_id} intercepted/cancelled.")
-                return
+def _elapsed_ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
 
-            if not coord or len(coord) < 2: continue
 
-            ambulance.lon = coord[0]
-            ambulance.lat = coord[1]
-            point_counter += 1
-            if point_counter % commit_every_n_points == 0 or coord == route_to_base[-1]:
-                try:
-                    db.commit()
-                except Exception as e:
-                    logger.error(f"DB commit error for ambulance {ambulance_id}: {e}")
-                    db.rollback()
+def record_dispatch_metrics(path, phase_timings, processing_seconds, statuses):
+    for phase, ms in phase_timings.items():
+        DISPATCH_PHASE_SECONDS.observe(ms / 1000, path=path, phase=phase.removesuffix("_ms"))
+    if processing_seconds is not None:
+        DISPATCH_SECONDS.observe(processing_seconds, path=path)
+    for status in statuses:
+        DISPATCHES.inc(path=path, status=status)
 
-            await asyncio.sleep((back_to_base_eta / len(route_to_base)) * 60)
 
-        if ambulance_id in CANCELLATION_TOKENS and CANCELLATION_TOKENS[ambulance_id] == cancel_event:
-            del CANCELLATION_TOKENS[ambulance_id]
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # The route template keeps ids out of the labels, unmatched paths are grouped together
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
 
-        logger.info(f"Ambulance {ambulance_id} successfully returned to base.")
 
-    except Exception as e:
-        logger.error(f"Error returning ambulance {ambulance_id} to base: {e}")
-    finally:
-        db.close()
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(Metrics.render(), media_type=Metrics.CONTENT_TYPE)
+
+
+async def _dispatch_ambulances(selected, incident, closest_hospital, hospital_eta):
+    """
+    Dispatch the selected (ambulance, eta) pairs to the incident concurrently.
+    The incident -> hospital leg is the same for every unit, so it is fetched once here.
+    Returns the dispatch details in the same order as `selected`.
+    """
+    route_to_hospital = await get_route_geometry(
+        incident.lon, incident.lat,
+        closest_hospital.lon, closest_hospital.lat
+    )
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_AMBULANCE_DISPATCHES)
+
+    async def dispatch_one(amb, eta):
+        async with semaphore:
+            return await _dispatch_single_ambulance(
+                amb, eta, incident, closest_hospital, hospital_eta,
+                route_to_hospital=route_to_hospital
+            )
+
+    return await asyncio.gather(*(dispatch_one(amb, eta) for amb, eta in selected))
+
 
 async def _dispatch_single_ambulance(
-    amb, eta, incident, closest_hospital, hospital_eta, background_tasks=None, db=None
+    amb, eta, incident, closest_hospital, hospital_eta, background_tasks=None, route_to_hospital=None
 ):
-    
-    if amb.id in CANCELLATION_TOKENS:
+    if movement_engine.cancel(amb.id):
         logger.info(f"INTERCEPT: Ambulance {amb.id} is being turned around mid-route!")
-        CANCELLATION_TOKENS[amb.id].set()
-        del CANCELLATION_TOKENS[amb.id]
 
-    back_to_base_eta = get_return_eta(amb)
+    # The hospital -> base leg is static and normally comes from the precomputed route store
+    with AMBULANCE_PHASE_SECONDS.time(phase="stored_route"):
+        stored_return = await get_stored_route(
+            (closest_hospital.lon, closest_hospital.lat),
+            (amb.default_lon, amb.default_lat)
+        )
 
-    route_to_incident = get_route_geometry(
-        amb.lon, amb.lat,
-        incident.lon, incident.lat
-    )
-    route_to_hospital = get_route_geometry(
-        incident.lon, incident.lat,
-        closest_hospital.lon, closest_hospital.lat
-    )
-    route_to_assigned_unit = get_route_geometry(
-        closest_hospital.lon, closest_hospital.lat,
-        amb.default_lon, amb.default_lat
-    )
+    # The remaining legs are independent of each other, fetch them in parallel
+    legs = {
+        "route_to_incident": get_route_geometry(
+            amb.lon, amb.lat,
+            incident.lon, incident.lat
+        ),
+    }
+    if stored_return is None:
+        legs["back_to_base_eta"] = get_return_eta(amb)
+        legs["route_to_assigned_unit"] = get_route_geometry(
+            closest_hospital.lon, closest_hospital.lat,
+            amb.default_lon, amb.default_lat
+        )
+    if route_to_hospital is None:
+        legs["route_to_hospital"] = get_route_geometry(
+            incident.lon, incident.lat,
+            closest_hospital.lon, closest_hospital.lat
+        )
+    with AMBULANCE_PHASE_SECONDS.time(phase="route_geometry"):
+        fetched = dict(zip(legs, await asyncio.gather(*legs.values())))
+
+    route_to_incident = fetched["route_to_incident"]
+    route_to_hospital = fetched.get("route_to_hospital", route_to_hospital)
+    if stored_return is not None:
+        route_to_assigned_unit, back_to_base_eta = stored_return
+    else:
+        route_to_assigned_unit = fetched["route_to_assigned_unit"]
+        back_to_base_eta = fetched["back_to_base_eta"]
+        asyncio.create_task(refresh_route_store())
 
     scene_time = 1
     hospital_time = 1
@@ -937,24 +1553,16 @@ async def _dispatch_single_ambulance(
     amb.status = Status.BUSY
     amb.available_at = return_time
 
-    # Freeze all values into locals so the task captures correct values
-    _amb_id = amb.id
-    _inc_id = incident.id
-    _route_to_incident = route_to_incident
-    _route_to_hospital = route_to_hospital
-    _route_to_assigned_unit = route_to_assigned_unit
-    _eta = eta
-    _hospital_eta = hospital_eta
-    _back_to_base_eta = back_to_base_eta
-
-
-    asyncio.create_task(
-        animate_ambulance_movement(
-                _amb_id, _inc_id,
-                _route_to_incident, _route_to_hospital, _route_to_assigned_unit,
-                _eta, scene_time, hospital_eta, hospital_time, _back_to_base_eta,
-            )
-        )
+    logger.info(f"Ambulance {amb.id} starting journey to incident {incident.id}")
+    movement_engine.start(
+        amb.id,
+        mission_legs(
+            route_to_incident, eta, scene_time,
+            route_to_hospital, hospital_eta, hospital_time,
+            route_to_assigned_unit, back_to_base_eta,
+        ),
+        incident_id=incident.id,
+    )
 
     return {
         "ambulance_id": amb.id,
@@ -971,122 +1579,364 @@ async def _dispatch_single_ambulance(
         "route_to_assigned_unit": route_to_assigned_unit,
     }
 
+def _record_assignment(incident, selected, all_details, closest_hospital, db: AsyncSession):
+    """
+    Add the dispatched units to the incident, each with an assignment row holding its routes.
+    It becomes ASSIGNED once their capacity covers the patients, otherwise it stays QUEUED
+    for the remainder.
+    """
+    current_units = list(incident.assigned_units or [])
+
+    for (amb, eta), details in zip(selected, all_details):
+        if amb.id not in current_units:
+            current_units.append(amb.id)
+        db.add(assignment_history.open(
+            incident.id, amb.id, store_route(details["route_to_incident"]), store_route(details["route_to_hospital"])
+        ))
+
+    incident.assigned_units = current_units
+    incident.assigned_hospital = closest_hospital.id
+
+    capacity_covered = sum(amb.capacity or 0 for amb, _ in selected)
+    if capacity_covered < incident.nr_patients:
+        incident.nr_patients = incident.nr_patients - capacity_covered
+        incident.status = Status.QUEUED
+    else:
+        incident.status = Status.ASSIGNED
+
+    flag_modified(incident, "assigned_units")
+
 LAST_QUEUE_RUN = 0
 
+# The processor normally sleeps until an incident is queued or an ambulance frees up;
+# the timeout only re-syncs with the database in case a change bypassed the queue.
+QUEUE_RESYNC_SECONDS = float(os.getenv("QUEUE_RESYNC_SECONDS", "30"))
+
+# "greedy" serves queued incidents one at a time in priority order,
+# "batch" assigns all of them at once with BatchAssignment.
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "greedy").lower()
+
+dispatch_queue = DispatchQueue()
+
+
+def enqueue_incident(incident):
+    dispatch_queue.push(incident.id, incident.severity, incident.started_at)
+
+
+def notify_ambulance_available():
+    dispatch_queue.notify()
+
+
+async def sync_dispatch_queue(db: AsyncSession):
+    """Make the in-memory queue match the QUEUED incidents stored in the database."""
+    queued = (await db.scalars(select(IncidentDB).filter(IncidentDB.status == Status.QUEUED))).all()
+    queued_ids = {incident.id for incident in queued}
+    for incident in queued:
+        if incident.id not in dispatch_queue:
+            enqueue_incident(incident)
+    for incident_id in list(dispatch_queue._entries):
+        if incident_id not in queued_ids:
+            dispatch_queue.remove(incident_id)
+
+
 async def process_queue_background():
     logger.info("Starting Queue Processor...")
     global LAST_QUEUE_RUN
+
+    db = AsyncSessionLocal()
+    try:
+        await sync_dispatch_queue(db)
+    finally:
+        await db.close()
+
     while True:
-        db = SessionLocal()
         LAST_QUEUE_RUN = time.time()
+        woken = await dispatch_queue.wait(QUEUE_RESYNC_SECONDS)
+        LAST_QUEUE_RUN = time.time()
+        db = AsyncSessionLocal()
         try:
-            next_incident = db.query(IncidentDB).filter(
-                IncidentDB.status == Status.QUEUED
-            ).order_by(
-                IncidentDB.severity.asc(),
-                IncidentDB.started_at.asc()
-            ).first()
+            if not woken:
+                await sync_dispatch_queue(db)
+            if len(dispatch_queue):
+                with QUEUE_DRAIN_SECONDS.time():
+                    await drain_dispatch_queue(db)
+        except Exception as e:
+            logger.error(f"Queue processor error: {e}")
+        finally:
+            await db.close()
 
-            if not next_incident:
-                await asyncio.sleep(5)
-                continue
 
-            available_ambulances = get_available_ambulances(db)
+async def drain_dispatch_queue(db: AsyncSession):
+    """Dispatch queued incidents in priority order for as long as ambulances are free."""
+    if DISPATCH_MODE == "batch" and await _drain_dispatch_queue_batch(db):
+        return
+
+    while True:
+        with DispatchClaim() as claim:
+            available_ambulances = claim.free(await get_available_ambulances(db))
             if not available_ambulances:
-                await asyncio.sleep(5)
-                continue
+                return
 
-            hospitals = filter_hospitals_by_type(next_incident, db)
-            if not hospitals:
-                await asyncio.sleep(5)
+            popped = dispatch_queue.pop()
+            if popped is None:
+                return
+            incident_id, enqueued_at = popped
+
+            next_incident = await db.scalar(select(IncidentDB).filter(
+                IncidentDB.id == incident_id,
+                IncidentDB.status == Status.QUEUED
+            ))
+            if not next_incident:
                 continue
 
-            logger.info(f"Processing Queued Incident {next_incident.id} (Severity {next_incident.severity})")
-            start_time = datetime.now()
-            best_amb, best_eta, sorted_etas = get_eta(available_ambulances, next_incident)
-            closest_hospital, hospital_eta, _ = get_eta(hospitals, next_incident)
+            dispatched = claim.incident(incident_id) and await _dispatch_queued_incident(
+                next_incident, available_ambulances, db, claim
+            )
+        if not dispatched:
+            # Routing failed or its units were taken meanwhile, retry on the next wake-up instead of spinning on it
+            dispatch_queue.push(next_incident.id, next_incident.severity, next_incident.started_at, enqueued_at)
+            return
 
-            if not best_amb or best_eta is None or not closest_hospital or hospital_eta is None:
-                logger.error(f"Could not calculate route for queued incident {next_incident.id}")
-                await asyncio.sleep(2)
-                continue
+        QUEUE_WAIT_SECONDS.observe(dispatch_queue.record_dispatch(enqueued_at))
+        if next_incident.status == Status.QUEUED:
+            dispatch_queue.push(next_incident.id, next_incident.severity, next_incident.started_at, enqueued_at)
 
-            victims = next_incident.nr_patients
-
-            # Select ambulances until victim quota is met
-            selected = []
-            capacity_covered = 0
-            for amb, eta in sorted_etas:
-                if capacity_covered >= victims:
-                    break
-                selected.append((amb, eta))
-                capacity_covered += amb.capacity
-
-            partially_covered = capacity_covered < victims
-            current_units = list(next_incident.assigned_units or [])
-            current_routes = dict(next_incident.route_to_incident or {})
-            current_hosp_routes = dict(next_incident.route_to_hospital or {})
-
-            for amb, eta in selected:
-                details = await _dispatch_single_ambulance(
-                    amb, eta, next_incident, closest_hospital, hospital_eta, None, db
-                )
-
-                if amb.id not in current_units:
-                    current_units.append(amb.id)
-                current_routes[str(amb.id)] = details["route_to_incident"]
-                current_hosp_routes[str(amb.id)] = details["route_to_hospital"]
-
-                logger.info(
-                    f"Queue: Ambulance {amb.id} dispatched to Incident {next_incident.id}. "
-                    f"ETA: {eta}min, Total: {details['total_time']}min."
-                )
-            next_incident.assigned_units = current_units
-            next_incident.assigned_hospital = closest_hospital.id
-            next_incident.route_to_incident = current_routes
-            next_incident.route_to_hospital = current_hosp_routes
-
-            if partially_covered:
-                remaining_victims = victims - capacity_covered
-                next_incident.nr_patients = remaining_victims
-                next_incident.status = Status.QUEUED
-                logger.warning(
-                    f"Queue: Incident {next_incident.id} partially covered: "
-                    f"{capacity_covered}/{victims} victims. Re-queued with {remaining_victims} remaining."
-                )
-            else:
-                next_incident.status = Status.ASSIGNED
-            
-            flag_modified(next_incident, "assigned_units")
-            flag_modified(next_incident, "route_to_incident")
-            flag_modified(next_incident, "route_to_hospital")
-            end_time = datetime.now()
-            next_incident.processing_time_seconds = (end_time - start_time).total_seconds()
-            db.commit()
-            db.refresh(next_incident)
 
-        except Exception as e:
-            logger.error(f"Queue processor error: {e}")
-        finally:
-            db.close()
-            await asyncio.sleep(2)
+async def _dispatch_queued_incident(next_incident, available_ambulances, db: AsyncSession, claim: DispatchClaim):
+    """Dispatch ambulances to one queued incident. Returns False if no route could be computed or no unit is left."""
+    start_time = datetime.now()
+    phase_timings = {}
+    phase_start = time.perf_counter()
+    hospitals = await filter_hospitals_by_type(next_incident, db)
+    phase_timings["db_query_ms"] = _elapsed_ms(phase_start)
+    if not hospitals:
+        return False
+
+    logger.info(f"Processing Queued Incident {next_incident.id} (Severity {next_incident.severity})")
+    phase_start = time.perf_counter()
+    (best_amb, best_eta, sorted_etas), (closest_hospital, hospital_eta, _) = await asyncio.gather(
+        get_eta(nearest_ambulance_candidates(available_ambulances, next_incident), next_incident),
+        get_eta(nearest_hospital_candidates(hospitals, next_incident), next_incident),
+    )
+    phase_timings["eta_matrix_ms"] = _elapsed_ms(phase_start)
+
+    if not best_amb or best_eta is None or not closest_hospital or hospital_eta is None:
+        logger.error(f"Could not calculate route for queued incident {next_incident.id}")
+        return False
+
+    victims = next_incident.nr_patients
+
+    # Select ambulances until victim quota is met
+    selected = claim.take(sorted_etas, victims)
+    if not selected:
+        return False
+    capacity_covered = sum(amb.capacity or 0 for amb, _ in selected)
+
+    phase_start = time.perf_counter()
+    all_details = await _dispatch_ambulances(selected, next_incident, closest_hospital, hospital_eta)
+    phase_timings["route_geometry_ms"] = _elapsed_ms(phase_start)
+
+    for (amb, eta), details in zip(selected, all_details):
+        logger.info(
+            f"Queue: Ambulance {amb.id} dispatched to Incident {next_incident.id}. "
+            f"ETA: {eta}min, Total: {details['total_time']}min."
+        )
+    _record_assignment(next_incident, selected, all_details, closest_hospital, db)
+
+    if next_incident.status == Status.QUEUED:
+        logger.warning(
+            f"Queue: Incident {next_incident.id} partially covered: "
+            f"{capacity_covered}/{victims} victims. Re-queued with {next_incident.nr_patients} remaining."
+        )
+
+    end_time = datetime.now()
+    next_incident.processing_time_seconds = (end_time - start_time).total_seconds()
+    phase_start = time.perf_counter()
+    await db.commit()
+    await db.refresh(next_incident)
+    phase_timings["commit_ms"] = _elapsed_ms(phase_start)
+    logger.info(f"Queue: dispatch timings for incident {next_incident.id}: {phase_timings}")
+    record_dispatch_metrics("queue", phase_timings, next_incident.processing_time_seconds, [next_incident.status])
+    return True
+
+
+async def _drain_dispatch_queue_batch(db: AsyncSession):
+    """Batch mode drain. Returns False if the matrix failed and the greedy loop should run instead."""
+    with DispatchClaim() as claim:
+        available_ambulances = claim.free(await get_available_ambulances(db))
+        if not available_ambulances:
+            return True
+        queued = (await db.scalars(select(IncidentDB).filter(
+            IncidentDB.status == Status.QUEUED
+        ).order_by(IncidentDB.severity, IncidentDB.started_at))).all()
+        queued = [incident for incident in queued if claim.incident(incident.id)]
+        if not queued:
+            return True
+
+        dispatched = await _batch_dispatch(queued, available_ambulances, db, claim)
+        if dispatched is None:
+            return False
+
+    for incident, _, _ in dispatched:
+        enqueued_at = dispatch_queue.take(incident.id)
+        if enqueued_at is None:
+            continue
+        QUEUE_WAIT_SECONDS.observe(dispatch_queue.record_dispatch(enqueued_at))
+        if incident.status == Status.QUEUED:
+            dispatch_queue.push(incident.id, incident.severity, incident.started_at, enqueued_at)
+    return True
+
+
+async def _batch_dispatch(incidents, available_ambulances, db: AsyncSession, claim: DispatchClaim):
+    """
+    Assign ambulances to all the given incidents at once from a single ambulance x incident
+    ETA matrix, weighting response times by severity instead of serving incidents one by one.
+    Returns (incident, selected units, hospital) for every incident that got units,
+    or None if the matrix could not be computed.
+    """
+    start_time = datetime.now()
+    phase_timings = {}
+    phase_start = time.perf_counter()
+    durations = await get_duration_matrix(
+        [(amb.lon, amb.lat) for amb in available_ambulances],
+        [(incident.lon, incident.lat) for incident in incidents],
+    )
+    phase_timings["eta_matrix_ms"] = _elapsed_ms(phase_start)
+    if durations is None:
+        logger.error("Batch dispatch: could not calculate the ETA matrix")
+        return None
+
+    phase_start = time.perf_counter()
+    plan = solve_assignment(
+        [(incident.severity, incident.nr_patients) for incident in incidents],
+        [amb.capacity or 0 for amb in available_ambulances],
+        durations,
+    )
+    phase_timings["assignment_ms"] = _elapsed_ms(phase_start)
+
+    # A unit sent by another dispatch while the matrix was fetched is dropped from its incident
+    planned = [
+        (incident, claim.take([(available_ambulances[a], round(durations[a][i] / 60, 1)) for a in plan[i]]))
+        for i, incident in enumerate(incidents) if plan[i]
+    ]
+    planned = [(incident, selected) for incident, selected in planned if selected]
+    phase_start = time.perf_counter()
+    hospitals = [await filter_hospitals_by_type(incident, db) for incident, _ in planned]
+    hospital_etas = await asyncio.gather(*(
+        get_eta(nearest_hospital_candidates(candidates, incident), incident)
+        for (incident, _), candidates in zip(planned, hospitals)
+    ))
+    phase_timings["hospital_eta_ms"] = _elapsed_ms(phase_start)
+
+    dispatchable = []
+    for (incident, selected), (closest_hospital, hospital_eta, _) in zip(planned, hospital_etas):
+        if not closest_hospital or hospital_eta is None:
+            logger.warning(f"Batch dispatch: no reachable hospital for incident {incident.id}")
+            continue
+        dispatchable.append((incident, selected, closest_hospital, hospital_eta))
+
+    phase_start = time.perf_counter()
+    all_details = await asyncio.gather(*(
+        _dispatch_ambulances(selected, incident, closest_hospital, hospital_eta)
+        for incident, selected, closest_hospital, hospital_eta in dispatchable
+    ))
+    phase_timings["route_geometry_ms"] = _elapsed_ms(phase_start)
+
+    dispatched = []
+    processing_time = (datetime.now() - start_time).total_seconds()
+    for (incident, selected, closest_hospital, _), details in zip(dispatchable, all_details):
+        _record_assignment(incident, selected, details, closest_hospital, db)
+        incident.processing_time_seconds = processing_time
+        dispatched.append((incident, selected, closest_hospital))
+        logger.info(
+            f"Batch: Ambulance(s) {[amb.id for amb, _ in selected]} dispatched to Incident {incident.id} "
+            f"(severity {incident.severity}), ETAs {[eta for _, eta in selected]}min."
+        )
+
+    phase_start = time.perf_counter()
+    await db.commit()
+    phase_timings["commit_ms"] = _elapsed_ms(phase_start)
+    logger.info(
+        f"Batch dispatch timings for {len(incidents)} incidents x {len(available_ambulances)} ambulances: {phase_timings}"
+    )
+    record_dispatch_metrics("batch", phase_timings, processing_time, [incident.status for incident, _, _ in dispatched])
+    return dispatched
+
+
+@app.post("/dispatch_all")
+async def dispatch_all(db: AsyncSession = Depends(get_db)):
+    """
+    Dispatch every Active and Queued incident at once with the batch assignment.
+    Incidents that get no unit this time are queued.
+    """
+    with DispatchClaim() as claim:
+        return await _dispatch_all(db, claim)
+
+
+async def _dispatch_all(db: AsyncSession, claim: DispatchClaim):
+    incidents = (await db.scalars(select(IncidentDB).filter(
+        IncidentDB.status.in_([Status.ACTIVE, Status.QUEUED])
+    ).order_by(IncidentDB.severity, IncidentDB.started_at))).all()
+    # Incidents another dispatch is working on are left to it
+    incidents = [incident for incident in incidents if claim.incident(incident.id)]
+    if not incidents:
+        return {"msg": "No incidents waiting for dispatch"}
+
+    available_ambulances = claim.free(await get_available_ambulances(db))
+    dispatched = []
+    if available_ambulances:
+        dispatched = await _batch_dispatch(incidents, available_ambulances, db, claim)
+        if dispatched is None:
+            return {"msg": "Could not calculate the ETA matrix"}
+
+    dispatched_ids = {incident.id for incident, _, _ in dispatched}
+    for incident in incidents:
+        enqueued_at = None
+        if incident.id in dispatched_ids:
+            enqueued_at = dispatch_queue.take(incident.id)
+            if enqueued_at is not None:
+                QUEUE_WAIT_SECONDS.observe(dispatch_queue.record_dispatch(enqueued_at))
+        if incident.status in [Status.ACTIVE, Status.QUEUED]:
+            incident.status = Status.QUEUED
+            dispatch_queue.push(incident.id, incident.severity, incident.started_at, enqueued_at)
+    await db.commit()
+
+    return {
+        "msg": (
+            f"{sum(len(selected) for _, selected, _ in dispatched)} ambulance(s) dispatched "
+            f"to {len(dispatched)} incident(s)"
+        ),
+        "assignments": [
+            {
+                "incident_id": incident.id,
+                "severity": incident.severity,
+                "ambulances": [amb.id for amb, _ in selected],
+                "eta_minutes": [eta for _, eta in selected],
+                "hospital_id": closest_hospital.id,
+                "status": incident.status,
+            } for incident, selected, closest_hospital in dispatched
+        ],
+        "queued_incidents": [
+            incident.id for incident in incidents if incident.status == Status.QUEUED
+        ],
+    }
 
 
 @app.get("/dispatch_status")
-async def dispatch_status(db: Session = Depends(get_db)):
+async def dispatch_status(db: AsyncSession = Depends(get_db)):
     """
     Get current dispatch status: active incidents, available ambulances,
     and priority queue information.
     """
-    all_active_incidents = db.query(IncidentDB).filter(
+    all_active_incidents = (await db.scalars(select(IncidentDB).filter(
         IncidentDB.status == Status.ACTIVE
-    ).order_by(IncidentDB.severity).all()
+    ).order_by(IncidentDB.severity))).all()
 
-    available_ambulances = get_available_ambulances(db)
+    available_ambulances = await get_available_ambulances(db)
 
-    busy_ambulances = db.query(AmbulanceDB).filter(
+    busy_ambulances = (await db.scalars(select(AmbulanceDB).filter(
         AmbulanceDB.status == Status.BUSY
-    ).all()
+    ))).all()
 
     return {
         "active_incidents": len(all_active_incidents),
@@ -1100,16 +1950,45 @@ async def dispatch_status(db: Session = Depends(get_db)):
                 "lat": inc.lat,
                 "lon": inc.lon
             } for inc in all_active_incidents[:5]
-        ]
+        ],
+        "queue_metrics": dispatch_queue.metrics()
     }
 
 
 @app.post("/convert_address")
 async def convert_address(address: str):
-    lat, lon = convert_address_to_coordinates(address)
+    lat, lon = await geocode(address)
     return {"lat": lat, "lon": lon}
 
 
+@app.get("/autocomplete_address")
+async def autocomplete_address(q: str, limit: int = 10):
+    """Known addresses matching what was typed so far, from the geocode cache only (no Geoapify call)."""
+    return geocode_cache.search(q, min(max(limit, 1), 50))
+
+
+@app.post("/geocode_cache/import_gazetteer")
+async def reimport_gazetteer():
+    if not GEOCODE_GAZETTEER:
+        raise HTTPException(status_code=400, detail="GEOCODE_GAZETTEER is not configured")
+    imported = await import_gazetteer(GEOCODE_GAZETTEER)
+    return {"msg": f"Imported {imported} names from the street gazetteer", "geocode_cache": geocode_cache.stats()}
+
+
+
+@app.post("/route_store/rebuild")
+async def rebuild_route_store():
+    await refresh_route_store()
+    return {"msg": "Route store rebuilt"}
+
+
+@app.post("/eta_cache/clear")
+async def clear_eta_cache():
+    stats = get_eta_cache_stats()
+    eta_cache.clear()
+    logger.info(f"ETA cache cleared ({stats['size']} entries dropped)")
+    return {"msg": "ETA cache cleared", "dropped_entries": stats["size"]}
+
 
 @app.get("/get_route_geometry")
 async def get_route_geometry_endpoint(
@@ -1118,9 +1997,9 @@ async def get_route_geometry_endpoint(
     end_lat: float, 
     end_lon: float
 ):
-    print(f"Generating generic route: {start_lat},{start_lon} -> {end_lat},{end_lon}")
+    logger.debug(f"Generating generic route: {start_lat},{start_lon} -> {end_lat},{end_lon}")
 
-    geometry = get_route_geometry(
+    geometry = await get_route_geometry(
         start_lon, start_lat, 
         end_lon, end_lat
     )
@@ -1133,212 +2012,473 @@ async def get_route_geometry_endpoint(
     }
 
 
-async def animate_ambulance_movement(
-    ambulance_id: int,
-    incident_id: int,
-    route_to_incident,
-    route_to_hospital,
-    route_to_assigned_unit,
-    eta, scene_time, hospital_eta, hospital_time, back_to_base_eta
-):
-    db = SessionLocal()
-    logger.info(f"CRITICAL: Animation started for ambulance {ambulance_id}")
+def handle_leg_end(ambulance_id, incident_id, phase):
+    """Called by the movement engine whenever an ambulance finishes a phase of its mission."""
+    if phase == TO_INCIDENT:
+        logger.info(f"Ambulance {ambulance_id} arrived at incident {incident_id}")
+        asyncio.create_task(record_arrival(ambulance_id, incident_id, "arrived_at_incident"))
+    elif phase == ON_SCENE:
+        logger.info(f"Ambulance {ambulance_id} heading to hospital")
+    elif phase == TO_HOSPITAL:
+        logger.info(f"Ambulance {ambulance_id} arrived at hospital")
+        asyncio.create_task(record_arrival(ambulance_id, incident_id, "arrived_at_hospital"))
+    elif phase == AT_HOSPITAL:
+        asyncio.create_task(release_ambulance(ambulance_id, incident_id))
+    elif phase == RETURNING:
+        logger.info(f"Ambulance {ambulance_id} returned to base safely.")
+
+
+async def record_arrival(ambulance_id, incident_id, column):
+    db = AsyncSessionLocal()
     try:
-        ambulance = get_ambulance_by_id(ambulance_id, db)
-        incident = get_incident_by_id(incident_id, db)
-
-        if not ambulance or not incident:
-            return
-
-        db.refresh(ambulance)
-        db.refresh(incident)
-
-        cancel_event = asyncio.Event()
-        CANCELLATION_TOKENS[ambulance_id] = cancel_event
-
-        logger.info(f"Ambulance {ambulance.id} starting journey to incident {incident.id}")
-        
-        point_counter = 0
-        commit_every_n_points = 3
-
-        for coord in route_to_incident:
-            if cancel_event.is_set():
-                logger.info(f"Ambulance {ambulance_id} animation cancelled during route_to_incident.")
-                return
-
-            if not coord or len(coord) < 2: continue
-
-            ambulance.lon = coord[0]
-            ambulance.lat = coord[1]
-            point_counter += 1
-            if point_counter % commit_every_n_points == 0 or coord == route_to_incident[-1]:
-                try:
-                    db.commit()
-                except Exception as e:
-                    logger.error(f"DB commit error for ambulance {ambulance.id}: {e}")
-                    db.rollback()
-                    db.refresh(ambulance)
-                await asyncio.sleep((eta / len(route_to_incident)) * 60)
-
-        if cancel_event.is_set():
-            return
-
-        logger.info(f"Ambulance {ambulance.id} arrived at incident {incident.id}")
-        for _ in range(int(scene_time * 60)):
-            if cancel_event.is_set():
-                return
-            await asyncio.sleep(1)
-
-        if cancel_event.is_set():
-            return
-
-        logger.info(f"Ambulance {ambulance.id} heading to hospital")
-        for coord in route_to_hospital:
-            if cancel_event.is_set():
-                logger.info(f"Ambulance {ambulance_id} animation cancelled during route_to_hospital.")
-                return
-
-            if not coord or len(coord) < 2: continue
-            ambulance.lon = coord[0]
-            ambulance.lat = coord[1]
-            db.commit()
-            await asyncio.sleep((hospital_eta / len(route_to_hospital)) * 60)
-
-        if cancel_event.is_set():
-            return
+        await assignment_history.record_arrival(db, ambulance_id, incident_id, column)
+        await db.commit()
+    except Exception as e:
+        logger.error(f"Could not record the arrival of ambulance {ambulance_id}: {e}")
+    finally:
+        await db.close()
 
-        logger.info(f"Ambulance {ambulance.id} arrived at hospital")
-        for _ in range(int(hospital_time * 60)):
-            if cancel_event.is_set():
-                return
-            await asyncio.sleep(1)
 
-        if cancel_event.is_set():
+async def release_ambulance(ambulance_id, incident_id):
+    """Free the ambulance after the hospital drop-off and resolve the incident once all its units are done."""
+    db = AsyncSessionLocal()
+    try:
+        ambulance = await db.scalar(select(AmbulanceDB).filter(AmbulanceDB.id == ambulance_id))
+        if not ambulance:
             return
-
         ambulance.status = Status.AVAILABLE
-        db.commit()
+        await db.commit()
+        notify_ambulance_available()
 
-        db.refresh(incident)
-        other_busy = db.query(AmbulanceDB).filter(
+        incident = await db.scalar(select(IncidentDB).filter(IncidentDB.id == incident_id))
+        if not incident:
+            return
+        other_busy = await db.scalar(select(AmbulanceDB).filter(
             AmbulanceDB.status == Status.BUSY,
             AmbulanceDB.id != ambulance_id,
             AmbulanceDB.id.in_(incident.assigned_units or [])
-        ).first()
+        ))
 
         if not other_busy and incident.status == Status.ASSIGNED:
             incident.status = Status.RESOLVED
             incident.ended_at = datetime.now()
-            db.commit()
+            await db.commit()
             logger.info(f"Incident {incident.id} resolved — all ambulances finished.")
         else:
             logger.info(f"Ambulance {ambulance_id} finished but incident {incident_id} still has active units.")
-        
-        point_counter = 0
-        commit_every_n_points = 3
-        logger.info(f"Ambulance {ambulance.id} returning to base (Open for interception)...")
+        logger.info(f"Ambulance {ambulance_id} returning to base (Open for interception)...")
+    except Exception as e:
+        logger.error(f"Error releasing ambulance {ambulance_id}: {e}")
+        await db.rollback()
+    finally:
+        await db.close()
 
-        for coord in route_to_assigned_unit:
-            if cancel_event.is_set():
-                logger.info(f"Old animation thread for ambulance {ambulance_id} killed successfully.")
-                return
 
-            if not coord or len(coord) < 2: continue
-            
-            ambulance.lon = coord[0]
-            ambulance.lat = coord[1]
-            
-            point_counter += 1
-            if point_counter % commit_every_n_points == 0 or coord == route_to_assigned_unit[-1]:
-                try:
-                    db.commit()
-                except Exception as e:
-                    logger.error(f"DB commit error for ambulance {ambulance.id}: {e}")
-                    db.rollback()
+def move_ambulances(ambulance_ids, lons, lats):
+    positions = []
+    for ambulance_id, lon, lat in zip(ambulance_ids, lons, lats):
+        move_ambulance(ambulance_id, lon, lat)
+        positions.append([ambulance_id, round(lon, 6), round(lat, 6)])
+    # One message per tick for all moving units
+    broadcaster.publish("ambulances", {"type": "positions", "data": positions})
 
-            await asyncio.sleep((back_to_base_eta / len(route_to_assigned_unit)) * 60)
 
-        if ambulance_id in CANCELLATION_TOKENS and CANCELLATION_TOKENS[ambulance_id] == cancel_event:
-            del CANCELLATION_TOKENS[ambulance_id]
+movement_engine = MovementEngine(move_ambulances, handle_leg_end)
 
-        logger.info(f"Ambulance {ambulance.id} returned to base safely.")
+assignment_history = AssignmentHistory(Status)
+assignment_history.track(SessionLocal)
+patient_links = PatientLinks()
+patient_links.track(SessionLocal)
 
-    except Exception as e:
-        logger.error(f"Error animating ambulance {ambulance_id}: {e}")
-    finally:
-        db.close()
+# Ambulances sent back to base at the same time while recovering; each needs two routing calls
+RECOVERY_CONCURRENCY = int(os.getenv("RECOVERY_CONCURRENCY", "4"))
+# How often busy ambulances and open assignments are checked against each other
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "300"))
+LAST_RECONCILIATION = {}
 
-async def cleanup_stale_missions(db: Session):
+
+async def _recover_ambulance(ambulance_id: int, limit: asyncio.Semaphore):
+    async with limit:
+        db = AsyncSessionLocal()
+        try:
+            await cancel_and_return_to_base(ambulance_id, db)
+        finally:
+            await db.close()
+
+
+async def reconcile_assignments(db: AsyncSession):
+    """
+    Busy ambulances without an open assignment go back to base, and open assignments whose
+    incident is closed or whose ambulance is not busy are closed. Two set-based queries,
+    whatever the number of incidents. Returns how many of each were fixed.
+    """
+    started = time.perf_counter()
+    zombies = await assignment_history.zombie_ambulances(db)
+    for amb_id in zombies:
+        logger.warning(f"Found Zombie Ambulance {amb_id} (BUSY but no incident). Resetting to AVAILABLE.")
+
+    # The units are independent, each gets its own session; the routing calls are the slow part
+    limit = asyncio.Semaphore(RECOVERY_CONCURRENCY)
+    results = await asyncio.gather(*(_recover_ambulance(amb_id, limit) for amb_id in zombies), return_exceptions=True)
+    for amb_id, result in zip(zombies, results):
+        if isinstance(result, Exception):
+            logger.error(f"Could not send ambulance {amb_id} back to base: {result}")
+
+    stale_assignments = await assignment_history.close_stale(db)
+    await db.commit()
+
+    fixed = {"zombie_ambulances": len(zombies), "stale_assignments": stale_assignments}
+    for kind, count in fixed.items():
+        RECONCILIATION_FIXES.inc(count, kind=kind)
+    RECONCILIATION_SECONDS.observe(time.perf_counter() - started)
+    LAST_RECONCILIATION.update(at=datetime.now().isoformat(), duration_ms=_elapsed_ms(started), fixed=fixed)
+    return fixed
+
+
+async def run_reconciliation():
+    """Reconcile periodically, for what a crashed task or a manual database edit left behind."""
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+        db = AsyncSessionLocal()
+        try:
+            fixed = await reconcile_assignments(db)
+            if any(fixed.values()):
+                logger.warning(f"Assignment reconciliation fixed {fixed}")
+        except Exception as e:
+            logger.error(f"Assignment reconciliation failed: {e}")
+            await db.rollback()
+        finally:
+            await db.close()
+
+
+async def cleanup_stale_missions(db: AsyncSession):
 
     logger.info("Checking for interrupted missions...")
     
     stale_threshold = datetime.now() - timedelta(hours=1)
-    stale_incidents = db.query(IncidentDB).filter(
+    stale_incidents = (await db.scalars(select(IncidentDB).filter(
         IncidentDB.status == Status.ASSIGNED,
         IncidentDB.started_at < stale_threshold
-    ).all()
+    ))).all()
 
     count = 0
     for incident in stale_incidents:
         logger.warning(f"Resetting stale Incident {incident.id} (started at {incident.started_at}). Adding back to Queue.")
         
-        assigned_units = list(incident.assigned_units or [])
-        
         incident.status = Status.QUEUED
         incident.assigned_hospital = None
         incident.assigned_units = []
-        db.commit()
-
-        for amb_id in assigned_units:
-            await cancel_and_return_to_base(amb_id, db)
-        
         count += 1
+    await db.commit()
+    for incident in stale_incidents:
+        enqueue_incident(incident)
 
-    busy_ambulances = db.query(AmbulanceDB).filter(AmbulanceDB.status == Status.BUSY).all()
-    
-    for amb in busy_ambulances:
-        active_assignment = db.query(IncidentDB).filter(
-            IncidentDB.assigned_units.contains(amb.id),
-            IncidentDB.status.in_([Status.ASSIGNED, Status.ACTIVE])
-        ).first()
-
-        if not active_assignment:
-            logger.warning(f"Found Zombie Ambulance {amb.id} (BUSY but no incident). Resetting to AVAILABLE.")
-            await cancel_and_return_to_base(amb.id, db)
+    # Taking the units off the reset incidents closed their assignments, so they are
+    # sent back to base along with any other busy ambulance that has none
+    fixed = await reconcile_assignments(db)
 
-    db.commit()
     if count > 0:
         logger.info(f"Recovered {count} interrupted missions.")
     else:
         logger.info("System clean. No interrupted missions found.")
+    return fixed
 
 @app.post("/cleanup_stale")
-async def manual_cleanup(db: Session = Depends(get_db)):
-    await cleanup_stale_missions(db)
-    return {"msg": "System reset successful. Zombies cleared."}
+async def manual_cleanup(db: AsyncSession = Depends(get_db)):
+    fixed = await cleanup_stale_missions(db)
+    return {"msg": "System reset successful. Zombies cleared.", "fixed": fixed}
+
+# Statistics: resolved incidents are read from hourly rollups, the few open ones are counted live
+
+# window -> (span, default bucket)
+STATISTICS_WINDOWS = {
+    "day": (timedelta(days=1), "hour"),
+    "week": (timedelta(days=7), "day"),
+    "month": (timedelta(days=30), "day"),
+}
+OPEN_STATUSES = [Status.ACTIVE, Status.QUEUED, Status.ASSIGNED]
+
+incident_stats = IncidentStats(Status.RESOLVED)
+incident_stats.track(SessionLocal)
+
+
+@app.get("/statistics")
+async def statistics(window: str = "day", start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     bucket: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Incident counts by status, type and severity, and processing and resolution times
+    (mean, p50, p90, p95) overall and per hour or day, for incidents started in the window.
+    """
+    if window not in STATISTICS_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(STATISTICS_WINDOWS)}")
+    span, default_bucket = STATISTICS_WINDOWS[window]
+    bucket = bucket or default_bucket
+    if bucket not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="bucket must be 'hour' or 'day'")
+    end = end or datetime.now()
+    start = start or end - span
+
+    summary = await db.run_sync(incident_stats.summary, start, end, bucket)
+    by_status = {Status.RESOLVED: summary["resolved"]}
+    open_incidents = await db.execute(select(IncidentDB.status, IncidentDB.type, IncidentDB.severity, func.count(IncidentDB.id)).filter(
+        IncidentDB.status.in_(OPEN_STATUSES),
+        IncidentDB.started_at >= start,
+        IncidentDB.started_at < end,
+    ).group_by(IncidentDB.status, IncidentDB.type, IncidentDB.severity))
+    for status, incident_type, severity, count in open_incidents:
+        by_status[status] = by_status.get(status, 0) + count
+        summary["by_type"][incident_type or ""] = summary["by_type"].get(incident_type or "", 0) + count
+        summary["by_severity"][severity or 0] = summary["by_severity"].get(severity or 0, 0) + count
+
+    return {
+        "window": {"start": start.isoformat(), "end": end.isoformat()},
+        "bucket": bucket,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        **summary,
+    }
+
+
+@app.post("/statistics/rebuild")
+async def rebuild_statistics():
+    # Reads every resolved incident: done on a worker thread with a sync session
+    db = SessionLocal()
+    try:
+        rows = await asyncio.to_thread(incident_stats.rebuild, db)
+    finally:
+        db.close()
+    return {"msg": "Statistics rebuilt", "rollup_rows": rows}
+
+
+# Live updates: clients subscribe to topics and get a snapshot followed by the changes only
+
+broadcaster = Broadcaster()
+broadcaster.track(SessionLocal)
+
+
+async def live_snapshot(topic):
+    if topic == "ambulances":
+        rows = fleet_state.all()
+    else:
+        db = AsyncSessionLocal()
+        try:
+            query = select(TOPICS[topic])
+            if topic == "incidents":
+                # Live views only draw open incidents; resolved ones would grow the snapshot forever
+                query = query.filter(IncidentDB.status != Status.RESOLVED)
+            rows = [row_to_dict(topic, row) for row in await db.scalars(query)]
+        finally:
+            await db.close()
+    return encode({"topic": topic, "type": "snapshot", "data": rows})
+
+
+@app.websocket("/ws/live")
+async def live_updates(websocket: WebSocket, topics: str = ""):
+    """
+    Push channel replacing the table polling. Send {"action": "subscribe"|"unsubscribe", "topics": [...]}
+    (or pass ?topics=a,b) to pick incidents, ambulances, hospitals, emergency_centers, patients or users.
+    """
+    session, subprotocol = await authenticate_websocket(websocket)
+    if REQUIRE_AUTH and session is None:
+        await refuse_websocket(websocket, subprotocol, "Not authenticated")
+        return
+    await websocket.accept(subprotocol=subprotocol)
+    subscriber = broadcaster.subscribe()
+
+    def subscribe(names):
+        for topic in names:
+            if topic in TOPICS and topic not in subscriber.topics:
+                # Queued before any change to the topic, so later changes apply on top of it
+                subscriber.queue.put_nowait(Snapshot(topic))
+                subscriber.topics.add(topic)
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            names = message.get("topics") or []
+            if message.get("action") == "subscribe":
+                subscribe(names)
+            elif message.get("action") == "unsubscribe":
+                subscriber.topics.difference_update(names)
+
+    async def send():
+        while True:
+            message = await subscriber.queue.get()
+            if message is RESYNC:
+                for topic in list(subscriber.topics):
+                    await websocket.send_text(await live_snapshot(topic))
+            elif isinstance(message, Snapshot):
+                await websocket.send_text(await live_snapshot(message.topic))
+            else:
+                await websocket.send_text(message)
+
+    subscribe([topic for topic in topics.split(",") if topic])
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Live updates connection closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+
+# Driver view: one driver's mission instead of the whole tables filtered in the browser
+
+async def driver_mission(user_id: int, db: AsyncSession):
+    """
+    The driver's ambulance, the open incident it is on with its hospital, the mission phase
+    and the route still ahead as an encoded polyline. None when no ambulance has this driver.
+    """
+    ambulance_id = await db.scalar(select(AmbulanceDB.id).filter(AmbulanceDB.driver_id == user_id).limit(1))
+    ambulance = fleet_state.get(ambulance_id) if ambulance_id is not None else None
+    if not ambulance:
+        return None
+    incident = await assignment_history.current_incident(db, ambulance_id)
+    hospital = None
+    if incident and incident.assigned_hospital:
+        hospital = await db.scalar(select(HospitalDB).filter(HospitalDB.id == incident.assigned_hospital))
+    phase, route = movement_engine.remaining_route(ambulance_id)
+    return {
+        "ambulance": {field: ambulance[field] for field in ("id", "status", "lat", "lon")},
+        "incident": {
+            field: getattr(incident, field)
+            for field in ("id", "status", "severity", "type", "lat", "lon", "nr_patients")
+        } if incident else None,
+        "hospital": {field: getattr(hospital, field) for field in ("id", "name", "lat", "lon")} if hospital else None,
+        "phase": phase,
+        "route": Polyline.encode(route) if route else None,
+    }
+
+
+@app.get("/driver/{user_id}/mission")
+async def get_driver_mission(user_id: int, db: AsyncSession = Depends(get_db)):
+    mission = await driver_mission(user_id, db)
+    if mission is None:
+        logger.warning(f"No ambulance has driver {user_id}.")
+        raise HTTPException(status_code=404, detail="No ambulance is assigned to this driver")
+    return mission
+
+
+def _affects_mission(change, mission, user_id):
+    """Whether a live message changes the driver's ambulance or incident."""
+    data = change.get("data") or {}
+    entity_id = change.get("id", data.get("id"))
+    if change["topic"] == "ambulances":
+        return (mission is not None and entity_id == mission["ambulance"]["id"]) or data.get("driver_id") == user_id
+    return mission is not None and mission["incident"] is not None and entity_id == mission["incident"]["id"]
+
+
+@app.websocket("/ws/driver/{user_id}")
+async def driver_updates(websocket: WebSocket, user_id: int):
+    """
+    Push channel of /driver/{user_id}/mission. The mission (null without an ambulance) is sent
+    on connect and whenever the ambulance, its incident or its leg changes; in between only
+    the ambulance's position, as {"type": "position", "data": {"lat": ..., "lon": ...}}.
+    """
+    session, subprotocol = await authenticate_websocket(websocket)
+    if REQUIRE_AUTH and (session is None or session.user_id != user_id):
+        await refuse_websocket(websocket, subprotocol, "Not authenticated" if session is None else "Not this driver")
+        return
+    await websocket.accept(subprotocol=subprotocol)
+    subscriber = broadcaster.subscribe()
+    subscriber.topics.update(("ambulances", "incidents"))
+
+    async def read_mission():
+        db = AsyncSessionLocal()
+        try:
+            return await driver_mission(user_id, db)
+        finally:
+            await db.close()
+
+    async def receive():
+        while True:
+            await websocket.receive_text()
+
+    async def send():
+        mission = await read_mission()
+        await websocket.send_text(encode({"type": "mission", "data": mission}))
+        while True:
+            message = await subscriber.queue.get()
+            refresh = message is RESYNC
+            if not refresh:
+                change = json.loads(message)
+                if change["type"] != "positions":
+                    refresh = _affects_mission(change, mission, user_id)
+                elif mission is not None:
+                    ambulance = mission["ambulance"]
+                    moved = next(((lon, lat) for amb_id, lon, lat in change["data"] if amb_id == ambulance["id"]), None)
+                    if moved is None:
+                        continue
+                    if movement_engine.phase(ambulance["id"]) != mission["phase"]:
+                        refresh = True
+                    else:
+                        ambulance["lon"], ambulance["lat"] = moved
+                        await websocket.send_text(encode({"type": "position", "data": {"lat": moved[1], "lon": moved[0]}}))
+            if refresh:
+                mission = await read_mission()
+                await websocket.send_text(encode({"type": "mission", "data": mission}))
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Driver updates connection closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        broadcaster.unsubscribe(subscriber)
+
 
 @app.get("/logs")
 async def get_logs():
     try:
-        with open("dispatch.log", "r") as log_file:
+        with open(DISPATCH_LOG_FILE, "r") as log_file:
             log_lines = log_file.readlines()
             return {"logs": log_lines[-100:]}
     except Exception as e:
         logger.error(f"Error retrieving logs: {e}")
         raise HTTPException(status_code=500, detail="Could not retrieve logs")
     
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests; recovery may still be running."""
+    return {"status": "Alive", "uptime_seconds": boot.stats()["uptime_seconds"]}
+
+
+@app.get("/health/ready")
+async def readiness(response: Response, db: AsyncSession = Depends(get_db)):
+    """503 until the startup recovery is done, or when the database cannot be reached."""
+    try:
+        await db.execute(text("SELECT 1"))
+        db_status = "Connected"
+    except Exception as e:
+        db_status = f"Error: {str(e)}"
+    ready = boot.ready and db_status == "Connected"
+    if not ready:
+        response.status_code = 503
+    return {"status": "Ready" if ready else "Not ready", "database": db_status, "boot": boot.stats()}
+
+
 @app.get("/health")
-async def health(db: Session = Depends(get_db)):
+async def health(db: AsyncSession = Depends(get_db)):
     # 1. Database Check
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "Connected"
     except Exception as e:
         db_status = f"Error: {str(e)}"
 
     # 2. API Checks
-    geo_status = check_geoapify_health()
-    ors_status = check_ors_health()
+    geo_status, ors_status = await asyncio.gather(
+        check_geoapify_health(),
+        check_ors_health(),
+    )
 
     # 3. Background Process Heartbeat
     queue_alive = (time.time() - LAST_QUEUE_RUN) < 60 if LAST_QUEUE_RUN > 0 else False
@@ -1349,9 +2489,19 @@ async def health(db: Session = Depends(get_db)):
             "database": db_status,
             "geoapify": geo_status,
             "ors_routing": ors_status,
+            "local_routing": local_routing_status(),
         },
         "engine": {
             "queue_processor": "Active" if queue_alive else "Inactive",
+            "eta_cache": get_eta_cache_stats(),
+            "geocode_cache": geocode_cache.stats(),
+            "fleet_state": fleet_state.stats(),
+            "movement": movement_engine.stats(),
+            "live_updates": broadcaster.stats(),
+            "change_versions": change_versions.stats(),
+            "sessions": session_cache.stats(),
+            "boot": boot.stats(),
+            "reconciliation": LAST_RECONCILIATION,
             "system_time": datetime.now().isoformat()
         }
     }
\ No newline at end of file
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import time
+from threading import Lock
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+from database import SessionLocal
+from models import AmbulanceDB
+
+logger = logging.getLogger(__name__)
+
+# Moving ambulances only touch memory; their positions reach the database in one batch this often
+FLEET_FLUSH_SECONDS = float(os.getenv("FLEET_FLUSH_SECONDS", "2"))
+
+FIELDS = (
+    "id", "status", "lat", "lon", "capacity", "default_lat", "default_lon",
+    "available_at", "driver_id", "base_hospital_id", "version",
+)
+
+
+class AmbulanceState:
+    __slots__ = FIELDS
+
+    def __init__(self, amb):
+        # Read the loaded values directly so this never triggers a lazy load mid-flush
+        values = inspect(amb).dict
+        for field in FIELDS:
+            setattr(self, field, values.get(field))
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+
+class FleetState:
+    """
+    Authoritative in-memory copy of the ambulance table.
+
+    Positions are written here by the animation tasks and flushed to AmbulanceDB in
+    batches (write-behind). Every other ambulance change still goes through the database;
+    committed sessions are mirrored back in through the SQLAlchemy session events.
+    """
+
+    def __init__(self, versions=None):
+        # ChangeVersions to stamp moved ambulances with, so delta queries see them
+        self.versions = versions
+        self._records = {}
+        self._dirty = set()
+        self._lock = Lock()
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.last_flush_ms = 0.0
+
+    def __len__(self):
+        return len(self._records)
+
+    def load(self, ambulances):
+        """Replace the state with the rows stored in the database, e.g. after a restart."""
+        with self._lock:
+            self._records = {amb.id: AmbulanceState(amb) for amb in ambulances}
+            self._dirty.clear()
+
+    def get(self, ambulance_id):
+        with self._lock:
+            record = self._records.get(ambulance_id)
+            return record.to_dict() if record else None
+
+    def all(self):
+        with self._lock:
+            return [self._records[amb_id].to_dict() for amb_id in sorted(self._records)]
+
+    def move(self, ambulance_id, lon, lat):
+        with self._lock:
+            record = self._records.get(ambulance_id)
+            if record is None:
+                return
+            record.lon = lon
+            record.lat = lat
+            if self.versions:
+                record.version = self.versions.next("ambulances")
+            self._dirty.add(ambulance_id)
+
+    def overlay(self, amb):
+        """
+        Give an ambulance loaded from the database its live position. The value is set as
+        the committed one, so the caller's next commit does not write it back.
+        """
+        with self._lock:
+            if amb.id not in self._dirty:
+                return amb
+            record = self._records[amb.id]
+            lon, lat = record.lon, record.lat
+        set_committed_value(amb, "lon", lon)
+        set_committed_value(amb, "lat", lat)
+        return amb
+
+    def track(self, session_factory):
+        """Mirror committed AmbulanceDB inserts, updates and deletes into the state."""
+
+        @event.listens_for(session_factory, "after_flush")
+        def collect_changes(session, flush_context):
+            pending = session.info.setdefault("fleet_changes", [])
+            for amb in session.new:
+                if isinstance(amb, AmbulanceDB):
+                    pending.append((amb.id, AmbulanceState(amb)))
+            for amb in session.dirty:
+                if isinstance(amb, AmbulanceDB):
+                    state = inspect(amb)
+                    changed = {
+                        field: state.dict.get(field) for field in FIELDS
+                        if state.attrs[field].history.has_changes()
+                    }
+                    if changed:
+                        pending.append((amb.id, changed))
+            for amb in session.deleted:
+                if isinstance(amb, AmbulanceDB):
+                    pending.append((amb.id, None))
+
+        @event.listens_for(session_factory, "after_commit")
+        def apply_changes(session):
+            self._apply(session.info.pop("fleet_changes", []))
+
+        @event.listens_for(session_factory, "after_rollback")
+        def drop_changes(session):
+            session.info.pop("fleet_changes", None)
+
+    def _apply(self, changes):
+        with self._lock:
+            for ambulance_id, change in changes:
+                if change is None:
+                    self._records.pop(ambulance_id, None)
+                    self._dirty.discard(ambulance_id)
+                elif isinstance(change, AmbulanceState):
+                    self._records[ambulance_id] = change
+                elif ambulance_id in self._records:
+                    record = self._records[ambulance_id]
+                    seen = record.version or 0
+                    for field, value in change.items():
+                        setattr(record, field, value)
+                    # An explicit position update wins over the pending animated one
+                    if "lat" in change or "lon" in change:
+                        self._dirty.discard(ambulance_id)
+                    # The transaction was stamped at flush; a move since then has a newer version,
+                    # and going back below it would hide this change from clients that saw the move.
+                    # The write-behind stores the new version with the position.
+                    if (record.version or 0) <= seen and self.versions:
+                        record.version = self.versions.next("ambulances")
+                        self._dirty.add(ambulance_id)
+
+    def flush(self):
+        """Write the pending positions to AmbulanceDB in a single transaction. Returns the row count."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            records = [self._records[amb_id] for amb_id in dirty if amb_id in self._records]
+            rows = [
+                {"id": record.id, "lat": record.lat, "lon": record.lon, "version": record.version}
+                for record in records
+            ]
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(update(AmbulanceDB), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._dirty |= dirty
+            raise
+        finally:
+            db.close()
+
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+        return len(rows)
+
+    async def run_write_behind(self, interval=FLEET_FLUSH_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Fleet state flush failed: {e}")
+
+    def stats(self):
+        return {
+            "ambulances": len(self._records),
+            "pending_positions": len(self._dirty),
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "last_flush_ms": self.last_flush_ms,
+        }
@@ -1,14 +1,15 @@
-import requests
 import os
+import HttpClient
 from dotenv import load_dotenv
 import time
 
 load_dotenv()
 
 GEO_APIKEY = os.getenv("GEO_APIKEY")
+GEOAPIFY_BASE_URL = os.getenv("GEOAPIFY_BASE_URL", "https://api.geoapify.com").rstrip("/")
 
-def convert_address_to_coordinates(address: str):
-    url = "https://api.geoapify.com/v1/geocode/search"
+async def convert_address_to_coordinates(address: str):
+    url = f"{GEOAPIFY_BASE_URL}/v1/geocode/search"
     address = address + ", Baia Mare, Maramures, Romania"
     params = {
         "text" : address,
@@ -16,7 +17,7 @@ def convert_address_to_coordinates(address: str):
         "filter": "countrycode:ro",
         "apiKey": GEO_APIKEY
     }
-    response = requests.get(url,params=params)
+    response = await HttpClient.get("geoapify", url, params=params)
     data = response.json()
 
     results = data.get("results", [])
@@ -27,11 +28,11 @@ def convert_address_to_coordinates(address: str):
 
     raise ValueError(f"Address '{address}' was not found in Romania")
 
-def check_geoapify_health():
+async def check_geoapify_health():
     """
      Health check for Geoapify API 
     """
-    url = "https://api.geoapify.com/v1/geocode/reverse"
+    url = f"{GEOAPIFY_BASE_URL}/v1/geocode/reverse"
     params = {
         "lat": 47.6567, 
         "lon": 23.5850,
@@ -40,7 +41,7 @@ def check_geoapify_health():
     
     try:
         start = time.time()
-        response = requests.get(url, params=params, timeout=5)
+        response = await HttpClient.get("geoapify", url, params=params, timeout=5)
         latency = round((time.time() - start) * 1000, 2)
         
         if response.status_code == 200:
@@ -0,0 +1,345 @@
+import asyncio
+import bisect
+import csv
+import logging
+import os
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from database import AsyncSessionLocal
+from models import GeocodeCacheDB
+from GeoApify import convert_address_to_coordinates
+
+logger = logging.getLogger(__name__)
+
+# Geoapify results are trusted for this long, then looked up again on the next request.
+# Gazetteer entries do not expire, they change when the gazetteer is imported again.
+GEOCODE_CACHE_TTL_DAYS = float(os.getenv("GEOCODE_CACHE_TTL_DAYS", "90"))
+# Street gazetteer imported at startup: a CSV with name,lat,lon columns or an OSM extract
+GEOCODE_GAZETTEER = os.getenv("GEOCODE_GAZETTEER")
+# Cache hits are counted in memory and added to the table in one batch this often
+GEOCODE_HITS_FLUSH_SECONDS = float(os.getenv("GEOCODE_HITS_FLUSH_SECONDS", "30"))
+
+SOURCE_GEOAPIFY = "geoapify"
+SOURCE_GAZETTEER = "gazetteer"
+
+# Appended by convert_address_to_coordinates, so typing it does not make a different address
+CITY_SUFFIXES = ("romania", "maramures", "baia mare")
+ABBREVIATIONS = {
+    "str": "strada", "bd": "bulevardul", "bdul": "bulevardul", "blvd": "bulevardul",
+    "cal": "calea", "pta": "piata", "al": "aleea", "nr": None,
+}
+# Prefix matches looked at before ranking; a one letter query would otherwise rank the whole city
+MAX_PREFIX_CANDIDATES = 500
+# Share of the query's trigrams an address needs to be suggested when no prefix matches it
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+
+def normalize(address):
+    """Lowercase words without diacritics, punctuation, abbreviations or the city suffix."""
+    text = unicodedata.normalize("NFKD", address).encode("ascii", "ignore").decode().lower()
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        word = ABBREVIATIONS.get(word, word)
+        if word:
+            words.append(word)
+    text = " ".join(words)
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in CITY_SUFFIXES:
+            if text.endswith(" " + suffix):
+                text = text[:-len(suffix) - 1]
+                stripped = True
+    return text
+
+
+def _word_suffixes(address):
+    words = address.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _trigrams(text):
+    grams = set()
+    for word in text.split(" "):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Entry:
+    __slots__ = ("address", "label", "lat", "lon", "source", "hits", "resolved_at")
+
+    def __init__(self, address, label, lat, lon, source, hits=0, resolved_at=None):
+        self.address = address
+        self.label = label
+        self.lat = lat
+        self.lon = lon
+        self.source = source
+        self.hits = hits or 0
+        self.resolved_at = resolved_at
+
+    def to_dict(self):
+        return {"address": self.label, "lat": self.lat, "lon": self.lon, "source": self.source}
+
+
+class GeocodeCache:
+    """
+    Geocoded addresses keyed by their normalized form, mirrored from the geocode_cache table.
+    Exact lookups are a dict hit. For autocomplete every word suffix of an address
+    ("strada victoriei 5", "victoriei 5", "5") is kept in a sorted list, so a prefix is a
+    bisect, and a trigram index catches the misspellings no prefix matches.
+    """
+
+    def __init__(self, ttl_days=GEOCODE_CACHE_TTL_DAYS):
+        self.ttl = timedelta(days=ttl_days)
+        self._entries = {}
+        self._suffixes = []
+        self._trigrams = defaultdict(set)
+        # address -> hits not yet added to the table
+        self._pending_hits = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.hit_flushes = 0
+
+    def expired(self, entry, now=None):
+        if entry.source == SOURCE_GAZETTEER or entry.resolved_at is None:
+            return False
+        return (now or datetime.now()) - entry.resolved_at > self.ttl
+
+    def _index(self, address):
+        for gram in _trigrams(address):
+            self._trigrams[gram].add(address)
+        return [(suffix, address) for suffix in _word_suffixes(address)]
+
+    def load(self, entries):
+        """Replace the contents with the given entries (the whole table)."""
+        self._entries = {}
+        self._trigrams = defaultdict(set)
+        suffixes = []
+        for entry in entries:
+            if entry.address not in self._entries:
+                suffixes.extend(self._index(entry.address))
+            # Rows are read back on a gazetteer import; keep the hits not flushed yet in the ranking
+            entry.hits += self._pending_hits.get(entry.address, 0)
+            self._entries[entry.address] = entry
+        self._suffixes = sorted(suffixes)
+
+    def add(self, entry):
+        if entry.address not in self._entries:
+            for suffix in self._index(entry.address):
+                bisect.insort(self._suffixes, suffix)
+        self._entries[entry.address] = entry
+
+    def peek(self, address):
+        """The entry for an address even if it expired, without counting a lookup."""
+        return self._entries.get(address)
+
+    def get(self, address):
+        entry = self._entries.get(address)
+        if entry is None or self.expired(entry):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def count_hit(self, entry):
+        entry.hits += 1
+        self._pending_hits[entry.address] += 1
+
+    def take_pending_hits(self):
+        pending, self._pending_hits = self._pending_hits, Counter()
+        return pending
+
+    def restore_pending_hits(self, pending):
+        """Put back hits whose flush failed, so the next one writes them."""
+        self._pending_hits.update(pending)
+
+    def search(self, query, limit=10):
+        """Addresses starting with the query (at any word), most used first, then close misspellings."""
+        key = normalize(query)
+        if not key:
+            return []
+        now = datetime.now()
+
+        matches = []
+        i = bisect.bisect_left(self._suffixes, (key,))
+        while i < len(self._suffixes) and len(matches) < MAX_PREFIX_CANDIDATES:
+            suffix, address = self._suffixes[i]
+            if not suffix.startswith(key):
+                break
+            matches.append(address)
+            i += 1
+        candidates = {address for address in matches if not self.expired(self._entries[address], now)}
+        found = sorted(
+            candidates,
+            key=lambda address: (not address.startswith(key), -self._entries[address].hits, len(address)),
+        )[:limit]
+
+        if len(found) < limit and len(key) >= 3:
+            grams = _trigrams(key)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._trigrams.get(gram, ()))
+            close = [
+                address for address, count in shared.items()
+                if count / len(grams) >= MIN_TRIGRAM_SIMILARITY and address not in candidates
+                and not self.expired(self._entries[address], now)
+            ]
+            close.sort(key=lambda address: (-shared[address], -self._entries[address].hits, len(address)))
+            found += close[:limit - len(found)]
+
+        return [self._entries[address].to_dict() for address in found]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "gazetteer_entries": sum(1 for entry in self._entries.values() if entry.source == SOURCE_GAZETTEER),
+            "ttl_days": self.ttl.days,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "pending_hits": sum(self._pending_hits.values()),
+            "hit_flushes": self.hit_flushes,
+        }
+
+
+geocode_cache = GeocodeCache()
+
+
+def _upsert(db, rows, overwrite=True):
+    """
+    Insert or update geocode_cache rows by address. With overwrite=False only gazetteer rows
+    are replaced, so an import never hides an address Geoapify resolved.
+    """
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}[db.bind.dialect.name]
+    stmt = dialect.insert(GeocodeCacheDB)
+    return db.execute(stmt.on_conflict_do_update(
+        index_elements=["address"],
+        set_={column: stmt.excluded[column] for column in ("label", "lat", "lon", "source", "resolved_at")},
+        where=None if overwrite else GeocodeCacheDB.source == SOURCE_GAZETTEER,
+    ), rows)
+
+
+async def load_geocode_cache(db):
+    rows = (await db.scalars(select(GeocodeCacheDB))).all()
+    geocode_cache.load(
+        Entry(row.address, row.label, row.lat, row.lon, row.source, row.hits, row.resolved_at) for row in rows
+    )
+
+
+async def geocode(address):
+    """(lat, lon) of an address: from the cache when it is known, else from Geoapify and then cached."""
+    key = normalize(address)
+    entry = geocode_cache.get(key) if key else None
+    if entry:
+        geocode_cache.count_hit(entry)
+        return entry.lat, entry.lon
+
+    lat, lon = await convert_address_to_coordinates(address)
+    if key:
+        known = geocode_cache.peek(key)
+        entry = Entry(key, address.strip(), lat, lon, SOURCE_GEOAPIFY, known.hits if known else 1, datetime.now())
+        db = AsyncSessionLocal()
+        try:
+            await _upsert(db, [{
+                "address": key, "label": entry.label, "lat": lat, "lon": lon,
+                "source": SOURCE_GEOAPIFY, "hits": entry.hits, "resolved_at": entry.resolved_at,
+            }])
+            await db.commit()
+        finally:
+            await db.close()
+        geocode_cache.add(entry)
+    return lat, lon
+
+
+async def flush_geocode_hits():
+    """Add the hits counted since the last flush to the table in one transaction. Returns the row count."""
+    pending = geocode_cache.take_pending_hits()
+    if not pending:
+        return 0
+    db = AsyncSessionLocal()
+    try:
+        # Increments rather than totals, so a row re-resolved meanwhile keeps its count
+        table = GeocodeCacheDB.__table__
+        await db.execute(
+            update(table).where(table.c.address == bindparam("key")).values(hits=table.c.hits + bindparam("added")),
+            [{"key": address, "added": added} for address, added in pending.items()],
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        geocode_cache.restore_pending_hits(pending)
+        raise
+    finally:
+        await db.close()
+    geocode_cache.hit_flushes += 1
+    return len(pending)
+
+
+async def run_geocode_hit_flush(interval=GEOCODE_HITS_FLUSH_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_geocode_hits()
+        except Exception as e:
+            logger.error(f"Geocode hit flush failed: {e}")
+
+
+def _read_osm(path):
+    """Named streets (at the middle of their longest way) and named places of an OSM extract."""
+    nodes, places, streets = {}, {}, {}
+    for _, elem in ET.iterparse(path):
+        if elem.tag == "node":
+            lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+            nodes[elem.get("id")] = (lat, lon)
+            name = next((tag.get("v") for tag in elem.iter("tag") if tag.get("k") == "name"), None)
+            if name:
+                places.setdefault(name, (lat, lon))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            refs = [nd.get("ref") for nd in elem.iter("nd") if nd.get("ref") in nodes]
+            if tags.get("highway") and tags.get("name") and refs:
+                longest = streets.get(tags["name"])
+                if longest is None or len(refs) > len(longest):
+                    streets[tags["name"]] = refs
+            elem.clear()
+    rows = [(name, *nodes[refs[len(refs) // 2]]) for name, refs in streets.items()]
+    rows += [(name, lat, lon) for name, (lat, lon) in places.items() if name not in streets]
+    return rows
+
+
+def read_gazetteer(path):
+    """(name, lat, lon) rows of a gazetteer file. Blocking, run it off the event loop."""
+    if path.endswith(".osm"):
+        return _read_osm(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["name"], float(row["lat"]), float(row["lon"])) for row in csv.DictReader(f)]
+
+
+async def import_gazetteer(path=GEOCODE_GAZETTEER):
+    """Load a street gazetteer into the cache table and the index. Returns the number of names imported."""
+    rows = {}
+    now = datetime.now()
+    for name, lat, lon in await asyncio.to_thread(read_gazetteer, path):
+        key = normalize(name)
+        if key:
+            rows[key] = {
+                "address": key, "label": name.strip(), "lat": lat, "lon": lon,
+                "source": SOURCE_GAZETTEER, "hits": 0, "resolved_at": now,
+            }
+    db = AsyncSessionLocal()
+    try:
+        if rows:
+            await _upsert(db, list(rows.values()), overwrite=False)
+            await db.commit()
+        await load_geocode_cache(db)
+    finally:
+        await db.close()
+    return len(rows)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+import httpx
+import Metrics
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+
+# Maximum number of requests in flight per external service,
+# so a burst of dispatches cannot trip the ORS/Geoapify rate limits.
+SERVICE_CONCURRENCY = {
+    "ors": int(os.getenv("ORS_MAX_CONCURRENCY", "6")),
+    "geoapify": int(os.getenv("GEOAPIFY_MAX_CONCURRENCY", "4")),
+}
+
+_client = None
+_semaphores = {}
+
+EXTERNAL_REQUESTS = Metrics.Counter(
+    "external_requests_total", "Requests sent to ORS and Geoapify by HTTP status (or error).", ("service", "status")
+)
+EXTERNAL_REQUEST_SECONDS = Metrics.Histogram(
+    "external_request_seconds", "Latency of ORS and Geoapify requests once they got a connection slot.", ("service",)
+)
+EXTERNAL_SLOT_WAIT_SECONDS = Metrics.Histogram(
+    "external_request_slot_wait_seconds", "Time requests waited for one of the service's concurrency slots.", ("service",)
+)
+
+
+def get_client():
+    """Shared keep-alive client, created lazily inside the running event loop."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+def _get_semaphore(service):
+    if service not in _semaphores:
+        _semaphores[service] = asyncio.Semaphore(SERVICE_CONCURRENCY.get(service, 4))
+    return _semaphores[service]
+
+
+async def request(service, method, url, timeout=None, **kwargs):
+    """
+    Send a request through the shared pool. `timeout` overrides the default
+    read timeout for this call only. Raises httpx.HTTPError on network failures.
+    """
+    if timeout is not None:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=min(timeout, HTTP_CONNECT_TIMEOUT))
+    queued = time.perf_counter()
+    async with _get_semaphore(service):
+        started = time.perf_counter()
+        EXTERNAL_SLOT_WAIT_SECONDS.observe(started - queued, service=service)
+        try:
+            response = await get_client().request(method, url, **kwargs)
+        except httpx.HTTPError:
+            EXTERNAL_REQUESTS.inc(service=service, status="error")
+            raise
+        finally:
+            EXTERNAL_REQUEST_SECONDS.observe(time.perf_counter() - started, service=service)
+        EXTERNAL_REQUESTS.inc(service=service, status=response.status_code)
+        return response
+
+
+async def post(service, url, **kwargs):
+    return await request(service, "POST", url, **kwargs)
+
+
+async def get(service, url, **kwargs):
+    return await request(service, "GET", url, **kwargs)
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _semaphores.clear()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, List, Any, Dict
+from typing import Optional, List
 
 class Incident(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -14,8 +14,6 @@ class Incident(BaseModel):
     assigned_units: Optional[List[int]] = None
     patient_ids: Optional[List[int]] = None
     assigned_hospital: Optional[int] = None
-    route_to_incident: Optional[Dict[int, List[Any]]] = {}
-    route_to_hospital: Optional[Dict[int, List[Any]]] = {}
     needs_UPU: Optional[bool] = None
     started_at: Optional[str] = None
     ended_at: Optional[str] = None
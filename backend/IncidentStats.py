@@ -0,0 +1,212 @@
+import bisect
+from sqlalchemy import event, inspect, select, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import IncidentDB, IncidentStatsHourlyDB
+
+# Upper bounds (seconds) of the histogram buckets kept per rollup row; one more bucket catches the rest
+HISTOGRAM_EDGES = [
+    0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 900, 1200, 1800,
+    2700, 3600, 5400, 7200, 10800, 14400, 21600, 43200, 86400,
+]
+
+_table = IncidentStatsHourlyDB.__table__
+
+
+def _empty_histogram():
+    return [0] * (len(HISTOGRAM_EDGES) + 1)
+
+
+def _add_to_histogram(histogram, value, sign):
+    histogram = list(histogram or _empty_histogram())
+    histogram[bisect.bisect_left(HISTOGRAM_EDGES, value)] += sign
+    return histogram
+
+
+def merge_histograms(histograms):
+    merged = _empty_histogram()
+    for histogram in histograms:
+        for i, count in enumerate(histogram or ()):
+            merged[i] += count
+    return merged
+
+
+def histogram_quantile(histogram, q):
+    """Quantile estimated by linear interpolation inside the histogram bucket it falls in."""
+    total = sum(histogram)
+    if total <= 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(histogram):
+        if count and seen + count >= rank:
+            if i == len(HISTOGRAM_EDGES):
+                return float(HISTOGRAM_EDGES[-1])
+            lower = HISTOGRAM_EDGES[i - 1] if i else 0.0
+            return round(lower + (HISTOGRAM_EDGES[i] - lower) * (rank - seen) / count, 2)
+        seen += count
+    return float(HISTOGRAM_EDGES[-1])
+
+
+def summarize_times(count, total, histogram):
+    if not count:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p95": None}
+    return {
+        "count": count,
+        "mean": round(total / count, 2),
+        "p50": histogram_quantile(histogram, 0.5),
+        "p90": histogram_quantile(histogram, 0.9),
+        "p95": histogram_quantile(histogram, 0.95),
+    }
+
+
+def bucket_start(moment, bucket):
+    if bucket == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class IncidentStats:
+    """
+    Hourly rollups of resolved incidents by (hour started, type, severity): how many, and
+    the sum and histogram of their processing and resolution times. Rows are adjusted in
+    the same transaction that resolves, reopens or deletes an incident, so statistics read
+    a few rows per hour instead of every incident ever recorded.
+    """
+
+    def __init__(self, resolved_status):
+        self.resolved_status = resolved_status
+
+    def _contribution(self, values):
+        """Rollup key and measures of an incident, or None if it does not count (not resolved)."""
+        if values.get("status") != self.resolved_status or not values.get("started_at"):
+            return None
+        started_at, ended_at = values["started_at"], values.get("ended_at")
+        key = (bucket_start(started_at, "hour"), values.get("type") or "", values.get("severity") or 0)
+        resolution = (ended_at - started_at).total_seconds() if ended_at else None
+        return key, values.get("processing_time_seconds"), resolution
+
+    def _apply(self, conn, contribution, sign):
+        (hour, type_, severity), processing, resolution = contribution
+        key = (_table.c.hour == hour) & (_table.c.type == type_) & (_table.c.severity == severity)
+        empty = {
+            "hour": hour, "type": type_, "severity": severity, "resolved": 0,
+            "processing_count": 0, "processing_sum": 0.0, "processing_histogram": None,
+            "resolution_count": 0, "resolution_sum": 0.0, "resolution_histogram": None,
+        }
+        dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(conn.dialect.name)
+        if dialect:
+            # Create the row first: the insert takes the write lock, so sessions resolving
+            # incidents concurrently adjust the row one after the other instead of both inserting
+            conn.execute(dialect.insert(_table).values(**empty).on_conflict_do_nothing(
+                index_elements=["hour", "type", "severity"]
+            ))
+        row = conn.execute(select(_table).where(key).with_for_update()).mappings().first()
+        values = dict(row) if row else empty
+        values["resolved"] += sign
+        for name, measure in (("processing", processing), ("resolution", resolution)):
+            if measure is None:
+                continue
+            values[f"{name}_count"] += sign
+            values[f"{name}_sum"] += sign * measure
+            values[f"{name}_histogram"] = _add_to_histogram(values[f"{name}_histogram"], measure, sign)
+        values.pop("id", None)
+        if row:
+            conn.execute(update(_table).where(_table.c.id == row["id"]).values(**values))
+        else:
+            conn.execute(insert(_table).values(**values))
+
+    def track(self, session_factory):
+        """Adjust the rollups whenever a flush resolves, changes, reopens or deletes a resolved incident."""
+        columns = ("status", "type", "severity", "started_at", "ended_at", "processing_time_seconds")
+        stored_columns = [IncidentDB.__table__.c[column] for column in columns]
+
+        @event.listens_for(session_factory, "before_flush")
+        def update_rollups(session, flush_context, instances):
+            conn = None
+
+            def stored(incident):
+                # The row as the database still has it: attribute history is empty for expired values
+                return conn.execute(
+                    select(*stored_columns).where(IncidentDB.__table__.c.id == incident.id)
+                ).mappings().first() or {}
+
+            changes = []
+            for incident in session.new:
+                if isinstance(incident, IncidentDB):
+                    changes.append((None, {column: getattr(incident, column) for column in columns}))
+            for incident in session.dirty:
+                if isinstance(incident, IncidentDB):
+                    state = inspect(incident)
+                    if any(state.attrs[column].history.has_changes() for column in columns):
+                        changes.append((incident, {column: getattr(incident, column) for column in columns}))
+            for incident in session.deleted:
+                if isinstance(incident, IncidentDB):
+                    changes.append((incident, None))
+
+            for incident, values in changes:
+                after = self._contribution(values) if values else None
+                if incident is not None:
+                    conn = conn or session.connection()
+                    before = self._contribution(stored(incident))
+                else:
+                    before = None
+                if before == after:
+                    continue
+                conn = conn or session.connection()
+                if before:
+                    self._apply(conn, before, -1)
+                if after:
+                    self._apply(conn, after, 1)
+
+    def rebuild(self, db):
+        """Recompute every rollup row from the incidents table. Returns the number of rows written."""
+        db.execute(_table.delete())
+        conn = db.connection()
+        incidents = db.query(
+            IncidentDB.status, IncidentDB.type, IncidentDB.severity, IncidentDB.started_at,
+            IncidentDB.ended_at, IncidentDB.processing_time_seconds,
+        ).filter(IncidentDB.status == self.resolved_status).all()
+        for incident in incidents:
+            contribution = self._contribution(incident._asdict())
+            if contribution:
+                self._apply(conn, contribution, 1)
+        db.commit()
+        return db.query(IncidentStatsHourlyDB).count()
+
+    def summary(self, db, start, end, bucket="hour"):
+        """Totals, breakdowns and per-bucket series of the incidents resolved that started in [start, end)."""
+        rows = db.query(IncidentStatsHourlyDB).filter(
+            IncidentStatsHourlyDB.hour >= bucket_start(start, "hour"),
+            IncidentStatsHourlyDB.hour < end,
+        ).order_by(IncidentStatsHourlyDB.hour).all()
+
+        by_type, by_severity, series = {}, {}, {}
+        for row in rows:
+            by_type[row.type] = by_type.get(row.type, 0) + row.resolved
+            by_severity[row.severity] = by_severity.get(row.severity, 0) + row.resolved
+            slot = series.setdefault(bucket_start(row.hour, bucket), [])
+            slot.append(row)
+
+        def times(group, name):
+            return summarize_times(
+                sum(getattr(row, f"{name}_count") for row in group),
+                sum(getattr(row, f"{name}_sum") for row in group),
+                merge_histograms(getattr(row, f"{name}_histogram") for row in group),
+            )
+
+        return {
+            "resolved": sum(row.resolved for row in rows),
+            "by_type": by_type,
+            "by_severity": by_severity,
+            "processing_time_seconds": times(rows, "processing"),
+            "resolution_time_seconds": times(rows, "resolution"),
+            "buckets": [
+                {
+                    "start": slot_start.isoformat(),
+                    "resolved": sum(row.resolved for row in group),
+                    "processing_time_seconds": times(group, "processing"),
+                    "resolution_time_seconds": times(group, "resolution"),
+                }
+                for slot_start, group in series.items()
+            ],
+        }
@@ -0,0 +1,192 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Annotated, Optional
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, or_
+
+# Largest page a client may ask for; without a limit the endpoints still return every row
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "1000"))
+
+
+def _bad_request(detail):
+    return HTTPException(status_code=400, detail=detail)
+
+
+def _value(row, column):
+    return row[column] if isinstance(row, dict) else getattr(row, column)
+
+
+def _sort_key(row, column):
+    # Same order as apply(): NULLs before every value, then the id as tie-breaker
+    value = _value(row, column)
+    return (value is not None, value if value is not None else 0, _value(row, "id"))
+
+
+class ListQuery:
+    """
+    Filters, sort order and keyset pagination of a list endpoint, read from the query string.
+
+    The cursor is the (sort value, id) of the last row of the previous page, so a page is
+    an index range scan however deep it is and rows added meanwhile do not shift pages.
+    `sort` is a column name, prefixed with "-" for descending order.
+    """
+
+    def __init__(
+        self,
+        limit: Annotated[Optional[int], Query(ge=1, le=LIST_MAX_LIMIT)] = None,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+        status: Optional[str] = None,
+        severity_min: Optional[int] = None,
+        severity_max: Optional[int] = None,
+        started_after: Optional[datetime] = None,
+        started_before: Optional[datetime] = None,
+        bbox: Annotated[Optional[str], Query(description="min_lon,min_lat,max_lon,max_lat")] = None,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+        self.statuses = [part.strip() for part in status.split(",") if part.strip()] if status else None
+        self.severity_min = severity_min
+        self.severity_max = severity_max
+        self.started_after = started_after
+        self.started_before = started_before
+        self.bbox = self._parse_bbox(bbox) if bbox else None
+
+    @staticmethod
+    def _parse_bbox(bbox):
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+        except ValueError:
+            raise _bad_request("bbox must be min_lon,min_lat,max_lon,max_lat")
+        return min_lon, min_lat, max_lon, max_lat
+
+    def shape(self):
+        """Everything that decides which rows a request gets, for cache validators."""
+        return (
+            self.limit, self.cursor, self.sort, self.statuses, self.severity_min, self.severity_max,
+            self.started_after, self.started_before, self.bbox,
+        )
+
+    def sort_column(self, model):
+        """Name of the column rows are ordered by, and whether the order is descending."""
+        if not self.sort:
+            return "id", False
+        descending = self.sort.startswith("-")
+        name = self.sort.lstrip("-")
+        if name not in model.__table__.columns:
+            raise _bad_request(f"Cannot sort by {name}")
+        return name, descending
+
+    def _filters(self, model):
+        """(column, operator, value) for every filter given, checked against the model's columns."""
+        filters = []
+        if self.statuses:
+            filters.append(("status", "in", self.statuses))
+        if self.severity_min is not None:
+            filters.append(("severity", ">=", self.severity_min))
+        if self.severity_max is not None:
+            filters.append(("severity", "<=", self.severity_max))
+        if self.started_after is not None:
+            filters.append(("started_at", ">=", self.started_after))
+        if self.started_before is not None:
+            filters.append(("started_at", "<", self.started_before))
+        if self.bbox:
+            min_lon, min_lat, max_lon, max_lat = self.bbox
+            filters += [("lon", ">=", min_lon), ("lon", "<=", max_lon), ("lat", ">=", min_lat), ("lat", "<=", max_lat)]
+
+        columns = model.__table__.columns
+        for name, _, _ in filters:
+            if name not in columns:
+                raise _bad_request(f"{model.__tablename__} cannot be filtered by {name}")
+        return filters
+
+    def _decode_cursor(self, model, column):
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(self.cursor.encode()))
+        except (ValueError, TypeError):
+            raise _bad_request("Invalid cursor")
+        if value is not None and model.__table__.columns[column].type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+        return value, last_id
+
+    @staticmethod
+    def _encode_cursor(value, last_id):
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        return base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+
+    def apply(self, model, query):
+        """Filter, order and page a query of `model`. One extra row is read to detect the next page."""
+        table = model.__table__
+        for name, op, value in self._filters(model):
+            column = table.c[name]
+            if op == "in":
+                query = query.filter(column.in_(value))
+            elif op == ">=":
+                query = query.filter(column >= value)
+            elif op == "<=":
+                query = query.filter(column <= value)
+            else:
+                query = query.filter(column < value)
+
+        name, descending = self.sort_column(model)
+        column, id_column = table.c[name], table.c.id
+        if self.cursor:
+            value, last_id = self._decode_cursor(model, name)
+            query = query.filter(self._after(column, id_column, value, last_id, descending))
+        if name == "id":
+            query = query.order_by(id_column.desc() if descending else id_column)
+        elif descending:
+            # Spelled out: Postgres puts NULLs the other way round, which would break the cursors
+            query = query.order_by(column.desc().nulls_last(), id_column.desc())
+        else:
+            query = query.order_by(column.asc().nulls_first(), id_column)
+        if self.limit:
+            query = query.limit(self.limit + 1)
+        return query
+
+    @staticmethod
+    def _after(column, id_column, value, last_id, descending):
+        """Rows after (value, last_id) in the sort order, which has NULLs first ascending."""
+        if column is id_column:
+            return id_column < last_id if descending else id_column > last_id
+        if not descending:
+            if value is None:
+                return or_(and_(column.is_(None), id_column > last_id), column.isnot(None))
+            return or_(column > value, and_(column == value, id_column > last_id))
+        if value is None:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(column < value, and_(column == value, id_column < last_id), column.is_(None))
+
+    def apply_rows(self, model, rows):
+        """The same as apply() for tables served from memory as a list of dicts."""
+        for name, op, value in self._filters(model):
+            if op == "in":
+                rows = [row for row in rows if row.get(name) in value]
+            elif op == ">=":
+                rows = [row for row in rows if row.get(name) is not None and row[name] >= value]
+            elif op == "<=":
+                rows = [row for row in rows if row.get(name) is not None and row[name] <= value]
+            else:
+                rows = [row for row in rows if row.get(name) is not None and row[name] < value]
+
+        name, descending = self.sort_column(model)
+        rows = sorted(rows, key=lambda row: _sort_key(row, name), reverse=descending)
+        if self.cursor:
+            value, last_id = self._decode_cursor(model, name)
+            last = {name: value, "id": last_id}
+            after = _sort_key(last, name)
+            rows = [row for row in rows if (_sort_key(row, name) < after if descending else _sort_key(row, name) > after)]
+        return rows[:self.limit + 1] if self.limit else rows
+
+    def page(self, model, rows):
+        """Trim the extra row read by apply(); returns the page and the cursor of the next one, if any."""
+        if not self.limit or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        name, _ = self.sort_column(model)
+        last = rows[-1]
+        return rows, self._encode_cursor(_value(last, name), _value(last, "id"))
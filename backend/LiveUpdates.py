@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, inspect
+from models import IncidentDB, AmbulanceDB, HospitalDB, EmergencyCentersDB, PatientDB, UserDB
+
+# Messages a client may have waiting before it is dropped back to a fresh snapshot
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "500"))
+
+TOPICS = {
+    "incidents": IncidentDB,
+    "ambulances": AmbulanceDB,
+    "hospitals": HospitalDB,
+    "emergency_centers": EmergencyCentersDB,
+    "patients": PatientDB,
+    "users": UserDB,
+}
+HIDDEN_FIELDS = {"users": {"password"}}
+
+_TOPIC_BY_MODEL = {model: topic for topic, model in TOPICS.items()}
+
+# Deferred columns (route geometry) are left out of the messages and fetched on demand
+COLUMNS = {
+    topic: [attr.key for attr in inspect(model).column_attrs if not attr.deferred]
+    for topic, model in TOPICS.items()
+}
+
+# Queued in place of the dropped messages when a client falls behind
+RESYNC = object()
+
+
+class Snapshot:
+    """Queued when a client subscribes; the topic's snapshot is read when the sender reaches it."""
+    __slots__ = ("topic",)
+
+    def __init__(self, topic):
+        self.topic = topic
+
+
+def row_to_dict(topic, row, fields=None):
+    """Column values of a row, read without triggering lazy loads."""
+    values = inspect(row).dict
+    hidden = HIDDEN_FIELDS.get(topic, ())
+    columns = fields if fields is not None else COLUMNS[topic]
+    return {column: values.get(column) for column in columns if column not in hidden}
+
+
+def encode(message):
+    return json.dumps(jsonable_encoder(message))
+
+
+class Subscriber:
+    __slots__ = ("queue", "topics")
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.topics = set()
+
+
+class Broadcaster:
+    """
+    Fan-out of entity changes to the connected live clients. Each message is encoded once
+    and queued for every subscriber of its topic; a subscriber that falls more than
+    LIVE_QUEUE_SIZE messages behind gets a RESYNC marker instead and re-reads snapshots.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._loop = None
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, topic, message):
+        if not self._subscribers:
+            return
+        text = encode({"topic": topic, **message})
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        # Commits made from worker threads hand the message over to the event loop
+        if in_loop:
+            self._fan_out(topic, text)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fan_out, topic, text)
+
+    def _fan_out(self, topic, text):
+        self.published += 1
+        for subscriber in self._subscribers:
+            if topic not in subscriber.topics:
+                continue
+            queue = subscriber.queue
+            if queue.qsize() >= LIVE_QUEUE_SIZE:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+                self.resyncs += 1
+                continue
+            queue.put_nowait(text)
+            self.delivered += 1
+
+    def track(self, session_factory):
+        """Publish committed inserts, updates and deletes of the live topics."""
+
+        @event.listens_for(session_factory, "after_flush")
+        def collect_changes(session, flush_context):
+            pending = session.info.setdefault("live_changes", [])
+            for row in session.new:
+                topic = _TOPIC_BY_MODEL.get(type(row))
+                if topic:
+                    pending.append((topic, {"type": "upsert", "data": row_to_dict(topic, row)}))
+            for row in session.dirty:
+                topic = _TOPIC_BY_MODEL.get(type(row))
+                if not topic:
+                    continue
+                state = inspect(row)
+                changed = [
+                    column for column in COLUMNS[topic]
+                    if state.attrs[column].history.has_changes()
+                ]
+                data = row_to_dict(topic, row, changed)
+                if data:
+                    data["id"] = row.id
+                    pending.append((topic, {"type": "upsert", "data": data}))
+            for row in session.deleted:
+                topic = _TOPIC_BY_MODEL.get(type(row))
+                if topic:
+                    pending.append((topic, {"type": "delete", "id": row.id}))
+
+        @event.listens_for(session_factory, "after_commit")
+        def publish_changes(session):
+            for topic, message in session.info.pop("live_changes", []):
+                self.publish(topic, message)
+
+        @event.listens_for(session_factory, "after_rollback")
+        def drop_changes(session):
+            session.info.pop("live_changes", None)
+
+    def stats(self):
+        return {
+            "clients": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+        }
@@ -0,0 +1,482 @@
+import heapq
+import math
+import os
+import pickle
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from threading import Lock
+
+# Free-flow speeds (km/h) used when a way has no usable maxspeed tag
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 110, "motorway_link": 60,
+    "trunk": 90, "trunk_link": 50,
+    "primary": 70, "primary_link": 45,
+    "secondary": 60, "secondary_link": 40,
+    "tertiary": 50, "tertiary_link": 35,
+    "unclassified": 40, "residential": 30,
+    "living_street": 10, "service": 20, "road": 30,
+}
+ONEWAY_VALUES = {"yes", "true", "1"}
+
+# Speed used for the straight-line hop between a query point and the graph node it snaps to
+SNAP_SPEED_KMH = 20
+SNAP_CELL_DEG = 0.005
+SEARCH_SPACE_CACHE_SIZE = 4096
+# Witness searches stop after settling this many nodes; a larger limit gives fewer shortcuts
+# but a slower preprocessing step.
+WITNESS_SETTLE_LIMIT = 60
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    r = 6371000.0
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+def _parse_speed(tags):
+    maxspeed = tags.get("maxspeed", "")
+    if maxspeed.isdigit():
+        return float(maxspeed)
+    return float(HIGHWAY_SPEEDS_KMH[tags["highway"]])
+
+
+class LocalRouter:
+    """
+    In-process road router built from an OSM extract.
+
+    Only intersections become graph nodes, the shape points between them are kept as
+    edge geometry. A contraction hierarchy is computed once so that a duration query is
+    two small upward searches; search spaces of repeated points (hospitals, bases) are
+    memoized, so an N x 1 matrix is one backward search plus N dictionary intersections.
+    Queries are CPU-bound and meant to run on worker threads; they share the memo caches,
+    so one runs at a time.
+    """
+
+    def __init__(self):
+        self.node_lon = array("d")
+        self.node_lat = array("d")
+        # (u, v) -> (duration_s, geometry index, geometry reversed)
+        self.edges = {}
+        self.geometries = []
+        # (u, v) -> middle node for every shortcut of the hierarchy
+        self.middle = {}
+        self.rank = array("i")
+        # CSR upward graphs: forward (u -> higher v) and backward (higher u -> v, stored at v)
+        self.fwd_offsets = array("i")
+        self.fwd_targets = array("i")
+        self.fwd_weights = array("f")
+        self.bwd_offsets = array("i")
+        self.bwd_targets = array("i")
+        self.bwd_weights = array("f")
+        self._snap_grid = {}
+        self._snap_cache = OrderedDict()
+        self._space_cache = OrderedDict()
+        self._query_lock = Lock()
+
+    def __getstate__(self):
+        # The memo caches are not worth storing and a lock cannot be pickled
+        state = self.__dict__.copy()
+        for name in ("_snap_cache", "_space_cache", "_query_lock"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._snap_cache = OrderedDict()
+        self._space_cache = OrderedDict()
+        self._query_lock = Lock()
+
+    @property
+    def node_count(self):
+        return len(self.node_lon)
+
+    # Loading
+
+    @classmethod
+    def from_osm(cls, path):
+        router = cls()
+        router._load_osm(path)
+        router._build_hierarchy()
+        router._build_snap_grid()
+        return router
+
+    @classmethod
+    def load(cls, path):
+        """Load a preprocessed graph, rebuilding the on-disk cache when the extract is newer."""
+        cache_path = path + ".ch.pickle"
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+
+        router = cls.from_osm(path)
+        with open(cache_path, "wb") as f:
+            pickle.dump(router, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return router
+
+    def _load_osm(self, path):
+        ways = []
+        needed = {}
+        for _, elem in ET.iterparse(path, events=("end",)):
+            if elem.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+                if tags.get("highway") in HIGHWAY_SPEEDS_KMH and tags.get("access") not in ("no", "private"):
+                    refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                    if len(refs) >= 2:
+                        ways.append((refs, tags))
+                        for i, ref in enumerate(refs):
+                            # Way endpoints always become graph nodes
+                            bump = 2 if i in (0, len(refs) - 1) else 1
+                            needed[ref] = needed.get(ref, 0) + bump
+            if elem.tag in ("node", "way", "relation"):
+                elem.clear()
+
+        coords = {}
+        for _, elem in ET.iterparse(path, events=("end",)):
+            if elem.tag == "node":
+                node_id = int(elem.get("id"))
+                if node_id in needed:
+                    coords[node_id] = (float(elem.get("lon")), float(elem.get("lat")))
+            if elem.tag in ("node", "way", "relation"):
+                elem.clear()
+
+        index = {}
+
+        def graph_node(osm_id):
+            if osm_id not in index:
+                index[osm_id] = len(self.node_lon)
+                lon, lat = coords[osm_id]
+                self.node_lon.append(lon)
+                self.node_lat.append(lat)
+            return index[osm_id]
+
+        for refs, tags in ways:
+            refs = [ref for ref in refs if ref in coords]
+            if len(refs) < 2:
+                continue
+            speed_ms = _parse_speed(tags) / 3.6
+            oneway = tags.get("oneway")
+            if oneway == "-1":
+                forward, backward = False, True
+            else:
+                forward = True
+                backward = oneway not in ONEWAY_VALUES and tags.get("junction") != "roundabout"
+
+            start = refs[0]
+            shape = [coords[start]]
+            length = 0.0
+            for ref in refs[1:]:
+                prev = shape[-1]
+                point = coords[ref]
+                length += haversine_m(prev[0], prev[1], point[0], point[1])
+                shape.append(point)
+                if needed[ref] >= 2 or ref == refs[-1]:
+                    if ref != start:
+                        self._add_road(graph_node(start), graph_node(ref), length / speed_ms, shape, forward, backward)
+                    start = ref
+                    shape = [point]
+                    length = 0.0
+
+    def _add_road(self, u, v, duration, shape, forward, backward):
+        geom_id = len(self.geometries)
+        flat = array("d")
+        for lon, lat in shape:
+            flat.append(lon)
+            flat.append(lat)
+        self.geometries.append(flat)
+        if forward and duration < self.edges.get((u, v), (math.inf,))[0]:
+            self.edges[(u, v)] = (duration, geom_id, False)
+        if backward and duration < self.edges.get((v, u), (math.inf,))[0]:
+            self.edges[(v, u)] = (duration, geom_id, True)
+
+    # Contraction hierarchy
+
+    def _build_hierarchy(self):
+        n = self.node_count
+        out_adj = [dict() for _ in range(n)]
+        in_adj = [dict() for _ in range(n)]
+        for (u, v), (duration, _, _) in self.edges.items():
+            out_adj[u][v] = duration
+            in_adj[v][u] = duration
+
+        contracted = bytearray(n)
+        deleted_neighbours = [0] * n
+        rank = [0] * n
+        up_fwd = [[] for _ in range(n)]
+        up_bwd = [[] for _ in range(n)]
+
+        def witness_distances(source, skip, limit):
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap and settled < WITNESS_SETTLE_LIMIT:
+                d, x = heapq.heappop(heap)
+                if d > limit:
+                    break
+                if d > dist.get(x, math.inf):
+                    continue
+                settled += 1
+                for y, w in out_adj[x].items():
+                    if y == skip or contracted[y]:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(y, math.inf):
+                        dist[y] = nd
+                        heapq.heappush(heap, (nd, y))
+            return dist
+
+        def shortcuts_for(v):
+            shortcuts = []
+            outs = [(w, d) for w, d in out_adj[v].items() if not contracted[w]]
+            if not outs:
+                return shortcuts
+            max_out = max(d for _, d in outs)
+            for u, d_in in in_adj[v].items():
+                if contracted[u]:
+                    continue
+                witness = witness_distances(u, v, d_in + max_out)
+                for w, d_out in outs:
+                    if w == u:
+                        continue
+                    via = d_in + d_out
+                    if witness.get(w, math.inf) > via:
+                        shortcuts.append((u, w, via))
+            return shortcuts
+
+        def priority(v):
+            degree = len(in_adj[v]) + len(out_adj[v])
+            return len(shortcuts_for(v)) - degree + deleted_neighbours[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        next_rank = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # Lazy update: re-evaluate and put back if no longer the cheapest node
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+
+            for u, w, via in shortcuts_for(v):
+                if via < out_adj[u].get(w, math.inf):
+                    out_adj[u][w] = via
+                    in_adj[w][u] = via
+                    self.middle[(u, w)] = v
+
+            for w, d in out_adj[v].items():
+                up_fwd[v].append((w, d))
+                del in_adj[w][v]
+                deleted_neighbours[w] += 1
+            for u, d in in_adj[v].items():
+                up_bwd[v].append((u, d))
+                del out_adj[u][v]
+                deleted_neighbours[u] += 1
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+            contracted[v] = 1
+            rank[v] = next_rank
+            next_rank += 1
+
+        self.rank = array("i", rank)
+        self.fwd_offsets, self.fwd_targets, self.fwd_weights = self._to_csr(up_fwd)
+        self.bwd_offsets, self.bwd_targets, self.bwd_weights = self._to_csr(up_bwd)
+
+    @staticmethod
+    def _to_csr(adjacency):
+        offsets = array("i", [0])
+        targets = array("i")
+        weights = array("f")
+        for neighbours in adjacency:
+            for target, weight in neighbours:
+                targets.append(target)
+                weights.append(weight)
+            offsets.append(len(targets))
+        return offsets, targets, weights
+
+    def _search_space(self, node, forward):
+        """Upward Dijkstra from `node`; returns (dist, parent) dictionaries, memoized per node."""
+        key = (node, forward)
+        cached = self._space_cache.get(key)
+        if cached is not None:
+            self._space_cache.move_to_end(key)
+            return cached
+
+        if forward:
+            offsets, targets, weights = self.fwd_offsets, self.fwd_targets, self.fwd_weights
+        else:
+            offsets, targets, weights = self.bwd_offsets, self.bwd_targets, self.bwd_weights
+
+        dist = {node: 0.0}
+        parent = {}
+        heap = [(0.0, node)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            for i in range(offsets[x], offsets[x + 1]):
+                y = targets[i]
+                nd = d + weights[i]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    parent[y] = x
+                    heapq.heappush(heap, (nd, y))
+
+        self._space_cache[key] = (dist, parent)
+        if len(self._space_cache) > SEARCH_SPACE_CACHE_SIZE:
+            self._space_cache.popitem(last=False)
+        return dist, parent
+
+    @staticmethod
+    def _meeting_point(forward_dist, backward_dist):
+        if len(forward_dist) > len(backward_dist):
+            smaller, other = backward_dist, forward_dist
+        else:
+            smaller, other = forward_dist, backward_dist
+        best, meet = math.inf, None
+        for x, d in smaller.items():
+            od = other.get(x)
+            if od is not None and d + od < best:
+                best, meet = d + od, x
+        return best, meet
+
+    # Snapping
+
+    def _build_snap_grid(self):
+        grid = {}
+        for i in range(self.node_count):
+            cell = (int(self.node_lon[i] // SNAP_CELL_DEG), int(self.node_lat[i] // SNAP_CELL_DEG))
+            grid.setdefault(cell, []).append(i)
+        self._snap_grid = grid
+
+    def snap(self, lon, lat, max_rings=20):
+        """Nearest graph node to the point and the straight-line distance to it in meters."""
+        cached = self._snap_cache.get((lon, lat))
+        if cached is not None:
+            return cached
+
+        # Equirectangular distances are plenty to rank nearby candidates
+        x_scale = math.cos(math.radians(lat))
+        cx, cy = int(lon // SNAP_CELL_DEG), int(lat // SNAP_CELL_DEG)
+        best, best_sq = None, math.inf
+        for ring in range(max_rings + 1):
+            for x in range(cx - ring, cx + ring + 1):
+                for y in range(cy - ring, cy + ring + 1):
+                    if max(abs(x - cx), abs(y - cy)) != ring:
+                        continue
+                    for i in self._snap_grid.get((x, y), ()):
+                        dx = (self.node_lon[i] - lon) * x_scale
+                        dy = self.node_lat[i] - lat
+                        sq = dx * dx + dy * dy
+                        if sq < best_sq:
+                            best, best_sq = i, sq
+            # Anything in the next ring is at least `ring` cells away
+            if best is not None and math.sqrt(best_sq) < ring * SNAP_CELL_DEG * x_scale:
+                break
+
+        if best is None:
+            return None, math.inf
+        result = (best, haversine_m(lon, lat, self.node_lon[best], self.node_lat[best]))
+        self._snap_cache[(lon, lat)] = result
+        if len(self._snap_cache) > SEARCH_SPACE_CACHE_SIZE:
+            self._snap_cache.popitem(last=False)
+        return result
+
+    # Queries
+
+    def durations_to(self, origins, destination):
+        """Durations in seconds from each (lon, lat) origin to the destination, None when unreachable."""
+        with self._query_lock:
+            return self._durations_to(origins, destination)
+
+    def _durations_to(self, origins, destination):
+        target, target_offset = self.snap(*destination)
+        if target is None:
+            return [None] * len(origins)
+        backward_dist, _ = self._search_space(target, False)
+        snap_speed = SNAP_SPEED_KMH / 3.6
+
+        durations = []
+        for lon, lat in origins:
+            source, source_offset = self.snap(lon, lat)
+            if source is None:
+                durations.append(None)
+                continue
+            forward_dist, _ = self._search_space(source, True)
+            best, _ = self._meeting_point(forward_dist, backward_dist)
+            if best == math.inf:
+                durations.append(None)
+            else:
+                durations.append(best + (source_offset + target_offset) / snap_speed)
+        return durations
+
+    def route(self, start_lon, start_lat, end_lon, end_lat):
+        """Road geometry as [[lon, lat], ...] between the two points, None when unreachable."""
+        with self._query_lock:
+            return self._route(start_lon, start_lat, end_lon, end_lat)
+
+    def _route(self, start_lon, start_lat, end_lon, end_lat):
+        source, _ = self.snap(start_lon, start_lat)
+        target, _ = self.snap(end_lon, end_lat)
+        if source is None or target is None:
+            return None
+
+        forward_dist, forward_parent = self._search_space(source, True)
+        backward_dist, backward_parent = self._search_space(target, False)
+        best, meet = self._meeting_point(forward_dist, backward_dist)
+        if meet is None:
+            return None
+
+        up = [meet]
+        while up[-1] != source:
+            up.append(forward_parent[up[-1]])
+        up.reverse()
+        down = [meet]
+        while down[-1] != target:
+            down.append(backward_parent[down[-1]])
+        nodes = up + down[1:]
+
+        points = [[start_lon, start_lat]]
+        for a, b in zip(nodes, nodes[1:]):
+            for u, v in self._unpack(a, b):
+                _, geom_id, reverse = self.edges[(u, v)]
+                flat = self.geometries[geom_id]
+                shape = [[flat[i], flat[i + 1]] for i in range(0, len(flat), 2)]
+                if reverse:
+                    shape.reverse()
+                for point in shape:
+                    if point != points[-1]:
+                        points.append(point)
+        if points[-1] != [end_lon, end_lat]:
+            points.append([end_lon, end_lat])
+        return points
+
+    def _unpack(self, u, v):
+        stack = [(u, v)]
+        edges = []
+        while stack:
+            a, b = stack.pop()
+            m = self.middle.get((a, b))
+            if m is None:
+                edges.append((a, b))
+            else:
+                # Push the second half first so the first half is unpacked first
+                stack.append((m, b))
+                stack.append((a, m))
+        return edges
+
+
+if __name__ == "__main__":
+    # Preprocess an extract ahead of time: python LocalRouter.py maramures.osm
+    started = time.perf_counter()
+    router = LocalRouter.load(sys.argv[1])
+    print(f"Loaded {router.node_count} nodes, {len(router.edges)} edges, "
+          f"{len(router.middle)} shortcuts in {time.perf_counter() - started:.1f}s")
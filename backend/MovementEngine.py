@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import math
+import os
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How often every en-route ambulance is advanced (the map polls once a second)
+MOVEMENT_TICK_SECONDS = float(os.getenv("MOVEMENT_TICK_SECONDS", "1"))
+# Simulated seconds per real second; above 1 missions fast-forward (load tests, demos)
+MOVEMENT_TIME_SCALE = float(os.getenv("MOVEMENT_TIME_SCALE", "1"))
+
+TO_INCIDENT = "to_incident"
+ON_SCENE = "on_scene"
+TO_HOSPITAL = "to_hospital"
+AT_HOSPITAL = "at_hospital"
+RETURNING = "returning"
+
+
+class Leg:
+    """One phase of a mission: a route to follow (or None to stay put) over a duration."""
+    __slots__ = ("phase", "coords", "cum", "duration")
+
+    def __init__(self, phase, route, duration_minutes):
+        self.phase = phase
+        self.duration = max(0.0, (duration_minutes or 0) * 60 / MOVEMENT_TIME_SCALE)
+        self.coords = None
+        self.cum = None
+
+        points = [point[:2] for point in (route or []) if point and len(point) >= 2]
+        if not points:
+            return
+        self.coords = np.asarray(points, dtype=float)
+        if len(points) == 1:
+            return
+        # Progress along the route is proportional to distance, with longitude scaled to meters
+        scale = math.cos(math.radians(float(self.coords[:, 1].mean())))
+        steps = np.diff(self.coords, axis=0) * (scale, 1.0)
+        cum = np.concatenate(([0.0], np.cumsum(np.hypot(steps[:, 0], steps[:, 1]))))
+        self.cum = cum / cum[-1] if cum[-1] > 0 else np.linspace(0.0, 1.0, len(points))
+
+    @property
+    def moving(self):
+        return self.cum is not None
+
+
+def mission_legs(route_to_incident, eta, scene_time, route_to_hospital, hospital_eta,
+                 hospital_time, route_to_base, back_to_base_eta):
+    """The legs of a dispatch, durations in minutes like the rest of the dispatch code."""
+    return [
+        Leg(TO_INCIDENT, route_to_incident, eta),
+        Leg(ON_SCENE, None, scene_time),
+        Leg(TO_HOSPITAL, route_to_hospital, hospital_eta),
+        Leg(AT_HOSPITAL, None, hospital_time),
+        Leg(RETURNING, route_to_base, back_to_base_eta),
+    ]
+
+
+class Mission:
+    __slots__ = ("ambulance_id", "incident_id", "legs", "leg_index", "leg_started")
+
+    def __init__(self, ambulance_id, incident_id, legs, started):
+        self.ambulance_id = ambulance_id
+        self.incident_id = incident_id
+        self.legs = legs
+        self.leg_index = 0
+        self.leg_started = started
+
+    @property
+    def leg(self):
+        return self.legs[self.leg_index]
+
+
+class MovementEngine:
+    """
+    Single clock for every ambulance on a mission. Each tick advances all of them
+    along their routes at once and fires on_leg_end(ambulance_id, incident_id, phase)
+    when a phase is over. A mission is cancelled by removing it from the table.
+
+    on_positions(ambulance_ids, lons, lats) receives the new positions every tick.
+    """
+
+    def __init__(self, on_positions, on_leg_end, tick=MOVEMENT_TICK_SECONDS):
+        self.on_positions = on_positions
+        self.on_leg_end = on_leg_end
+        self.tick = tick
+        # ambulance_id -> Mission, the only record of what an ambulance is doing
+        self._missions = {}
+        self._packed = None
+        self.ticks = 0
+        self.last_tick_ms = 0.0
+
+    def __len__(self):
+        return len(self._missions)
+
+    def __contains__(self, ambulance_id):
+        return ambulance_id in self._missions
+
+    def start(self, ambulance_id, legs, incident_id=None):
+        """Start a mission, replacing the current one. Returns True if one was replaced."""
+        replaced = self._missions.pop(ambulance_id, None) is not None
+        self._missions[ambulance_id] = Mission(ambulance_id, incident_id, legs, time.monotonic())
+        self._packed = None
+        return replaced
+
+    def cancel(self, ambulance_id):
+        """Stop the ambulance where it is. Returns True if it was on a mission."""
+        if self._missions.pop(ambulance_id, None) is None:
+            return False
+        self._packed = None
+        return True
+
+    def phase(self, ambulance_id):
+        mission = self._missions.get(ambulance_id)
+        return mission.leg.phase if mission else None
+
+    def remaining_route(self, ambulance_id, now=None):
+        """
+        (phase, [[lon, lat], ...]) of an ambulance on a mission: the rest of its current leg
+        from where it is now, or the next leg's route while it stands still. (None, None) otherwise.
+        """
+        mission = self._missions.get(ambulance_id)
+        if mission is None:
+            return None, None
+        leg = mission.leg
+        if not leg.moving:
+            upcoming = next((later for later in mission.legs[mission.leg_index + 1:] if later.moving), None)
+            return leg.phase, upcoming.coords.tolist() if upcoming else []
+        now = time.monotonic() if now is None else now
+        progress = min(max((now - mission.leg_started) / leg.duration, 0.0), 1.0) if leg.duration else 1.0
+        i = min(max(int(np.searchsorted(leg.cum, progress, side="right")) - 1, 0), len(leg.cum) - 2)
+        span = leg.cum[i + 1] - leg.cum[i]
+        t = (progress - leg.cum[i]) / span if span > 0 else 0.0
+        position = leg.coords[i] + (leg.coords[i + 1] - leg.coords[i]) * t
+        return leg.phase, [position.tolist()] + leg.coords[i + 1:].tolist()
+
+    def _pack(self):
+        """Concatenate the routes of every moving leg so one tick is a handful of array operations."""
+        moving = [m for m in self._missions.values() if m.leg.moving]
+        if not moving:
+            return None
+        sizes = np.array([len(m.leg.coords) for m in moving])
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        return {
+            "ids": [m.ambulance_id for m in moving],
+            "coords": np.concatenate([m.leg.coords for m in moving]),
+            # Leg k's progress maps to k + [0, 1], so one sorted array serves every leg
+            "keys": np.concatenate([k + m.leg.cum for k, m in enumerate(moving)]),
+            "starts": np.array([m.leg_started for m in moving]),
+            "durations": np.array([m.leg.duration for m in moving]),
+            "first": offsets,
+            "last_segment": offsets + sizes - 2,
+        }
+
+    def step(self, now=None):
+        now = time.monotonic() if now is None else now
+        ended = []
+        snapped = {}
+
+        for mission in list(self._missions.values()):
+            while mission.leg_index < len(mission.legs):
+                leg = mission.leg
+                if now - mission.leg_started < leg.duration:
+                    break
+                if leg.coords is not None:
+                    snapped[mission.ambulance_id] = leg.coords[-1]
+                ended.append((mission.ambulance_id, mission.incident_id, leg.phase))
+                mission.leg_started += leg.duration
+                mission.leg_index += 1
+                self._packed = None
+            if mission.leg_index >= len(mission.legs):
+                del self._missions[mission.ambulance_id]
+
+        if self._packed is None:
+            self._packed = self._pack()
+
+        ids, lons, lats = [], [], []
+        packed = self._packed
+        if packed:
+            progress = np.clip((now - packed["starts"]) / packed["durations"], 0.0, 1.0)
+            target = np.arange(len(progress)) + progress
+            keys = packed["keys"]
+            idx = np.searchsorted(keys, target, side="right") - 1
+            idx = np.clip(idx, packed["first"], packed["last_segment"])
+            span = keys[idx + 1] - keys[idx]
+            t = np.divide(target - keys[idx], span, out=np.zeros_like(span), where=span > 0)
+            coords = packed["coords"]
+            positions = coords[idx] + (coords[idx + 1] - coords[idx]) * t[:, None]
+            ids.extend(packed["ids"])
+            lons.extend(positions[:, 0].tolist())
+            lats.extend(positions[:, 1].tolist())
+
+        moving_ids = set(ids)
+        for ambulance_id, (lon, lat) in snapped.items():
+            if ambulance_id not in moving_ids:
+                ids.append(ambulance_id)
+                lons.append(float(lon))
+                lats.append(float(lat))
+
+        if ids:
+            self.on_positions(ids, lons, lats)
+        for ambulance_id, incident_id, phase in ended:
+            try:
+                self.on_leg_end(ambulance_id, incident_id, phase)
+            except Exception as e:
+                logger.error(f"Movement engine: handling end of {phase} for ambulance {ambulance_id} failed: {e}")
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Movement engine tick failed: {e}")
+            self.ticks += 1
+            self.last_tick_ms = round((time.perf_counter() - started) * 1000, 2)
+            await asyncio.sleep(self.tick)
+
+    def stats(self):
+        phases = {}
+        for mission in self._missions.values():
+            phases[mission.leg.phase] = phases.get(mission.leg.phase, 0) + 1
+        return {
+            "active_missions": len(self._missions),
+            "phases": phases,
+            "ticks": self.ticks,
+            "last_tick_ms": self.last_tick_ms,
+        }
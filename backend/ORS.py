@@ -1,47 +1,154 @@
-import requests
 import os
+import asyncio
+import logging
+import httpx
+import HttpClient
 from dotenv import load_dotenv
+from TravelTimeCache import TravelTimeCache
+from LocalRouter import LocalRouter
 
 load_dotenv()
-ORS_API_KEY = os.getenv("ORS_API_KEY")
-sorted_etas = []
-def get_eta(ambulances, incident):
-    url = "https://api.openrouteservice.org/v2/matrix/driving-car"
+logger = logging.getLogger(__name__)
+ORS_API_KEY = os.getenv("ORS_API_KEY", "")
+eta_cache = TravelTimeCache()
+
+# Point at another ORS instance (self-hosted, or the benchmark stand-in) without code changes
+ORS_BASE_URL = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org").rstrip("/")
+MATRIX_URL = f"{ORS_BASE_URL}/v2/matrix/driving-car"
+DIRECTIONS_URL = f"{ORS_BASE_URL}/v2/directions/driving-car/geojson"
+
+# "ors" uses the hosted API only, "local" the in-process road graph only,
+# "auto" asks ORS first and falls back to the local graph when it fails.
+ROUTING_BACKEND = os.getenv("ROUTING_BACKEND", "ors").lower()
+LOCAL_ROUTING_GRAPH = os.getenv("LOCAL_ROUTING_GRAPH")
+local_router = None
+
+
+def load_local_router():
+    """Load the OSM extract configured in LOCAL_ROUTING_GRAPH (blocking, run it off the event loop)."""
+    global local_router
+    if LOCAL_ROUTING_GRAPH and local_router is None:
+        local_router = LocalRouter.load(LOCAL_ROUTING_GRAPH)
+    return local_router
+
+
+def local_routing_status():
+    if not LOCAL_ROUTING_GRAPH:
+        return "Not configured"
+    if local_router is None:
+        return "Not loaded"
+    return f"Loaded ({local_router.node_count} nodes)"
+
+
+# ORS rejects matrix requests above this many source x destination cells
+ORS_MATRIX_MAX_ELEMENTS = int(os.getenv("ORS_MATRIX_MAX_ELEMENTS", "3500"))
+
+
+async def _request_matrix(origins, destinations):
+    if ROUTING_BACKEND != "local":
+        matrix = await _request_ors_matrix(origins, destinations)
+        if matrix is not None or ROUTING_BACKEND != "auto":
+            return matrix
+    if local_router is None:
+        logger.warning("Local routing graph is not loaded")
+        return None
+    # Hierarchy queries are CPU-bound, keep them off the event loop
+    return await asyncio.to_thread(_local_matrix, origins, destinations)
+
+
+def _local_matrix(origins, destinations):
+    columns = [local_router.durations_to(origins, destination) for destination in destinations]
+    return [list(row) for row in zip(*columns)]
+
+
+async def _request_ors_matrix(origins, destinations):
+    """
+    Ask ORS for the durations (in seconds) from every origin to every destination.
+    Returns one row per origin, with one column per destination.
+    """
     headers = {
         "Authorization": ORS_API_KEY,
         "Content-Type": "application/json"
     }
-
-    # Here we append all the ambulances locations to minimise the requests we make to the API
-    # and add the incident at the end
-    locations = [ [amb.lon, amb.lat] for amb in ambulances ]
-    locations.append([incident.lon, incident.lat])
+    locations = [list(origin) for origin in origins]
+    locations.extend(list(destination) for destination in destinations)
 
     body = {
         "locations": locations,
-        "metrics": ["duration", "distance"]
+        "sources": list(range(len(origins))),
+        "destinations": list(range(len(origins), len(locations))),
+        "metrics": ["duration"]
     }
 
-    response = requests.post(url, json=body, headers=headers)
+    try:
+        response = await HttpClient.post("ors", MATRIX_URL, json=body, headers=headers)
+    except httpx.HTTPError as e:
+        logger.warning(f"ORS matrix request failed: {e!r}")
+        return None
     if response.status_code != 200:
-        print("ORS Error:", response.status_code, response.text)
-        return None, None
+        logger.error(f"ORS matrix error {response.status_code}: {response.text}")
+        return None
 
     data = response.json()
     if "durations" not in data:
-        print("No durations in response:", data)
-        return None, None
+        logger.error(f"No durations in ORS matrix response: {data}")
+        return None
 
-    data = response.json()
-    print(data)
+    return data["durations"]
+
+
+async def get_duration_matrix(origins, destinations):
+    """
+    Durations in seconds from each (lon, lat) origin (rows) to each destination (columns).
+    Cached cells are served locally; the origins and destinations with a miss go to ORS
+    together, split by rows so each request stays under ORS_MATRIX_MAX_ELEMENTS.
+    Returns None if the missing cells could not be fetched.
+    """
+    matrix = [[eta_cache.get(origin, destination) for destination in destinations] for origin in origins]
+    missing_rows = [i for i, row in enumerate(matrix) if None in row]
+    if not missing_rows:
+        return matrix
+    missing_cols = sorted({j for i in missing_rows for j, duration in enumerate(matrix[i]) if duration is None})
+
+    dests = [destinations[j] for j in missing_cols]
+    rows_per_request = max(1, ORS_MATRIX_MAX_ELEMENTS // len(dests))
+    chunks = [missing_rows[k:k + rows_per_request] for k in range(0, len(missing_rows), rows_per_request)]
+    results = await asyncio.gather(*(_request_matrix([origins[i] for i in chunk], dests) for chunk in chunks))
+
+    for chunk, fetched in zip(chunks, results):
+        if fetched is None:
+            return None
+        for i, row in zip(chunk, fetched):
+            for j, duration in zip(missing_cols, row):
+                matrix[i][j] = duration
+                eta_cache.put(origins[i], destinations[j], duration)
+    return matrix
+
+
+async def get_durations(origins, destination):
+    """
+    Durations in seconds from each (lon, lat) origin to the destination.
+    Cached pairs are served locally, only the misses go to ORS in one matrix request.
+    Returns None if ORS could not be reached for the missing pairs.
+    """
+    matrix = await get_duration_matrix(origins, [destination])
+    if matrix is None:
+        return None
+    return [row[0] for row in matrix]
+
+
+async def get_eta(ambulances, incident):
+    # All the ambulances locations go in a single lookup to minimise the requests we make to the API
+    origins = [(amb.lon, amb.lat) for amb in ambulances]
+    durations = await get_durations(origins, (incident.lon, incident.lat))
+    if durations is None:
+        return None, None, []
 
-    incident_index = len(locations) - 1
     best_eta = float("inf")
     best_ambulance = None
     results = []
     # We go through all the ETA's to see which one's the closest ( in minutes )
-    for i, amb in enumerate(ambulances):
-        duration = data["durations"][i][incident_index]
+    for amb, duration in zip(ambulances, durations):
         if duration is None:
             continue
         eta = duration / 60
@@ -49,88 +156,105 @@ def get_eta(ambulances, incident):
         if eta < best_eta:
             best_eta = eta
             best_ambulance = amb
+    if best_ambulance is None:
+        return None, None, []
     results.sort(key=lambda x: x[1])
-    sorted_etas = results
-    return best_ambulance, round(best_eta, 1), sorted_etas
+    return best_ambulance, round(best_eta, 1), results
 
 
-def get_return_eta(ambulance):
-    url = "https://api.openrouteservice.org/v2/matrix/driving-car"
-    headers = {
-        "Authorization": ORS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    locations = [ [ambulance.lon, ambulance.lat], [ambulance.default_lon, ambulance.default_lat]]
+async def get_return_eta(ambulance):
+    if None in [ambulance.lon, ambulance.lat, ambulance.default_lon, ambulance.default_lat]:
+        return None
+    durations = await get_durations(
+        [(ambulance.lon, ambulance.lat)],
+        (ambulance.default_lon, ambulance.default_lat)
+    )
+    if not durations or durations[0] is None:
+        return None
 
-    body = {
-        "locations": locations,
-        "metrics": ["duration", "distance"]
-    }
-    response = requests.post(url, json=body, headers=headers)
-    if response.status_code != 200:
-        print("ORS Error:", response.status_code, response.text)
+    eta = durations[0] / 60
+    return round(eta, 1)
+
+
+def get_eta_cache_stats():
+    return eta_cache.stats()
+
+
+async def get_route_geometry(start_lon, start_lat, end_lon, end_lat):
+    route = await get_route(start_lon, start_lat, end_lon, end_lat)
+    return route[0] if route else None
+
+
+async def get_route(start_lon, start_lat, end_lon, end_lat):
+    """
+    (route points, duration in seconds) between two points, or None without a route.
+    ORS directions carry the duration in their summary, so it costs no matrix request;
+    it is None when the response had no summary.
+    """
+    # Validate coordinates
+    if None in [start_lon, start_lat, end_lon, end_lat]:
+        logger.warning("Invalid coordinates: one or more coordinates are None")
         return None
-    data = response.json()
-    if "durations" not in data:
-        print("No durations in response:", data)
+
+    if ROUTING_BACKEND != "local":
+        route = await _request_ors_route(start_lon, start_lat, end_lon, end_lat)
+        if route is not None or ROUTING_BACKEND != "auto":
+            return route
+    if local_router is None:
+        logger.warning("Local routing graph is not loaded")
         return None
-    duration = data["durations"][0][1]
-    if duration is None:
+    return await asyncio.to_thread(_local_route, start_lon, start_lat, end_lon, end_lat)
+
+
+def _local_route(start_lon, start_lat, end_lon, end_lat):
+    points = local_router.route(start_lon, start_lat, end_lon, end_lat)
+    if points is None:
         return None
-    
-    eta = duration / 60
-    return round(eta, 1)
+    return points, local_router.durations_to([(start_lon, start_lat)], (end_lon, end_lat))[0]
 
 
-def get_route_geometry(start_lon, start_lat, end_lon, end_lat):
-    url = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
+async def _request_ors_route(start_lon, start_lat, end_lon, end_lat):
+    url = DIRECTIONS_URL
     headers = {
         "Authorization": ORS_API_KEY,
         "Content-Type": "application/json"
     }
     
-    # Validate coordinates
-    if None in [start_lon, start_lat, end_lon, end_lat]:
-        print("Invalid coordinates: one or more coordinates are None")
-        return None
-    
     body = {
         "coordinates": [[start_lon, start_lat], [end_lon, end_lat]],
         "radiuses": [-1, -1]
     }
     
     try:
-        response = requests.post(url, json=body, headers=headers)
-        print(f"ORS Response Status: {response.status_code}")
+        response = await HttpClient.post("ors", url, json=body, headers=headers)
+        logger.debug(f"ORS directions status: {response.status_code}")
         
         if response.status_code != 200:
-            print("ORS Error:", response.status_code, response.text)
+            logger.error(f"ORS directions error {response.status_code}: {response.text}")
             return None
             
         data = response.json()
-        print("ORS Response structure:", list(data.keys()))
         
         # Now it should have 'features' since we requested GeoJSON
         if "features" not in data or len(data["features"]) == 0:
-            print("No features in response:", data)
+            logger.error(f"No features in ORS directions response: {data}")
             return None
             
         if "geometry" not in data["features"][0]:
-            print("No geometry in features:", data["features"][0])
+            logger.error(f"No geometry in ORS directions features: {data['features'][0]}")
             return None
         
         coordinates = data["features"][0]["geometry"]["coordinates"]
         route_points = [[lon, lat] for lon, lat in coordinates]
-        return route_points
+        summary = (data["features"][0].get("properties") or {}).get("summary") or {}
+        return route_points, summary.get("duration")
         
-    except Exception as e:
-        print("Error fetching route geometry:", e)
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error fetching route geometry")
         return None
     
-def check_ors_health():
-    url = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
+async def check_ors_health():
+    url = DIRECTIONS_URL
     headers = {
         "Authorization": ORS_API_KEY,
         "Content-Type": "application/json"
@@ -144,7 +268,7 @@ def check_ors_health():
     
 
     try:
-        response = requests.post(url, json=body, headers=headers, timeout=5)
+        response = await HttpClient.post("ors", url, json=body, headers=headers, timeout=5)
         if response.status_code == 200:
             return "Healthy"
         elif response.status_code == 401:
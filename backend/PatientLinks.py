@@ -0,0 +1,67 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, select, insert, delete
+from models import IncidentDB, PatientDB, IncidentPatientDB
+
+_table = IncidentPatientDB.__table__
+
+
+class PatientLinks:
+    """
+    Keeps incident_patients in step with IncidentDB.patient_ids, in the flush that changes
+    them, so the incidents of a patient are an index lookup instead of a scan of every
+    incident's JSON list.
+    """
+
+    def track(self, session_factory):
+        """Add and remove link rows in the flush that edits patient_ids or deletes either side."""
+
+        @event.listens_for(session_factory, "after_flush")
+        def update_links(session, flush_context):
+            conn = None
+            for row in session.deleted:
+                if isinstance(row, IncidentDB):
+                    conn = conn or session.connection()
+                    conn.execute(delete(_table).where(_table.c.incident_id == row.id))
+                elif isinstance(row, PatientDB):
+                    conn = conn or session.connection()
+                    conn.execute(delete(_table).where(_table.c.patient_id == row.id))
+
+            incidents = [obj for obj in session.new if isinstance(obj, IncidentDB) and obj.patient_ids]
+            incidents += [
+                obj for obj in session.dirty
+                if isinstance(obj, IncidentDB) and inspect(obj).attrs.patient_ids.history.has_changes()
+            ]
+            now = datetime.now()
+            for incident in incidents:
+                conn = conn or session.connection()
+                patients = set(incident.patient_ids or [])
+                linked = set(conn.scalars(select(_table.c.patient_id).where(_table.c.incident_id == incident.id)))
+                if linked - patients:
+                    conn.execute(delete(_table).where(
+                        _table.c.incident_id == incident.id, _table.c.patient_id.in_(linked - patients),
+                    ))
+                if patients - linked:
+                    conn.execute(insert(_table), [
+                        {"incident_id": incident.id, "patient_id": patient_id, "linked_at": now}
+                        for patient_id in patients - linked
+                    ])
+
+    async def incidents(self, db, patient_id):
+        """The incidents a patient is linked to, oldest first."""
+        return (await db.scalars(select(IncidentDB).join(_table, _table.c.incident_id == IncidentDB.id).where(
+            _table.c.patient_id == patient_id
+        ).order_by(IncidentDB.started_at, IncidentDB.id))).all()
+
+    def backfill(self, db):
+        """Links of the incidents recorded before the table existed. Returns the rows written."""
+        rows = []
+        incidents = db.query(IncidentDB.id, IncidentDB.patient_ids, IncidentDB.started_at).filter(
+            IncidentDB.patient_ids.isnot(None)
+        )
+        for incident_id, patient_ids, started_at in incidents:
+            for patient_id in set(patient_ids or []):
+                rows.append({"incident_id": incident_id, "patient_id": patient_id, "linked_at": started_at})
+        if rows:
+            db.execute(insert(_table), rows)
+        db.commit()
+        return len(rows)
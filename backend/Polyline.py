@@ -0,0 +1,96 @@
+# Encoded polyline format (Google / ORS) for [[lon, lat], ...] routes.
+# The format itself stores latitude first, the helpers take and return [lon, lat] like the rest of the app.
+
+import math
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode(points, precision=5):
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lon, lat, *_ in points:
+        lat_i = round(lat * factor)
+        lon_i = round(lon * factor)
+        _encode_value(lat_i - prev_lat, out)
+        _encode_value(lon_i - prev_lon, out)
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(out)
+
+
+def decode(encoded, precision=5):
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append([lon / factor, lat / factor])
+    return points
+
+
+# Meters per pixel at zoom 0 on the equator for 256px web mercator tiles
+_METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def tolerance_for_zoom(zoom, lat, pixels=1.0):
+    """Simplification tolerance in meters that stays below `pixels` on screen at this zoom."""
+    return pixels * _METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def simplify(points, tolerance):
+    """Douglas-Peucker on [[lon, lat], ...] with the tolerance in meters. Endpoints are kept."""
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+
+    # Local equirectangular projection, accurate enough over a city
+    scale = math.cos(math.radians(points[0][1]))
+    xy = [(lon * 111320 * scale, lat * 110540) for lon, lat, *_ in points]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        dx, dy = xy[last][0] - ax, xy[last][1] - ay
+        length = math.hypot(dx, dy)
+        farthest, max_distance = None, tolerance
+        for i in range(first + 1, last):
+            px, py = xy[i][0] - ax, xy[i][1] - ay
+            # Distance to the segment's line, or to its start when the segment is a point
+            distance = abs(dx * py - dy * px) / length if length else math.hypot(px, py)
+            if distance > max_distance:
+                farthest, max_distance = i, distance
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def decode_route(route):
+    """A stored route as [[lon, lat], ...], whether it was saved encoded or as raw coordinates."""
+    if isinstance(route, str):
+        return decode(route)
+    return route
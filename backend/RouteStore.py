@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import or_, and_, select, delete
+from database import AsyncSessionLocal
+from models import AmbulanceDB, HospitalDB, EmergencyCentersDB, PrecomputedRouteDB
+from ORS import get_route, get_durations, eta_cache
+import Polyline
+
+logger = logging.getLogger(__name__)
+
+# Stored endpoints are rounded so lookups match regardless of float noise
+COORD_PRECISION = 6
+
+_refresh_lock = asyncio.Lock()
+
+
+def _key(lon, lat):
+    return round(lon, COORD_PRECISION), round(lat, COORD_PRECISION)
+
+
+def _endpoint_filter(origin, destination):
+    o_lon, o_lat = _key(*origin)
+    d_lon, d_lat = _key(*destination)
+    return and_(
+        PrecomputedRouteDB.origin_lon == o_lon,
+        PrecomputedRouteDB.origin_lat == o_lat,
+        PrecomputedRouteDB.dest_lon == d_lon,
+        PrecomputedRouteDB.dest_lat == d_lat,
+    )
+
+
+async def get_stored_route(origin, destination):
+    """
+    Stored (route points, duration in minutes) between two (lon, lat) points, or None.
+    Uses its own session, so the units of a dispatch can look their routes up concurrently.
+    """
+    if None in [*origin, *destination]:
+        return None
+    db = AsyncSessionLocal()
+    try:
+        row = await db.scalar(select(PrecomputedRouteDB).filter(_endpoint_filter(origin, destination)))
+    finally:
+        await db.close()
+    if not row or row.duration_seconds is None:
+        return None
+    return Polyline.decode(row.geometry), round(row.duration_seconds / 60, 1)
+
+
+async def warm_eta_cache():
+    """Seed the travel time cache with the stored durations. Returns the number of pairs."""
+    db = AsyncSessionLocal()
+    try:
+        rows = (await db.execute(select(
+            PrecomputedRouteDB.origin_lon, PrecomputedRouteDB.origin_lat,
+            PrecomputedRouteDB.dest_lon, PrecomputedRouteDB.dest_lat, PrecomputedRouteDB.duration_seconds,
+        ).filter(PrecomputedRouteDB.duration_seconds.isnot(None)))).all()
+    finally:
+        await db.close()
+    for o_lon, o_lat, d_lon, d_lat, duration_seconds in rows:
+        eta_cache.put((o_lon, o_lat), (d_lon, d_lat), duration_seconds)
+    return len(rows)
+
+
+async def save_route(db, origin, destination, route, duration_seconds):
+    row = await db.scalar(select(PrecomputedRouteDB).filter(_endpoint_filter(origin, destination)))
+    if not row:
+        o_lon, o_lat = _key(*origin)
+        d_lon, d_lat = _key(*destination)
+        row = PrecomputedRouteDB(origin_lon=o_lon, origin_lat=o_lat, dest_lon=d_lon, dest_lat=d_lat)
+        db.add(row)
+    row.geometry = Polyline.encode(route)
+    row.duration_seconds = duration_seconds
+    row.updated_at = datetime.now()
+
+
+async def invalidate_location(db, lon, lat):
+    """Drop every stored route starting or ending at the given point."""
+    if lon is None or lat is None:
+        return 0
+    k_lon, k_lat = _key(lon, lat)
+    result = await db.execute(delete(PrecomputedRouteDB).filter(or_(
+        and_(PrecomputedRouteDB.origin_lon == k_lon, PrecomputedRouteDB.origin_lat == k_lat),
+        and_(PrecomputedRouteDB.dest_lon == k_lon, PrecomputedRouteDB.dest_lat == k_lat),
+    )))
+    await db.commit()
+    return result.rowcount
+
+
+async def _static_pairs(db):
+    """Every hospital <-> base pair, bases being ambulance default positions and emergency centers."""
+    hospitals = {
+        _key(lon, lat) for lon, lat in await db.execute(select(HospitalDB.lon, HospitalDB.lat))
+        if lon is not None and lat is not None
+    }
+    bases = {
+        _key(lon, lat) for lon, lat in await db.execute(select(AmbulanceDB.default_lon, AmbulanceDB.default_lat))
+        if lon is not None and lat is not None
+    }
+    bases |= {
+        _key(lon, lat) for lon, lat in await db.execute(select(EmergencyCentersDB.lon, EmergencyCentersDB.lat))
+        if lon is not None and lat is not None
+    }
+
+    pairs = set()
+    for hospital in hospitals:
+        for base in bases:
+            if hospital != base:
+                pairs.add((hospital, base))
+                pairs.add((base, hospital))
+    return pairs
+
+
+async def _fetch_route(origin, destination):
+    """One directions request per pair; the matrix is only asked when the response had no duration."""
+    fetched = await get_route(*origin, *destination)
+    if not fetched or not fetched[0]:
+        return None
+    route, duration_seconds = fetched
+    if duration_seconds is None:
+        durations = await get_durations([origin], destination)
+        if not durations or durations[0] is None:
+            return None
+        duration_seconds = durations[0]
+    else:
+        eta_cache.put(origin, destination, duration_seconds)
+    return route, duration_seconds
+
+
+async def build_route_store(db):
+    """Fetch the missing static pairs and prune rows whose endpoints are gone. Returns (built, pruned)."""
+    pairs = await _static_pairs(db)
+    rows = (await db.scalars(select(PrecomputedRouteDB))).all()
+
+    pruned = 0
+    stored = set()
+    for row in rows:
+        pair = ((row.origin_lon, row.origin_lat), (row.dest_lon, row.dest_lat))
+        if pair in pairs:
+            stored.add(pair)
+        else:
+            await db.delete(row)
+            pruned += 1
+    await db.commit()
+
+    missing = list(pairs - stored)
+    results = await asyncio.gather(*(_fetch_route(origin, destination) for origin, destination in missing))
+
+    built = 0
+    for (origin, destination), result in zip(missing, results):
+        if result is None:
+            logger.warning(f"Could not precompute route {origin} -> {destination}")
+            continue
+        route, duration_seconds = result
+        await save_route(db, origin, destination, route, duration_seconds)
+        built += 1
+    await db.commit()
+    return built, pruned
+
+
+async def refresh_route_store():
+    """Bring the precomputed route table in line with the current hospitals and bases."""
+    async with _refresh_lock:
+        db = AsyncSessionLocal()
+        try:
+            built, pruned = await build_route_store(db)
+            if built or pruned:
+                logger.info(f"Route store refreshed: {built} routes built, {pruned} stale routes removed.")
+        except Exception as e:
+            logger.error(f"Route store refresh failed: {e}")
+            await db.rollback()
+        finally:
+            await db.close()
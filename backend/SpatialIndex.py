@@ -0,0 +1,120 @@
+import math
+from threading import Lock
+
+# ~1.1 km north-south, ~750 m east-west around Baia Mare
+DEFAULT_CELL_DEG = 0.01
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    r = 6371000.0
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+class SpatialIndex:
+    """
+    Uniform grid over (lon, lat) points keyed by entity id, for k-nearest lookups
+    by straight-line distance. Moving a point only touches its old and new cell.
+    """
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._positions = {}
+        self._cells = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, item_id):
+        return item_id in self._positions
+
+    def _cell(self, lon, lat):
+        return int(lon // self.cell_deg), int(lat // self.cell_deg)
+
+    def upsert(self, item_id, lon, lat):
+        if lon is None or lat is None:
+            self.remove(item_id)
+            return
+        cell = self._cell(lon, lat)
+        with self._lock:
+            old = self._positions.get(item_id)
+            if old is not None:
+                old_cell = self._cell(*old)
+                if old_cell != cell:
+                    self._cells[old_cell].discard(item_id)
+                    if not self._cells[old_cell]:
+                        del self._cells[old_cell]
+            self._positions[item_id] = (lon, lat)
+            self._cells.setdefault(cell, set()).add(item_id)
+
+    def remove(self, item_id):
+        with self._lock:
+            old = self._positions.pop(item_id, None)
+            if old is None:
+                return
+            old_cell = self._cell(*old)
+            self._cells[old_cell].discard(item_id)
+            if not self._cells[old_cell]:
+                del self._cells[old_cell]
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+            self._cells.clear()
+
+    def nearest(self, lon, lat, k, allowed=None):
+        """
+        Up to k (id, distance in meters) pairs closest to the point, nearest first.
+        `allowed` restricts the search to a set of ids.
+        """
+        if k <= 0:
+            return []
+        cx, cy = self._cell(lon, lat)
+        # Lower bound on the distance to any cell `ring` steps away
+        ring_m = self.cell_deg * 111000 * math.cos(math.radians(lat))
+        with self._lock:
+            found = []
+            seen = 0
+            ring = 0
+            while seen < len(self._positions):
+                if ring and 8 * ring > len(self._cells):
+                    # A ring now has more cells than are occupied (the rest of the fleet is far
+                    # away or sparse), so measuring the points left over directly is cheaper
+                    for item_id, (item_lon, item_lat) in self._positions.items():
+                        x, y = self._cell(item_lon, item_lat)
+                        if max(abs(x - cx), abs(y - cy)) < ring or (allowed is not None and item_id not in allowed):
+                            continue
+                        found.append((item_id, haversine_m(lon, lat, item_lon, item_lat)))
+                    break
+                for cell in _ring_cells(cx, cy, ring):
+                    for item_id in self._cells.get(cell, ()):
+                        seen += 1
+                        if allowed is not None and item_id not in allowed:
+                            continue
+                        item_lon, item_lat = self._positions[item_id]
+                        found.append((item_id, haversine_m(lon, lat, item_lon, item_lat)))
+                # Points in later rings are at least `ring` cells away
+                if len(found) >= k:
+                    found.sort(key=lambda x: x[1])
+                    if found[k - 1][1] <= ring * ring_m:
+                        break
+                ring += 1
+        found.sort(key=lambda x: x[1])
+        return found[:k]
+
+
+def _ring_cells(cx, cy, ring):
+    """The cells on the border of the square `ring` steps around (cx, cy)."""
+    if ring == 0:
+        yield cx, cy
+        return
+    for x in range(cx - ring, cx + ring + 1):
+        yield x, cy - ring
+        yield x, cy + ring
+    for y in range(cy - ring + 1, cy + ring):
+        yield cx - ring, y
+        yield cx + ring, y
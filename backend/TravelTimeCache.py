@@ -0,0 +1,86 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Grid size in degrees used to snap coordinates before they become cache keys.
+# 0.001 deg is roughly 110m north-south and 75m east-west around Baia Mare.
+ETA_CACHE_GRID = float(os.getenv("ETA_CACHE_GRID", "0.001"))
+ETA_CACHE_TTL = float(os.getenv("ETA_CACHE_TTL", "21600"))
+ETA_CACHE_SIZE = int(os.getenv("ETA_CACHE_SIZE", "50000"))
+
+
+class TravelTimeCache:
+    """
+    LRU + TTL cache of driving durations (in seconds) between two points.
+    Points are snapped to a grid so that nearby positions share an entry.
+    """
+
+    def __init__(self, grid=ETA_CACHE_GRID, ttl=ETA_CACHE_TTL, max_size=ETA_CACHE_SIZE):
+        self.grid = grid
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def snap(self, lon, lat):
+        return (round(lon / self.grid), round(lat / self.grid))
+
+    def _key(self, origin, destination):
+        return self.snap(*origin), self.snap(*destination)
+
+    def get(self, origin, destination):
+        key = self._key(origin, destination)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            duration, stored_at = entry
+            if now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return duration
+
+    def put(self, origin, destination, duration):
+        if duration is None:
+            return
+        key = self._key(origin, destination)
+        with self._lock:
+            self._entries[key] = (duration, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "grid_deg": self.grid,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,103 @@
+# Compares the greedy one-incident-at-a-time dispatch with the batch assignment
+# on synthetic surges around Baia Mare. Travel times are straight-line distance
+# with a detour factor, so no routing service is needed.
+#
+#   python benchmarks/batch_assignment_benchmark.py [runs] [seed]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from BatchAssignment import solve_assignment, greedy_assignment, severity_weight
+from SpatialIndex import haversine_m
+
+CITY = (23.50, 47.62, 23.65, 47.70)  # min lon, min lat, max lon, max lat
+SPEED_KMH = 40
+DETOUR = 1.3
+START_SECONDS = 60
+
+# name, ambulances, incidents, share of incidents inside the surge cluster, max patients
+SCENARIOS = [
+    ("scattered, enough units", 20, 12, 0.0, 1),
+    ("scattered, short of units", 12, 20, 0.0, 1),
+    ("cluster surge", 15, 15, 0.6, 1),
+    ("cluster surge, short of units", 10, 18, 0.6, 1),
+    ("mass casualty, multi-patient", 20, 10, 0.5, 5),
+    ("citywide surge", 40, 60, 0.3, 3),
+]
+
+
+def _point(rng, center=None, spread=0.01):
+    if center:
+        return center[0] + rng.gauss(0, spread), center[1] + rng.gauss(0, spread / 2)
+    return rng.uniform(CITY[0], CITY[2]), rng.uniform(CITY[1], CITY[3])
+
+
+def make_scenario(rng, n_ambulances, n_incidents, cluster_share, max_patients):
+    center = _point(rng)
+    ambulances = [(_point(rng), rng.choice([1, 2])) for _ in range(n_ambulances)]
+    incidents = []
+    for _ in range(n_incidents):
+        location = _point(rng, center) if rng.random() < cluster_share else _point(rng)
+        incidents.append((location, rng.choice([1, 1, 2, 2, 3, 4]), rng.randint(1, max_patients)))
+
+    durations = [
+        [START_SECONDS + haversine_m(*amb_loc, *inc_loc) * DETOUR / (SPEED_KMH / 3.6) for inc_loc, _, _ in incidents]
+        for amb_loc, _ in ambulances
+    ]
+    return (
+        [(severity, patients) for _, severity, patients in incidents],
+        [capacity for _, capacity in ambulances],
+        durations,
+    )
+
+
+def evaluate(plan, incidents, capacities, durations):
+    """Response time of an incident = arrival of its first unit."""
+    served = [i for i, units in enumerate(plan) if units]
+    response = {i: min(durations[a][i] for a in plan[i]) for i in served}
+    critical = [response[i] for i in served if incidents[i][0] == 1]
+    return {
+        "served": len(served),
+        "critical_unserved": sum(1 for i, (severity, _) in enumerate(incidents) if severity == 1 and not plan[i]),
+        "patients_covered": sum(min(patients, sum(capacities[a] for a in plan[i])) for i, (_, patients) in enumerate(incidents)),
+        "total_response_min": sum(response.values()) / 60,
+        "weighted_response_min": sum(severity_weight(incidents[i][0]) * response[i] for i in served) / 60,
+        "critical_mean_min": sum(critical) / len(critical) / 60 if critical else 0.0,
+    }
+
+
+def run(runs=50, seed=1):
+    strategies = [("greedy", greedy_assignment), ("batch", solve_assignment)]
+    columns = ["served", "critical_unserved", "patients_covered", "total_response_min",
+               "weighted_response_min", "critical_mean_min", "solve_ms"]
+
+    for name, n_ambulances, n_incidents, cluster_share, max_patients in SCENARIOS:
+        rng = random.Random(seed)
+        totals = {strategy: dict.fromkeys(columns, 0.0) for strategy, _ in strategies}
+        for _ in range(runs):
+            incidents, capacities, durations = make_scenario(rng, n_ambulances, n_incidents, cluster_share, max_patients)
+            for strategy, solve in strategies:
+                started = time.perf_counter()
+                plan = solve(incidents, capacities, durations)
+                elapsed = (time.perf_counter() - started) * 1000
+                result = evaluate(plan, incidents, capacities, durations)
+                result["solve_ms"] = elapsed
+                for column in columns:
+                    totals[strategy][column] += result[column]
+
+        print(f"\n{name}: {n_ambulances} ambulances, {n_incidents} incidents, {runs} runs (means)")
+        print(f"{'':8}" + "".join(f"{column:>{len(column) + 2}}" for column in columns))
+        for strategy, _ in strategies:
+            print(f"{strategy:8}" + "".join(
+                f"{totals[strategy][column] / runs:>{len(column) + 2}.2f}" for column in columns
+            ))
+
+
+if __name__ == "__main__":
+    run(
+        runs=int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        seed=int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+    )
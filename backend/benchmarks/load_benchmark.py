@@ -0,0 +1,300 @@
+# Load test of the API against the local ORS/Geoapify stand-in (mock_services.py).
+# Boots the app on a scratch database seeded with hospitals and ambulances, replays a
+# Poisson stream of incidents (create + dispatch, like the dispatcher UI) while clients
+# poll the list endpoints once a second, then reports latency percentiles, throughput,
+# what the queue processor did and how long database writes waited.
+#
+#   python benchmarks/load_benchmark.py --ambulances 30 --rate 2 --duration 60 --pollers 20
+#   python benchmarks/load_benchmark.py --latency-ms 300 --failure-rate 0.05
+#
+# DB lock waits are measured as the time spent in commits and in INSERT/UPDATE/DELETE
+# statements: with SQLite that is where a writer waits for the database lock.
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_services import CITY, MockConfig, create_mock_app
+
+INCIDENT_TYPES = ["Cardiac arrest", "Trauma", "Stroke", "Respiratory distress", "Burns", "Psychiatric crisis"]
+HOSPITAL_TYPES = ["UPU", "UPU", "UPU", "TBC", "Infectious Diseases"]
+POLLED_ENDPOINTS = ["/incidents", "/ambulances"]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def _point(rng):
+    return rng.uniform(CITY[0], CITY[2]), rng.uniform(CITY[1], CITY[3])
+
+
+class Recorder:
+    """Latencies (ms) and errors by name; appended from the app's threads as well."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, ms, ok=True):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(ms)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def track_db_waits(engines, session_factory, recorder):
+    from sqlalchemy import event
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("started", []).append(time.perf_counter())
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["started"].pop()
+        if not statement.lstrip().upper().startswith("SELECT"):
+            recorder.add("db write statement", (time.perf_counter() - started) * 1000)
+
+    def on_error(context):
+        if "locked" in str(context.original_exception):
+            recorder.add("db locked error", 0, ok=False)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_execute)
+        event.listen(engine, "after_cursor_execute", after_execute)
+        event.listen(engine, "handle_error", on_error)
+
+    @event.listens_for(session_factory, "before_commit")
+    def before_commit(session):
+        session.info["commit_started"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_commit")
+    def after_commit(session):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            recorder.add("db commit", (time.perf_counter() - started) * 1000)
+
+
+def seed(ED, n_hospitals, n_ambulances, rng):
+    db = ED.SessionLocal()
+    try:
+        hospitals = []
+        for i in range(n_hospitals):
+            lon, lat = _point(rng)
+            hospital = ED.HospitalDB(name=f"Hospital {i + 1}", type=HOSPITAL_TYPES[i % len(HOSPITAL_TYPES)], lat=lat, lon=lon)
+            db.add(hospital)
+            hospitals.append(hospital)
+        db.add(ED.EmergencyCentersDB(name="Dispatch center", lat=(CITY[1] + CITY[3]) / 2, lon=(CITY[0] + CITY[2]) / 2))
+        db.flush()
+        for i in range(n_ambulances):
+            base = hospitals[i % len(hospitals)]
+            db.add(ED.AmbulanceDB(
+                status=ED.Status.AVAILABLE, lat=base.lat, lon=base.lon, capacity=rng.choice([1, 2]),
+                default_lat=base.lat, default_lon=base.lon, base_hospital_id=base.id,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_server(app, port):
+    """Run an ASGI app with uvicorn on its own thread and event loop."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on port {port} did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def report_incident(client, recorder, outcomes, rng):
+    lon, lat = _point(rng)
+    body = {
+        "lat": lat, "lon": lon, "severity": rng.choice([1, 1, 2, 2, 3, 4]), "type": rng.choice(INCIDENT_TYPES),
+        "status": "Active", "nr_patients": rng.randint(1, 3),
+    }
+    started = time.perf_counter()
+    response = await client.post("/create_incident", json=body)
+    recorder.add("POST /create_incident", (time.perf_counter() - started) * 1000, response.status_code == 200)
+    if response.status_code != 200:
+        return
+
+    started = time.perf_counter()
+    response = await client.post(f"/dispatch/{response.json()['id']}")
+    ok = response.status_code == 200
+    recorder.add("POST /dispatch", (time.perf_counter() - started) * 1000, ok)
+    result = response.json() if ok else {}
+    if "ambulances_dispatched" in result:
+        outcome = "dispatched"
+    elif "queue" in result.get("msg", ""):
+        outcome = "queued"
+    else:
+        outcome = "failed" if not ok else "other"
+    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+async def arrivals(client, recorder, outcomes, rate, duration, rng):
+    """Incidents arriving as a Poisson process of `rate` per second."""
+    tasks = []
+    deadline = time.perf_counter() + duration
+    while True:
+        await asyncio.sleep(rng.expovariate(rate))
+        if time.perf_counter() >= deadline:
+            break
+        tasks.append(asyncio.create_task(report_incident(client, recorder, outcomes, rng)))
+    await asyncio.gather(*tasks)
+
+
+async def poller(client, recorder, duration, interval, offset):
+    """One open dashboard: polls the lists every `interval` seconds, revalidating with ETags."""
+    etags = {}
+    await asyncio.sleep(offset)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        tick = time.perf_counter()
+        for path in POLLED_ENDPOINTS:
+            headers = {"If-None-Match": etags[path]} if path in etags else {}
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            elapsed = (time.perf_counter() - started) * 1000
+            recorder.add(f"GET {path}", elapsed, response.status_code in (200, 304))
+            if response.status_code == 304:
+                recorder.add(f"GET {path} (304)", elapsed)
+            if "etag" in response.headers:
+                etags[path] = response.headers["etag"]
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - tick)))
+
+
+def _metric_total(text, name, **labels):
+    total = 0.0
+    for line in text.splitlines():
+        if line.startswith(name) and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+async def run_load(base_url, args, recorder):
+    import httpx
+
+    rng = random.Random(args.seed)
+    outcomes = {}
+    limits = httpx.Limits(max_connections=args.pollers + 50)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(
+            arrivals(client, recorder, outcomes, args.rate, args.duration, rng),
+            *(poller(client, recorder, args.duration, args.poll_interval, i * args.poll_interval / max(1, args.pollers))
+              for i in range(args.pollers)),
+        )
+        elapsed = time.perf_counter() - started
+        # Give the queue processor a moment to pick up what the last arrivals left behind
+        await asyncio.sleep(args.drain_seconds)
+        metrics = (await client.get("/metrics")).text
+    return elapsed, outcomes, metrics
+
+
+def print_report(args, recorder, elapsed, outcomes, metrics, mock_requests):
+    print(f"\n{args.ambulances} ambulances, {args.hospitals} hospitals, {args.rate}/s incidents for {args.duration}s, "
+          f"{args.pollers} pollers every {args.poll_interval}s, external latency {args.latency_ms}ms, "
+          f"failure rate {args.failure_rate}, time scale {args.time_scale}x\n")
+    print(f"{'':28}{'count':>8}{'errors':>8}{'per s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in sorted(recorder.latencies):
+        values = recorder.latencies[name]
+        print(f"{name:28}{len(values):>8}{recorder.errors.get(name, 0):>8}{len(values) / elapsed:>8.1f}"
+              + "".join(f"{percentile(values, q):>10.1f}" for q in (50, 95, 99))
+              + f"{max(values):>10.1f}")
+
+    requests = sum(len(values) for name, values in recorder.latencies.items()
+                   if name.startswith(("GET ", "POST ")) and not name.endswith("(304)"))
+    print(f"\nThroughput: {requests / elapsed:.1f} requests/s over {elapsed:.1f}s")
+    print("Dispatch outcomes: " + ", ".join(f"{key} {value}" for key, value in sorted(outcomes.items())))
+    queued = _metric_total(metrics, "dispatches_total", path="queue") + _metric_total(metrics, "dispatches_total", path="batch")
+    waited = _metric_total(metrics, "dispatch_queue_wait_seconds_count")
+    wait_sum = _metric_total(metrics, "dispatch_queue_wait_seconds_sum")
+    print(f"Queue processor: {queued:.0f} dispatched from the queue, mean wait "
+          f"{wait_sum / waited if waited else 0:.1f}s, {_metric_total(metrics, 'dispatch_queue_depth'):.0f} still queued")
+    print("External calls: " + ", ".join(f"{key} {value}" for key, value in sorted(mock_requests.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dispatch API against a local ORS/Geoapify stand-in.")
+    parser.add_argument("--ambulances", type=int, default=30)
+    parser.add_argument("--hospitals", type=int, default=6)
+    parser.add_argument("--rate", type=float, default=1.0, help="incidents per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--pollers", type=int, default=10, help="concurrent polling clients")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--drain-seconds", type=float, default=2.0)
+    parser.add_argument("--latency-ms", type=float, default=80, help="mean latency of the external APIs")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of external calls answered 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of external calls answered 429")
+    parser.add_argument("--time-scale", type=float, default=60,
+                        help="simulated seconds per real second, so ambulances come back and queued incidents get dispatched")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mock-port", type=int, default=8091)
+    parser.add_argument("--app-port", type=int, default=8092)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's log output")
+    args = parser.parse_args()
+
+    mock_config = MockConfig(args.latency_ms, args.jitter_ms, args.failure_rate, args.rate_limit_rate, args.seed)
+    mock_server, _ = start_server(create_mock_app(mock_config), args.mock_port)
+
+    # The app reads its configuration at import time
+    scratch = tempfile.mkdtemp(prefix="dispatch-benchmark-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'benchmark.db')}"
+    # The app's log goes next to the scratch database instead of into the working directory
+    os.environ["DISPATCH_LOG_FILE"] = os.path.join(scratch, "dispatch.log")
+    os.environ["ORS_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}"
+    os.environ["GEOAPIFY_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}"
+    os.environ.setdefault("ORS_API_KEY", "benchmark")
+    os.environ.setdefault("GEO_APIKEY", "benchmark")
+    os.environ["ROUTING_BACKEND"] = "ors"
+    os.environ["MOVEMENT_TIME_SCALE"] = str(args.time_scale)
+
+    quiet = contextlib.ExitStack()
+    if not args.verbose:
+        import logging
+        logging.disable(logging.WARNING)
+        quiet.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+
+    with quiet:
+        import EmergencyDispatch as ED
+        from database import async_engine
+
+        recorder = Recorder()
+        seed(ED, args.hospitals, args.ambulances, random.Random(args.seed))
+        # Handlers go through the async engine, write-behind flushes through the sync one
+        track_db_waits([ED.engine, async_engine.sync_engine], ED.SessionLocal, recorder)
+        app_server, app_thread = start_server(ED.app, args.app_port)
+        try:
+            elapsed, outcomes, metrics = asyncio.run(run_load(f"http://127.0.0.1:{args.app_port}", args, recorder))
+        finally:
+            app_server.should_exit = True
+            app_thread.join(timeout=10)
+            mock_server.should_exit = True
+
+    print_report(args, recorder, elapsed, outcomes, metrics, mock_config.requests)
+    print(f"\nScratch database: {re.sub('^sqlite:///', '', os.environ['DATABASE_URL'])}")
+    print(f"App log: {os.environ['DISPATCH_LOG_FILE']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# A deterministic local stand-in for the ORS matrix/directions and Geoapify geocoding
+# endpoints, so the app can be load tested without calling the paid APIs. Travel times
+# are straight-line distance with a detour factor; routes are straight lines cut into
+# segments. Latency and failure rates are configurable.
+#
+#   python benchmarks/mock_services.py [port]
+#
+# then start the app with ORS_BASE_URL and GEOAPIFY_BASE_URL pointing at it.
+import asyncio
+import hashlib
+import os
+import random
+import sys
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from SpatialIndex import haversine_m
+
+CITY = (23.50, 47.62, 23.65, 47.70)  # min lon, min lat, max lon, max lat
+SPEED_KMH = 40
+DETOUR = 1.3
+START_SECONDS = 60
+ROUTE_SEGMENTS = 20
+
+
+class MockConfig:
+    """Latency (ms, normal around the mean) and failure rates, per service."""
+
+    def __init__(self, latency_ms=80, jitter_ms=20, failure_rate=0.0, rate_limit_rate=0.0, seed=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self.requests = {}
+
+
+def travel_seconds(origin, destination):
+    return START_SECONDS + haversine_m(*origin, *destination) * DETOUR / (SPEED_KMH / 3.6)
+
+
+def straight_route(start, end, segments=ROUTE_SEGMENTS):
+    return [
+        [start[0] + (end[0] - start[0]) * i / segments, start[1] + (end[1] - start[1]) * i / segments]
+        for i in range(segments + 1)
+    ]
+
+
+def geocode(text):
+    """The same address always lands on the same point in the city."""
+    digest = hashlib.sha256(text.lower().encode()).digest()
+    x, y = digest[0] / 255, digest[1] / 255
+    return CITY[0] + (CITY[2] - CITY[0]) * x, CITY[1] + (CITY[3] - CITY[1]) * y
+
+
+def create_mock_app(config=None):
+    config = config or MockConfig()
+    mock = FastAPI()
+
+    async def simulate(name):
+        """Wait for the configured latency, then maybe fail. Returns an error response or None."""
+        config.requests[name] = config.requests.get(name, 0) + 1
+        delay = max(0.0, config.rng.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        roll = config.rng.random()
+        await asyncio.sleep(delay)
+        if roll < config.failure_rate:
+            return JSONResponse({"error": "Service unavailable"}, status_code=503)
+        if roll < config.failure_rate + config.rate_limit_rate:
+            return JSONResponse({"error": "Rate limit exceeded"}, status_code=429)
+        return None
+
+    @mock.post("/v2/matrix/driving-car")
+    async def matrix(request: Request):
+        failed = await simulate("ors_matrix")
+        if failed:
+            return failed
+        body = await request.json()
+        locations = body["locations"]
+        sources = body.get("sources", range(len(locations)))
+        destinations = body.get("destinations", range(len(locations)))
+        return {
+            "durations": [
+                [round(travel_seconds(locations[s], locations[d]), 1) for d in destinations]
+                for s in sources
+            ]
+        }
+
+    @mock.post("/v2/directions/driving-car/geojson")
+    async def directions(request: Request):
+        failed = await simulate("ors_directions")
+        if failed:
+            return failed
+        start, end = (await request.json())["coordinates"][:2]
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": straight_route(start, end)},
+                "properties": {"summary": {"duration": round(travel_seconds(start, end), 1)}},
+            }],
+        }
+
+    @mock.get("/v1/geocode/search")
+    async def search(text: str = ""):
+        failed = await simulate("geoapify_search")
+        if failed:
+            return failed
+        lon, lat = geocode(text)
+        return {"results": [{"lat": lat, "lon": lon, "formatted": text}]}
+
+    @mock.get("/v1/geocode/reverse")
+    async def reverse(lat: float, lon: float):
+        failed = await simulate("geoapify_reverse")
+        if failed:
+            return failed
+        return {"results": [{"lat": lat, "lon": lon}]}
+
+    @mock.get("/stats")
+    async def stats():
+        return dict(config.requests)
+
+    mock.state.config = config
+    return mock
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_mock_app(), port=int(sys.argv[1]) if len(sys.argv) > 1 else 8090)
@@ -1,11 +1,125 @@
-from sqlalchemy import create_engine
+import importlib.util
+import os
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-SQLALCHEMY_DATABASE_URL = 'sqlite:///./AppDatabase.db'
+SQLALCHEMY_DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./AppDatabase.db')
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={'check_same_thread': False})
+# Connections each engine keeps open, and how many more it may open under load
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# How long a SQLite writer waits for the lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 
+# The handlers use the async driver of the same database: aiosqlite for SQLite, asyncpg
+# for Postgres. ASYNC_DATABASE_URL overrides it for other drivers.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+# Driver module -> the package that provides it, checked before any engine is created
+DRIVER_PACKAGES = {"aiosqlite": "aiosqlite", "asyncpg": "asyncpg", "psycopg": "psycopg[binary]", "psycopg2": "psycopg2-binary"}
+
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+is_sqlite = _url.get_backend_name() == "sqlite"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _url.set(
+    drivername=ASYNC_DRIVERS.get(_url.get_backend_name(), _url.drivername)
+)
+
+
+def _check_drivers(*urls):
+    """Fail at import with the package to install, instead of on the first query."""
+    for url in urls:
+        url = make_url(url)
+        module = url.get_driver_name()
+        if module in DRIVER_PACKAGES and importlib.util.find_spec(module) is None:
+            raise RuntimeError(
+                f"{url.drivername} needs the {module} driver: pip install '{DRIVER_PACKAGES[module]}'"
+            )
+
+
+_check_drivers(SQLALCHEMY_DATABASE_URL, ASYNC_DATABASE_URL)
+
+
+def _engine_options(async_engine=False):
+    if is_sqlite and _url.database in (None, "", ":memory:"):
+        # In-memory databases live in a single connection, there is nothing to pool
+        return {} if async_engine else {"connect_args": {"check_same_thread": False}}
+    options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    if is_sqlite:
+        if not async_engine:
+            options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_pre_ping"] = True
+        options["pool_recycle"] = 1800
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers carry on while a writer commits instead of waiting for each other
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    # Durable enough with WAL: a power cut may lose the last commits but never corrupts the file
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options())
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(async_engine=True))
+if is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# Sync sessions are for work done in threads (write-behind flushes, one-off conversions)
 SessionLocal = sessionmaker(autocommit = False, autoflush = False, bind = engine)
 
+# Async sessions for the handlers and background tasks. They share SessionLocal's class, so
+# the listeners registered on SessionLocal (versions, live updates, ...) see their flushes too.
+# Objects are not expired on commit: reading an attribute afterwards must not hit the database.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, sync_session_class=SessionLocal.class_
+)
+
 Base = declarative_base()
+
+
+def add_missing_columns(bind=engine):
+    """
+    create_all only creates missing tables, so columns added to an existing model are
+    appended here with ALTER TABLE (SQLite cannot do much more), along with their indexes.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}'
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def drop_removed_columns(removed, bind=engine):
+    """
+    Drop the columns of {table: [column, ...]} that an existing database still has after
+    they were removed from the models. SQLite only drops columns since 3.35; older versions
+    keep them, unread.
+    """
+    if bind.dialect.name == "sqlite" and bind.dialect.dbapi.sqlite_version_info < (3, 35):
+        return
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table, columns in removed.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for column in columns:
+                if column in existing:
+                    conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
@@ -1,6 +1,6 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey, Boolean, Text, Index
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 
 class AmbulanceDB(Base):
@@ -13,15 +13,15 @@ class AmbulanceDB(Base):
     default_lat = Column(Float, default = None)
     default_lon = Column(Float, default = None)
     available_at = Column(DateTime, nullable=True)
-    driver_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    driver_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     base_hospital_id = Column(Integer, ForeignKey("hospitals.id"), nullable=True)
-    route_to_assigned_unit = Column(JSON, nullable=True)
+    version = Column(Integer, default=0, index=True)
 
 class IncidentDB(Base):
     __tablename__ = 'incidents'
     id = Column(Integer, primary_key= True, index = True)
-    status = Column(String)
-    severity = Column(Integer)
+    status = Column(String, index=True)
+    severity = Column(Integer, index=True)
     type = Column(String)
     lat = Column(Float)
     lon = Column(Float)
@@ -30,12 +30,11 @@ class IncidentDB(Base):
     assigned_units = Column(JSON, default =[], nullable=True)
     assigned_hospital = Column(Integer, ForeignKey("hospitals.id"), nullable=True)
     patient_ids = Column(JSON, nullable=True)
-    route_to_incident = Column(JSON, nullable=True)
-    route_to_hospital = Column(JSON, nullable=True)
     needs_UPU = Column(Boolean, nullable=True)
-    started_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True, index=True)
     ended_at = Column(DateTime, nullable=True)
     processing_time_seconds = Column(Integer, nullable=True)
+    version = Column(Integer, default=0, index=True)
 
 class HospitalDB(Base):
     __tablename__ = 'hospitals'
@@ -44,6 +43,7 @@ class HospitalDB(Base):
     type = Column(String) # UPU, CPU, Privat
     lat = Column(Float)
     lon = Column(Float)
+    version = Column(Integer, default=0, index=True)
 
 class EmergencyCentersDB(Base):
     __tablename__ = 'emergency_centers'
@@ -51,6 +51,7 @@ class EmergencyCentersDB(Base):
     name = Column(String)
     lat = Column(Float)
     lon = Column(Float)
+    version = Column(Integer, default=0, index=True)
 
 class UserDB(Base):
     __tablename__ = 'users'
@@ -59,6 +60,7 @@ class UserDB(Base):
     password = Column(String)
     role = Column(String)
     badge_number = Column(String, nullable=True)
+    version = Column(Integer, default=0, index=True)
 
 class PatientDB(Base):
     __tablename__ = 'patients'
@@ -66,4 +68,94 @@ class PatientDB(Base):
     name = Column(String)
     age = Column(Integer, nullable=True)
     phone_number = Column(String, nullable=True)
-    medical_history = Column(JSON, nullable=True)
\ No newline at end of file
+    medical_history = Column(JSON, nullable=True)
+    version = Column(Integer, default=0, index=True)
+
+class PrecomputedRouteDB(Base):
+    __tablename__ = 'precomputed_routes'
+    id = Column(Integer, primary_key= True, index = True)
+    origin_lat = Column(Float)
+    origin_lon = Column(Float)
+    dest_lat = Column(Float)
+    dest_lon = Column(Float)
+    duration_seconds = Column(Float, nullable=True)
+    geometry = Column(Text) # encoded polyline
+    updated_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_precomputed_routes_endpoints', 'origin_lat', 'origin_lon', 'dest_lat', 'dest_lon', unique=True),
+    )
+
+class TombstoneDB(Base):
+    __tablename__ = 'tombstones'
+    id = Column(Integer, primary_key= True, index = True)
+    table_name = Column(String)
+    entity_id = Column(Integer)
+    version = Column(Integer)
+    deleted_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_tombstones_table_version', 'table_name', 'version'),
+    )
+
+class IncidentStatsHourlyDB(Base):
+    __tablename__ = 'incident_stats_hourly'
+    id = Column(Integer, primary_key= True, index = True)
+    hour = Column(DateTime) # hour the incidents started in
+    type = Column(String)
+    severity = Column(Integer)
+    resolved = Column(Integer, default=0)
+    processing_count = Column(Integer, default=0)
+    processing_sum = Column(Float, default=0)
+    processing_histogram = Column(JSON, nullable=True)
+    resolution_count = Column(Integer, default=0)
+    resolution_sum = Column(Float, default=0)
+    resolution_histogram = Column(JSON, nullable=True)
+
+    __table_args__ = (
+        Index('ix_incident_stats_hourly_key', 'hour', 'type', 'severity', unique=True),
+    )
+
+class GeocodeCacheDB(Base):
+    __tablename__ = 'geocode_cache'
+    id = Column(Integer, primary_key= True, index = True)
+    address = Column(String) # normalized, see GeocodeCache.normalize
+    label = Column(String) # as first entered, shown in autocomplete
+    lat = Column(Float)
+    lon = Column(Float)
+    source = Column(String) # geoapify or gazetteer
+    hits = Column(Integer, default=0)
+    resolved_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_geocode_cache_address', 'address', unique=True),
+    )
+
+class IncidentAssignmentDB(Base):
+    __tablename__ = 'incident_assignments'
+    id = Column(Integer, primary_key= True, index = True)
+    incident_id = Column(Integer, ForeignKey("incidents.id", ondelete="CASCADE"), index=True)
+    ambulance_id = Column(Integer, ForeignKey("ambulances.id", ondelete="CASCADE"))
+    assigned_at = Column(DateTime)
+    arrived_at_incident = Column(DateTime, nullable=True)
+    arrived_at_hospital = Column(DateTime, nullable=True)
+    released_at = Column(DateTime, nullable=True) # open while None
+    release_reason = Column(String, nullable=True) # released, unassigned, resolved, reconciled
+    route_to_incident = deferred(Column(Text, nullable=True)) # encoded polyline
+    route_to_hospital = deferred(Column(Text, nullable=True)) # encoded polyline
+
+    __table_args__ = (
+        Index('ix_incident_assignments_ambulance_open', 'ambulance_id', 'released_at'),
+    )
+
+class IncidentPatientDB(Base):
+    __tablename__ = 'incident_patients'
+    id = Column(Integer, primary_key= True, index = True)
+    incident_id = Column(Integer, ForeignKey("incidents.id", ondelete="CASCADE"))
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"))
+    linked_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_incident_patients_incident_patient', 'incident_id', 'patient_id', unique=True),
+        Index('ix_incident_patients_patient', 'patient_id'),
+    )
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other by name, as when the app runs from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Set before any test imports database.py, so no test ever opens the real AppDatabase.db
+_scratch = tempfile.mkdtemp(prefix="dispatch-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'dispatch.db')}"
+os.environ["DISPATCH_LOG_FILE"] = os.path.join(_scratch, "dispatch.log")
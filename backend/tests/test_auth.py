@@ -0,0 +1,84 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import Auth
+from Auth import Session, SessionCache, issue_token, read_token
+
+USER = SimpleNamespace(id=7, role="dispatcher", password="$2b$12$stored-hash")
+
+
+def test_token_round_trip():
+    token, expires_at = issue_token(USER)
+    claims = read_token(token)
+    assert claims == {"uid": 7, "role": "dispatcher", "exp": expires_at, "pwd": Auth.password_fingerprint(USER.password)}
+    assert expires_at > time.time() + Auth.SESSION_TTL_HOURS * 3600 - 5
+
+
+def test_tampered_or_malformed_tokens_are_refused():
+    token, _ = issue_token(USER)
+    payload, signature = token.split(".")
+    admin, _ = issue_token(SimpleNamespace(id=7, role="admin", password=USER.password))
+    # A valid payload with another token's signature
+    assert read_token(f"{admin.split('.')[0]}.{signature}") is None
+    assert read_token(f"{payload}.{signature[:-2]}xx") is None
+    assert read_token(payload) is None
+    assert read_token("") is None
+    assert read_token(f"not-base64.{Auth._sign('not-base64')}") is None
+
+
+def test_tokens_from_another_secret_are_refused(monkeypatch):
+    token, _ = issue_token(USER)
+    monkeypatch.setattr(Auth, "SESSION_SECRET", b"rotated")
+    assert read_token(token) is None
+
+
+def test_expired_tokens_are_refused(monkeypatch):
+    monkeypatch.setattr(Auth, "SESSION_TTL_HOURS", -1 / 3600)
+    token, expires_at = issue_token(USER)
+    assert expires_at < time.time()
+    assert read_token(token) is None
+
+
+def test_password_change_changes_the_fingerprint():
+    assert Auth.password_fingerprint("old-hash") != Auth.password_fingerprint("new-hash")
+    assert Auth.password_fingerprint(None) == Auth.password_fingerprint("")
+
+
+def test_verify_password():
+    async def run():
+        hashed = await Auth.hash_password("s3cret")
+        return (
+            await Auth.verify_password("s3cret", hashed),
+            await Auth.verify_password("wrong", hashed),
+            await Auth.verify_password("s3cret", "plain text"),
+            await Auth.verify_password("", hashed),
+        )
+
+    assert asyncio.run(run()) == (True, False, False, False)
+
+
+def test_session_cache_hits_expires_and_evicts():
+    cache = SessionCache(max_size=2)
+    later = time.time() + 60
+    cache.put("a", Session(1, "dispatcher", later))
+    cache.put("b", Session(2, "admin", later))
+    assert cache.get("a").user_id == 1
+    # "b" is now the least recently used
+    cache.put("c", Session(3, "dispatcher", later))
+    assert cache.get("b") is None
+    assert cache.get("c").role == "dispatcher"
+
+    cache.put("old", Session(1, "dispatcher", time.time() - 1))
+    assert cache.get("old") is None
+    assert cache.stats() == {"size": 1, "max_size": 2, "hits": 2, "misses": 2, "hit_ratio": 0.5}
+
+
+def test_session_cache_revokes_every_session_of_a_user():
+    cache = SessionCache()
+    later = time.time() + 60
+    for token, user_id in (("a", 1), ("b", 2), ("c", 1)):
+        cache.put(token, Session(user_id, "dispatcher", later))
+    cache.revoke_user(1)
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.get("b").user_id == 2
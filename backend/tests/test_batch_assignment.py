@@ -0,0 +1,73 @@
+import itertools
+import random
+
+from BatchAssignment import UNSERVED_PENALTY_SECONDS, greedy_assignment, hungarian, severity_weight, solve_assignment
+
+
+def weighted_cost(incidents, durations, plan):
+    return sum(severity_weight(incidents[i][0]) * durations[a][i] for i, units in enumerate(plan) for a in units)
+
+
+def test_hungarian_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(50):
+        rows, cols = rng.randint(1, 4), rng.randint(4, 6)
+        cost = [[rng.randint(1, 100) for _ in range(cols)] for _ in range(rows)]
+        assignment = hungarian(cost)
+        assert len(set(assignment)) == rows
+        best = min(
+            sum(cost[r][c] for r, c in enumerate(columns))
+            for columns in itertools.permutations(range(cols), rows)
+        )
+        assert sum(cost[r][c] for r, c in enumerate(assignment)) == best
+
+
+def test_severity_outweighs_the_nearest_unit():
+    # Greedy sends unit 0 to the severity 1 incident and leaves the severity 2 one with a far unit
+    incidents = [(1, 1), (2, 1)]
+    durations = [[100, 100], [110, 3000]]
+    assert greedy_assignment(incidents, [1, 1], durations) == [[0], [1]]
+    assert solve_assignment(incidents, [1, 1], durations) == [[1], [0]]
+
+
+def test_never_worse_than_greedy():
+    rng = random.Random(2)
+    for _ in range(100):
+        n_incidents = rng.randint(1, 6)
+        n_ambulances = rng.randint(n_incidents, 8)
+        incidents = [(rng.randint(1, 4), 1) for _ in range(n_incidents)]
+        durations = [[rng.randint(60, 1800) for _ in range(n_incidents)] for _ in range(n_ambulances)]
+        capacities = [1] * n_ambulances
+        batch = solve_assignment(incidents, capacities, durations)
+        greedy = greedy_assignment(incidents, capacities, durations)
+        assert all(len(units) == 1 for units in batch)
+        assert weighted_cost(incidents, durations, batch) <= weighted_cost(incidents, durations, greedy)
+
+
+def test_units_cover_patients_and_are_used_once():
+    rng = random.Random(3)
+    for _ in range(50):
+        incidents = [(rng.randint(1, 4), rng.randint(1, 4)) for _ in range(rng.randint(1, 4))]
+        capacities = [rng.choice([1, 2]) for _ in range(rng.randint(1, 12))]
+        durations = [[rng.randint(60, 1800) for _ in incidents] for _ in capacities]
+        plan = solve_assignment(incidents, capacities, durations)
+        used = [a for units in plan for a in units]
+        assert len(used) == len(set(used))
+        for i, units in enumerate(plan):
+            assert [durations[a][i] for a in units] == sorted(durations[a][i] for a in units)
+        if sum(capacities) >= sum(patients for _, patients in incidents) + max(capacities):
+            # Enough spare capacity: every incident ends up covered
+            for i, (_, patients) in enumerate(incidents):
+                assert sum(capacities[a] for a in plan[i]) >= patients
+
+
+def test_unreachable_and_too_far_units_are_not_sent():
+    incidents = [(1, 1), (4, 1)]
+    durations = [[None, 300], [UNSERVED_PENALTY_SECONDS * 10, None]]
+    assert solve_assignment(incidents, [1, 1], durations) == [[], [0]]
+
+
+def test_empty_inputs():
+    assert solve_assignment([], [1], []) == []
+    assert solve_assignment([(1, 1)], [], []) == [[]]
+    assert hungarian([]) == []
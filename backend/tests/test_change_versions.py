@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from ChangeVersions import ChangeVersions
+from database import Base
+from models import HospitalDB, IncidentDB, TombstoneDB
+
+
+@pytest.fixture
+def tracked():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    versions = ChangeVersions()
+    versions.track(factory)
+    yield versions, factory
+    engine.dispose()
+
+
+def test_inserts_updates_and_deletes_are_stamped(tracked):
+    versions, factory = tracked
+    with factory() as db:
+        incident = IncidentDB(status="Active", severity=2)
+        db.add_all([incident, HospitalDB(name="County")])
+        db.commit()
+        stamped = incident.version
+        # One counter for every table
+        assert {versions.latest("incidents"), versions.latest("hospitals")} == {1, 2}
+        assert versions.latest("incidents") == stamped
+
+        incident.severity = 1
+        db.commit()
+        assert incident.version > stamped
+        assert versions.latest("incidents") == incident.version
+
+        db.delete(incident)
+        db.commit()
+        tombstone = db.scalar(select(TombstoneDB))
+        assert (tombstone.table_name, tombstone.entity_id) == ("incidents", incident.id)
+        assert versions.latest("incidents") == tombstone.version
+
+
+def test_unmodified_rows_keep_their_version(tracked):
+    versions, factory = tracked
+    with factory() as db:
+        incident = IncidentDB(status="Active", severity=2)
+        db.add(incident)
+        db.commit()
+        stamped = incident.version
+        incident.severity = 2
+        db.commit()
+        assert incident.version == stamped
+
+
+def test_latest_stays_below_the_lowest_open_version(tracked):
+    versions, factory = tracked
+    early = factory()
+    try:
+        early.add(IncidentDB(status="Active", severity=1))
+        early.flush()
+        held = versions.latest("incidents")
+        open_version = early.scalar(select(IncidentDB.version))
+
+        # Another transaction stamps and commits later versions meanwhile
+        versions.next("incidents")
+        versions.next("incidents")
+        assert versions.latest("incidents") == open_version - 1 == held
+        assert versions.etag("incidents") == f'W/"incidents-{held}"'
+        # Other tables are not held back
+        hospital_version = versions.next("hospitals")
+        assert versions.latest("hospitals") == hospital_version
+
+        early.commit()
+        assert versions.latest("incidents") == versions.stats()["version"] - 1
+        assert versions.stats()["open_versions"] == 0
+    finally:
+        early.close()
+
+
+def test_rollback_and_close_release_open_versions(tracked):
+    versions, factory = tracked
+    db = factory()
+    db.add(IncidentDB(status="Active", severity=1))
+    db.flush()
+    assert versions.stats()["open_versions"] == 1
+    db.rollback()
+    assert versions.stats()["open_versions"] == 0
+
+    db.add(IncidentDB(status="Active", severity=1))
+    db.flush()
+    db.close()
+    assert versions.stats()["open_versions"] == 0
+    assert versions.latest("incidents") == versions.stats()["tables"]["incidents"]
+
+
+def test_load_resumes_after_the_stored_versions(tracked):
+    versions, factory = tracked
+    with factory() as db:
+        db.add(IncidentDB(status="Active", severity=1))
+        db.commit()
+        stored = versions.latest("incidents")
+        restarted = ChangeVersions()
+        restarted.load(db)
+        assert restarted.latest("incidents") == stored
+        assert restarted.next("patients") == stored + 1
+
+
+def test_etag_depends_on_the_query_shape(tracked):
+    versions, factory = tracked
+    versions.next("incidents")
+    plain = versions.etag("incidents", (None, None, ()))
+    assert plain == versions.etag("incidents", (None, None, ()))
+    assert plain.startswith(f'W/"incidents-{versions.latest("incidents")}-')
+    assert len({
+        plain,
+        versions.etag("incidents", (["id", "status"], None, ())),
+        versions.etag("incidents", (None, 3, ())),
+        versions.etag("incidents", (None, None, (10,))),
+    }) == 4
@@ -0,0 +1,101 @@
+# Two dispatches running at the same time must never send the same ambulance, and must
+# not wait for each other's routing either. Routing is replaced by fakes that yield to
+# the event loop and always rank the lowest ambulance id first, so without claiming the
+# units both dispatches pick it.
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy import select
+
+import EmergencyDispatch as ED
+
+
+routing_calls = {"running": 0, "peak": 0}
+
+
+async def fake_get_eta(candidates, incident):
+    routing_calls["running"] += 1
+    routing_calls["peak"] = max(routing_calls["peak"], routing_calls["running"])
+    await asyncio.sleep(0.05)
+    routing_calls["running"] -= 1
+    ranked = [(candidate, 5.0 + i) for i, candidate in enumerate(sorted(candidates, key=lambda c: c.id))]
+    if not ranked:
+        return None, None, []
+    return ranked[0][0], ranked[0][1], ranked
+
+
+async def fake_get_route_geometry(start_lon, start_lat, end_lon, end_lat):
+    await asyncio.sleep(0.01)
+    return [[start_lon, start_lat], [end_lon, end_lat]]
+
+
+async def fake_get_stored_route(origin, destination):
+    await asyncio.sleep(0.01)
+    return [list(origin), list(destination)], 5.0
+
+
+@pytest.fixture
+def seeded(monkeypatch):
+    monkeypatch.setattr(ED, "get_eta", fake_get_eta)
+    monkeypatch.setattr(ED, "get_route_geometry", fake_get_route_geometry)
+    monkeypatch.setattr(ED, "get_stored_route", fake_get_stored_route)
+
+    db = ED.SessionLocal()
+    try:
+        for model in (ED.IncidentAssignmentDB, ED.IncidentDB, ED.AmbulanceDB, ED.HospitalDB):
+            db.query(model).delete()
+        hospital = ED.HospitalDB(name="Hospital", type="UPU", lat=44.43, lon=26.10)
+        db.add(hospital)
+        db.flush()
+        for offset in (0.01, 0.02):
+            db.add(ED.AmbulanceDB(
+                status=ED.Status.AVAILABLE, lat=44.43 + offset, lon=26.10, capacity=1,
+                default_lat=44.43, default_lon=26.10, base_hospital_id=hospital.id,
+            ))
+        incidents = [
+            ED.IncidentDB(
+                status=ED.Status.ACTIVE, severity=1, type="Trauma", lat=44.44, lon=26.11 + i / 100,
+                nr_patients=1, total_patients=1, needs_UPU=True, started_at=ED.datetime.now(),
+            )
+            for i in range(2)
+        ]
+        db.add_all(incidents)
+        db.commit()
+        yield [incident.id for incident in incidents]
+    finally:
+        db.close()
+        for ambulance_id in list(ED.movement_engine._missions):
+            ED.movement_engine.cancel(ambulance_id)
+
+
+def test_concurrent_dispatches_send_different_units(seeded):
+    async def dispatch(incident_id):
+        async with ED.AsyncSessionLocal() as db:
+            return await ED.dispatch(incident_id, BackgroundTasks(), db)
+
+    async def run():
+        return await asyncio.gather(*(dispatch(incident_id) for incident_id in seeded))
+
+    routing_calls["peak"] = 0
+    results = asyncio.run(run())
+
+    sent = [result["ambulances_dispatched"] for result in results]
+    assert all(len(units) == 1 for units in sent)
+    assert sent[0] != sent[1]
+    # Each dispatch ranks units and hospitals at once; overlapping dispatches make it more than 2
+    assert routing_calls["peak"] > 2
+
+    db = ED.SessionLocal()
+    try:
+        incidents = db.scalars(select(ED.IncidentDB).where(ED.IncidentDB.id.in_(seeded))).all()
+        assert {incident.status for incident in incidents} == {ED.Status.ASSIGNED}
+        assigned = [unit for incident in incidents for unit in incident.assigned_units]
+        assert len(assigned) == len(set(assigned)) == 2
+
+        open_rows = db.scalars(select(ED.IncidentAssignmentDB.ambulance_id).where(
+            ED.IncidentAssignmentDB.released_at.is_(None)
+        )).all()
+        assert sorted(open_rows) == sorted(assigned)
+    finally:
+        db.close()
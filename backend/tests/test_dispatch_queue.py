@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from DispatchQueue import DispatchQueue
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def drain(queue):
+    order = []
+    while (popped := queue.pop()) is not None:
+        order.append(popped[0])
+    return order
+
+
+def test_pops_by_severity_then_age():
+    queue = DispatchQueue()
+    queue.push(1, 3, T0)
+    queue.push(2, 1, T0 + timedelta(minutes=5))
+    queue.push(3, 1, T0)
+    queue.push(4, 2, T0)
+    assert drain(queue) == [3, 2, 4, 1]
+    assert len(queue) == 0
+
+
+def test_missing_severity_goes_first():
+    queue = DispatchQueue()
+    queue.push(1, 1, T0)
+    queue.push(2, None, T0 + timedelta(minutes=1))
+    assert drain(queue) == [2, 1]
+
+
+def test_push_again_updates_priority_without_duplicates():
+    queue = DispatchQueue()
+    queue.push(1, 3, T0)
+    queue.push(2, 2, T0)
+    queue.push(1, 1, T0)
+    queue.push(2, 2, T0)
+    assert len(queue) == 2
+    assert drain(queue) == [1, 2]
+    assert queue.enqueued_total == 2
+
+
+def test_removed_and_taken_incidents_are_skipped():
+    queue = DispatchQueue()
+    for incident_id in range(1, 5):
+        queue.push(incident_id, incident_id, T0)
+    queue.remove(1)
+    assert queue.take(2) is not None
+    assert queue.take(2) is None
+    assert 3 in queue and 1 not in queue
+    assert drain(queue) == [3, 4]
+
+
+def test_requeue_keeps_the_original_wait():
+    queue = DispatchQueue()
+    queue.push(1, 1, T0, enqueued_at=100.0)
+    incident_id, enqueued_at = queue.pop()
+    queue.push(incident_id, 1, T0, enqueued_at)
+    assert queue.pop() == (1, 100.0)
+
+
+def test_wait_wakes_on_push_and_times_out_otherwise():
+    async def run():
+        queue = DispatchQueue()
+        timed_out = await queue.wait(0.01)
+        asyncio.get_running_loop().call_later(0.01, queue.push, 1, 1, T0)
+        pushed = await queue.wait(5)
+        asyncio.get_running_loop().call_later(0.01, queue.notify)
+        notified = await queue.wait(5)
+        return timed_out, pushed, notified, queue.wakeups
+
+    assert asyncio.run(run()) == (False, True, True, 3)
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from GeocodeCache import SOURCE_GAZETTEER, SOURCE_GEOAPIFY, Entry, GeocodeCache, normalize
+
+
+def entry(label, hits=0, source=SOURCE_GAZETTEER, resolved_at=None):
+    return Entry(normalize(label), label, 47.65, 23.57, source, hits, resolved_at)
+
+
+def labels(results):
+    return [result["address"] for result in results]
+
+
+def test_normalize_folds_spelling_variants():
+    assert normalize("Str. Victoriei nr. 5") == "strada victoriei 5"
+    assert normalize("Bd. Bucureşti 12, Baia Mare, Maramureș, Romania") == "bulevardul bucuresti 12"
+    assert normalize("Piața Libertății") == normalize("pta libertatii")
+    assert normalize("Nr.") == ""
+
+
+def test_search_matches_any_word_prefix_and_ranks_by_use():
+    cache = GeocodeCache()
+    cache.load([
+        entry("Strada Victoriei 5", hits=1),
+        entry("Strada Victor Babes 2", hits=7),
+        entry("Bulevardul Victoriei", hits=3),
+        entry("Strada Vasile Lucaciu"),
+    ])
+    # Addresses starting with the query come before those matching a later word
+    assert labels(cache.search("str vic"))[:2] == ["Strada Victor Babes 2", "Strada Victoriei 5"]
+    assert labels(cache.search("victor")) == ["Strada Victor Babes 2", "Bulevardul Victoriei", "Strada Victoriei 5"]
+    assert labels(cache.search("victor", limit=1)) == ["Strada Victor Babes 2"]
+    assert cache.search("  ,") == []
+
+
+def test_search_falls_back_to_close_misspellings():
+    cache = GeocodeCache()
+    cache.load([entry("Strada Lucaciu"), entry("Strada Progresului")])
+    assert labels(cache.search("lucaicu")) == ["Strada Lucaciu"]
+    assert cache.search("xyzzy") == []
+
+
+def test_expired_geocoder_results_are_misses_but_gazetteer_entries_stay():
+    cache = GeocodeCache(ttl_days=30)
+    old = datetime.now() - timedelta(days=31)
+    cache.load([
+        entry("Strada Veche 1", source=SOURCE_GEOAPIFY, resolved_at=old),
+        entry("Strada Noua 1", source=SOURCE_GEOAPIFY, resolved_at=datetime.now()),
+        entry("Strada Gazetteer", resolved_at=old),
+    ])
+    assert cache.get("strada veche 1") is None
+    assert cache.peek("strada veche 1") is not None
+    assert cache.get("strada noua 1") is not None
+    assert cache.get("strada gazetteer") is not None
+    assert sorted(labels(cache.search("strada"))) == ["Strada Gazetteer", "Strada Noua 1"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["gazetteer_entries"]) == (2, 1, 1)
+
+
+def test_added_entries_are_searchable():
+    cache = GeocodeCache()
+    cache.add(entry("Strada Noua 3"))
+    cache.add(entry("Strada Noua 3", hits=2))
+    assert labels(cache.search("noua")) == ["Strada Noua 3"]
+    assert cache.stats()["size"] == 1
+
+
+def test_hits_are_counted_until_taken_and_survive_a_reload():
+    cache = GeocodeCache()
+    cache.load([entry("Strada Rara"), entry("Strada Rapida")])
+    for _ in range(3):
+        cache.count_hit(cache.get("strada rapida"))
+    assert labels(cache.search("strada ra")) == ["Strada Rapida", "Strada Rara"]
+    assert cache.stats()["pending_hits"] == 3
+
+    # A reload reads the table, which does not have the pending hits yet
+    cache.load([entry("Strada Rara"), entry("Strada Rapida")])
+    assert cache.peek("strada rapida").hits == 3
+
+    pending = cache.take_pending_hits()
+    assert pending == {"strada rapida": 3}
+    assert cache.stats()["pending_hits"] == 0
+    cache.restore_pending_hits(pending)
+    assert cache.take_pending_hits() == {"strada rapida": 3}
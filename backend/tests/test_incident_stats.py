@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from IncidentStats import HISTOGRAM_EDGES, IncidentStats, histogram_quantile, merge_histograms, summarize_times
+from database import Base
+from models import IncidentDB, IncidentStatsHourlyDB
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def histogram_of(values):
+    histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+    for value in values:
+        histogram[next((i for i, edge in enumerate(HISTOGRAM_EDGES) if value <= edge), len(HISTOGRAM_EDGES))] += 1
+    return histogram
+
+
+def test_quantile_interpolates_inside_the_bucket():
+    # Ten values in (120, 300]
+    histogram = histogram_of([200] * 10)
+    assert histogram_quantile(histogram, 0.5) == 210
+    assert histogram_quantile(histogram, 1.0) == 300
+    # Below the first edge interpolates from zero
+    assert histogram_quantile(histogram_of([0.01] * 4), 0.5) == pytest.approx(0.03, abs=0.01)
+
+
+def test_quantile_picks_the_right_bucket():
+    histogram = histogram_of([10] * 50 + [600] * 40 + [3000] * 10)
+    assert 5 <= histogram_quantile(histogram, 0.5) <= 10
+    assert 300 <= histogram_quantile(histogram, 0.9) <= 600
+    assert 2700 <= histogram_quantile(histogram, 0.95) <= 3600
+
+
+def test_quantile_edge_cases():
+    assert histogram_quantile(histogram_of([]), 0.5) is None
+    assert histogram_quantile(histogram_of([10 ** 6]), 0.5) == HISTOGRAM_EDGES[-1]
+    assert summarize_times(0, 0.0, histogram_of([])) == {"count": 0, "mean": None, "p50": None, "p90": None, "p95": None}
+    assert merge_histograms([histogram_of([10]), None, histogram_of([10, 600])]) == histogram_of([10, 10, 600])
+
+
+@pytest.fixture
+def tracked():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    stats = IncidentStats("Resolved")
+    stats.track(factory)
+    yield stats, factory
+    engine.dispose()
+
+
+def resolved(severity=1, type_="Accident", minutes=30, processing=60, started_at=T0):
+    return IncidentDB(
+        status="Resolved", severity=severity, type=type_, started_at=started_at,
+        ended_at=started_at + timedelta(minutes=minutes), processing_time_seconds=processing,
+    )
+
+
+def rollups(db):
+    return {
+        (row.hour, row.type, row.severity): (row.resolved, row.processing_count, row.resolution_sum)
+        for row in db.query(IncidentStatsHourlyDB).all()
+    }
+
+
+def test_resolving_adds_to_the_hour_it_started(tracked):
+    stats, factory = tracked
+    with factory() as db:
+        incident = IncidentDB(status="Active", severity=1, type="Accident", started_at=T0 + timedelta(minutes=20))
+        db.add(incident)
+        db.commit()
+        assert rollups(db) == {}
+
+        incident.status = "Resolved"
+        incident.ended_at = incident.started_at + timedelta(minutes=10)
+        incident.processing_time_seconds = 45
+        db.commit()
+        assert rollups(db) == {(T0, "Accident", 1): (1, 1, 600.0)}
+
+
+def test_changes_reopens_and_deletes_adjust_the_rollups(tracked):
+    stats, factory = tracked
+    with factory() as db:
+        first, second = resolved(), resolved(minutes=10, processing=None)
+        db.add_all([first, second])
+        db.commit()
+        assert rollups(db) == {(T0, "Accident", 1): (2, 1, 2400.0)}
+
+        # Changing a counted column moves the contribution to its new row
+        first.severity = 2
+        db.commit()
+        assert rollups(db) == {(T0, "Accident", 1): (1, 0, 600.0), (T0, "Accident", 2): (1, 1, 1800.0)}
+
+        first.status = "Active"
+        db.commit()
+        assert rollups(db)[T0, "Accident", 2] == (0, 0, 0.0)
+
+        db.delete(second)
+        db.commit()
+        assert rollups(db)[T0, "Accident", 1] == (0, 0, 0.0)
+
+
+def test_rebuild_matches_the_tracked_rollups(tracked):
+    stats, factory = tracked
+    with factory() as db:
+        db.add_all([resolved(severity=s, minutes=5 * s, started_at=T0 + timedelta(hours=s)) for s in range(1, 5)])
+        db.add(IncidentDB(status="Active", severity=1, started_at=T0))
+        db.commit()
+        tracked_rows = rollups(db)
+        assert stats.rebuild(db) == 4
+        assert rollups(db) == tracked_rows
+
+
+def test_summary_reads_the_rollups(tracked):
+    stats, factory = tracked
+    with factory() as db:
+        db.add_all([
+            resolved(minutes=10, processing=30),
+            resolved(type_="Fire", severity=2, minutes=20, processing=90, started_at=T0 + timedelta(hours=1)),
+            resolved(started_at=T0 + timedelta(days=1)),
+        ])
+        db.commit()
+        summary = stats.summary(db, T0, T0 + timedelta(hours=2))
+        assert summary["resolved"] == 2
+        assert summary["by_type"] == {"Accident": 1, "Fire": 1}
+        assert summary["by_severity"] == {1: 1, 2: 1}
+        assert summary["processing_time_seconds"]["mean"] == 60
+        assert summary["resolution_time_seconds"]["count"] == 2
+        assert [bucket["start"] for bucket in summary["buckets"]] == [T0.isoformat(), (T0 + timedelta(hours=1)).isoformat()]
+        assert stats.summary(db, T0, T0 + timedelta(days=2), bucket="day")["buckets"][0]["resolved"] == 2
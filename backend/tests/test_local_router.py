@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import math
+import pickle
+import random
+import threading
+
+import pytest
+
+import ORS
+from LocalRouter import LocalRouter, HIGHWAY_SPEEDS_KMH
+
+GRID = 12
+STEP_DEG = 0.002
+ORIGIN = (23.55, 47.64)
+
+
+def write_grid_osm(path, rng):
+    """A GRID x GRID street grid with mixed road types, oneways and shape points between crossings."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    node_id = 0
+    crossings = {}
+    for i in range(GRID):
+        for j in range(GRID):
+            node_id += 1
+            crossings[i, j] = node_id
+            lines.append(f'<node id="{node_id}" lon="{ORIGIN[0] + i * STEP_DEG:.6f}" lat="{ORIGIN[1] + j * STEP_DEG:.6f}"/>')
+
+    way_id = 0
+    highways = [name for name in HIGHWAY_SPEEDS_KMH if not name.startswith("motorway")]
+    for horizontal in (True, False):
+        for line in range(GRID):
+            for start in range(GRID - 1):
+                a = crossings[(start, line) if horizontal else (line, start)]
+                b = crossings[(start + 1, line) if horizontal else (line, start + 1)]
+                # A bent shape point in the middle, which must not become a graph node
+                node_id += 1
+                shape = node_id
+                lon = ORIGIN[0] + (start + 0.5 if horizontal else line) * STEP_DEG + rng.uniform(-4e-4, 4e-4)
+                lat = ORIGIN[1] + (line if horizontal else start + 0.5) * STEP_DEG + rng.uniform(-4e-4, 4e-4)
+                lines.append(f'<node id="{shape}" lon="{lon:.6f}" lat="{lat:.6f}"/>')
+                way_id += 1
+                tags = [("highway", rng.choice(highways))]
+                roll = rng.random()
+                if roll < 0.15:
+                    tags.append(("oneway", "yes"))
+                elif roll < 0.2:
+                    tags.append(("oneway", "-1"))
+                if rng.random() < 0.2:
+                    tags.append(("maxspeed", str(rng.choice([20, 40, 80]))))
+                lines.append(f'<way id="{way_id}">')
+                lines += [f'<nd ref="{ref}"/>' for ref in (a, shape, b)]
+                lines += [f'<tag k="{k}" v="{v}"/>' for k, v in tags]
+                lines.append("</way>")
+    lines.append("</osm>")
+    path.write_text("\n".join(lines))
+
+
+def dijkstra(router, source):
+    """Plain Dijkstra over the road edges, ignoring the hierarchy."""
+    adjacency = {}
+    for (u, v), (duration, _, _) in router.edges.items():
+        adjacency.setdefault(u, []).append((v, duration))
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, x = heapq.heappop(heap)
+        if d > dist[x]:
+            continue
+        for y, w in adjacency.get(x, ()):
+            if d + w < dist.get(y, math.inf):
+                dist[y] = d + w
+                heapq.heappush(heap, (d + w, y))
+    return dist
+
+
+@pytest.fixture(scope="module")
+def router(tmp_path_factory):
+    path = tmp_path_factory.mktemp("osm") / "grid.osm"
+    write_grid_osm(path, random.Random(11))
+    return LocalRouter.from_osm(str(path))
+
+
+def node(router, i):
+    return router.node_lon[i], router.node_lat[i]
+
+
+def test_only_crossings_become_nodes(router):
+    assert router.node_count == GRID * GRID
+
+
+def test_hierarchy_durations_match_dijkstra(router):
+    rng = random.Random(5)
+    for _ in range(200):
+        source, target = rng.randrange(router.node_count), rng.randrange(router.node_count)
+        expected = dijkstra(router, source).get(target)
+        (duration,) = router.durations_to([node(router, source)], node(router, target))
+        if expected is None:
+            assert duration is None
+        else:
+            assert duration == pytest.approx(expected, rel=1e-4, abs=1e-3)
+
+
+def test_route_follows_the_roads(router):
+    start, end = node(router, 0), node(router, router.node_count - 1)
+    points = router.route(*start, *end)
+    assert points[0] == list(start) and points[-1] == list(end)
+    # Shape points between crossings are part of the geometry
+    assert len(points) > 2 * (GRID - 1)
+
+
+def test_pickled_router_answers_the_same(router):
+    origins = [node(router, i) for i in range(0, router.node_count, 7)]
+    destination = node(router, router.node_count // 2)
+    restored = pickle.loads(pickle.dumps(router))
+    assert restored.durations_to(origins, destination) == router.durations_to(origins, destination)
+
+
+def test_ors_runs_local_queries_off_the_event_loop(router, monkeypatch):
+    monkeypatch.setattr(ORS, "ROUTING_BACKEND", "local")
+    monkeypatch.setattr(ORS, "local_router", router)
+    threads = []
+    durations_to = router.durations_to
+
+    def recording_durations_to(origins, destination):
+        threads.append(threading.current_thread())
+        return durations_to(origins, destination)
+
+    monkeypatch.setattr(router, "durations_to", recording_durations_to)
+    start, end = node(router, 3), node(router, 40)
+
+    async def query():
+        return await asyncio.gather(ORS._request_matrix([start], [end]), ORS.get_route(*start, *end))
+
+    matrix, (points, duration) = asyncio.run(query())
+    assert matrix == [[duration]]
+    assert points == router.route(*start, *end)
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,73 @@
+import pytest
+
+import Metrics
+from Metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def scratch_registry(monkeypatch):
+    # Metrics created here stay out of the application's registry
+    monkeypatch.setattr(Metrics, "_registry", [])
+
+
+def test_counter_renders_help_type_and_sorted_series():
+    requests = Counter("test_requests_total", "Requests handled.", ["method", "status"])
+    requests.inc(method="POST", status=201)
+    requests.inc(method="GET", status=200)
+    requests.inc(2, method="GET", status=200)
+    assert Metrics.render() == (
+        "# HELP test_requests_total Requests handled.\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{method="GET",status="200"} 3\n'
+        'test_requests_total{method="POST",status="201"} 1\n'
+    )
+
+
+def test_labels_must_match_and_values_are_escaped():
+    errors = Counter("test_errors_total", "Errors.", ["reason"])
+    with pytest.raises(ValueError):
+        errors.inc(kind="x")
+    errors.inc(reason='bad "quote"\\\n')
+    assert 'test_errors_total{reason="bad \\"quote\\"\\\\\\n"} 1' in Metrics.render()
+
+
+def test_gauge_set_and_function():
+    queue = Gauge("test_queue_depth", "Queued incidents.")
+    queue.set(4)
+    fleet = Gauge("test_fleet", "Ambulances by status.", ["status"])
+    fleet.set_function(lambda: {"Busy": 2, "Available": 1.5})
+    lines = Metrics.render().splitlines()
+    assert "# TYPE test_queue_depth gauge" in lines
+    assert "test_queue_depth 4" in lines
+    assert 'test_fleet{status="Available"} 1.5' in lines
+    assert 'test_fleet{status="Busy"} 2' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram("test_latency_seconds", "Latency.", ["route"], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, route="eta")
+    assert Metrics.render().splitlines()[2:] == [
+        'test_latency_seconds_bucket{route="eta",le="0.1"} 2',
+        'test_latency_seconds_bucket{route="eta",le="1"} 3',
+        'test_latency_seconds_bucket{route="eta",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="eta"} 3.65',
+        'test_latency_seconds_count{route="eta"} 4',
+    ]
+
+
+def test_histogram_time_observes_even_on_error():
+    latency = Histogram("test_timed_seconds", "Timed.")
+    with pytest.raises(RuntimeError):
+        with latency.time():
+            raise RuntimeError
+    assert "test_timed_seconds_count 1" in Metrics.render().splitlines()
+
+
+def test_a_failing_metric_does_not_break_the_others():
+    broken = Gauge("test_broken", "Broken.")
+    broken.set_function(lambda: 1 / 0)
+    Counter("test_after_total", "After.").inc()
+    rendered = Metrics.render()
+    assert "# test_broken failed: division by zero" in rendered
+    assert "test_after_total 1" in rendered
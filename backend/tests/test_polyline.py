@@ -0,0 +1,78 @@
+import math
+import random
+
+import pytest
+
+import Polyline
+
+# The example from Google's polyline format documentation, as [lon, lat]
+REFERENCE_POINTS = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+REFERENCE_ENCODED = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_matches_the_reference_encoding():
+    assert Polyline.encode(REFERENCE_POINTS) == REFERENCE_ENCODED
+    assert Polyline.decode(REFERENCE_ENCODED) == REFERENCE_POINTS
+
+
+def test_round_trip_keeps_five_decimals():
+    rng = random.Random(1)
+    points = [[23.58 + rng.uniform(-0.1, 0.1), 47.66 + rng.uniform(-0.1, 0.1)] for _ in range(200)]
+    decoded = Polyline.decode(Polyline.encode(points))
+    assert len(decoded) == len(points)
+    for (lon, lat), (d_lon, d_lat) in zip(points, decoded):
+        assert d_lon == pytest.approx(lon, abs=5e-6)
+        assert d_lat == pytest.approx(lat, abs=5e-6)
+
+
+def test_extra_coordinates_are_ignored_and_precision_is_configurable():
+    points = [[23.123456, 47.654321, 512.0], [23.2, 47.7, 530.0]]
+    assert Polyline.decode(Polyline.encode(points, precision=6), precision=6) == [[23.123456, 47.654321], [23.2, 47.7]]
+
+
+def test_empty_route():
+    assert Polyline.encode([]) == ""
+    assert Polyline.decode("") == []
+
+
+def test_decode_route_accepts_both_stored_forms():
+    assert Polyline.decode_route(REFERENCE_ENCODED) == REFERENCE_POINTS
+    assert Polyline.decode_route(REFERENCE_POINTS) is REFERENCE_POINTS
+    assert Polyline.decode_route(None) is None
+
+
+def _distance_to_segment_m(point, a, b):
+    scale = math.cos(math.radians(a[1]))
+    px, py = (point[0] - a[0]) * 111320 * scale, (point[1] - a[1]) * 110540
+    dx, dy = (b[0] - a[0]) * 111320 * scale, (b[1] - a[1]) * 110540
+    length_sq = dx * dx + dy * dy
+    t = max(0.0, min(1.0, (px * dx + py * dy) / length_sq)) if length_sq else 0.0
+    return math.hypot(px - t * dx, py - t * dy)
+
+
+def test_simplify_stays_within_tolerance():
+    rng = random.Random(2)
+    # A wiggly 2 km road with a point every ~10 m
+    points = [[23.55 + i * 0.0001, 47.65 + 0.0003 * math.sin(i / 7) + rng.uniform(-2e-5, 2e-5)] for i in range(200)]
+    simplified = Polyline.simplify(points, 5)
+    assert simplified[0] == points[0] and simplified[-1] == points[-1]
+    assert len(simplified) < len(points) / 3
+    # Every dropped point lies within the tolerance of the kept segment it was replaced by
+    kept = [points.index(point) for point in simplified]
+    for first, last in zip(kept, kept[1:]):
+        for point in points[first + 1:last]:
+            assert _distance_to_segment_m(point, points[first], points[last]) <= 5 + 1e-6
+
+
+def test_simplify_keeps_short_or_untouched_routes():
+    points = [[23.5, 47.6], [23.6, 47.7]]
+    assert Polyline.simplify(points, 10) == points
+    straight = [[23.5 + i * 0.001, 47.6] for i in range(10)]
+    assert Polyline.simplify(straight, 1) == [straight[0], straight[-1]]
+    assert Polyline.simplify(straight, 0) == straight
+
+
+def test_tolerance_for_zoom_halves_per_level():
+    at_12 = Polyline.tolerance_for_zoom(12, 47.66)
+    assert Polyline.tolerance_for_zoom(13, 47.66) == pytest.approx(at_12 / 2)
+    assert Polyline.tolerance_for_zoom(0, 0) == pytest.approx(156543.03392)
@@ -0,0 +1,93 @@
+import random
+import time
+
+from SpatialIndex import SpatialIndex, haversine_m
+
+# Baia Mare
+LON, LAT = 23.58, 47.66
+
+
+def brute_force(points, lon, lat, k, allowed=None):
+    found = sorted(
+        (haversine_m(lon, lat, p_lon, p_lat), item_id) for item_id, (p_lon, p_lat) in points.items()
+        if allowed is None or item_id in allowed
+    )
+    return [item_id for _, item_id in found[:k]]
+
+
+def city_fleet(n, rng):
+    return {i: (LON + rng.uniform(-0.05, 0.05), LAT + rng.uniform(-0.05, 0.05)) for i in range(1, n + 1)}
+
+
+def build(points):
+    index = SpatialIndex()
+    for item_id, (lon, lat) in points.items():
+        index.upsert(item_id, lon, lat)
+    return index
+
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    points = city_fleet(200, rng)
+    index = build(points)
+    for _ in range(100):
+        lon, lat = LON + rng.uniform(-0.08, 0.08), LAT + rng.uniform(-0.08, 0.08)
+        k = rng.randint(1, 12)
+        assert [item_id for item_id, _ in index.nearest(lon, lat, k)] == brute_force(points, lon, lat, k)
+
+
+def test_allowed_restricts_the_result():
+    rng = random.Random(3)
+    points = city_fleet(50, rng)
+    index = build(points)
+    allowed = set(range(1, 51, 5))
+    assert [item_id for item_id, _ in index.nearest(LON, LAT, 4, allowed)] == brute_force(points, LON, LAT, 4, allowed)
+
+
+def test_far_away_unit_is_found_quickly():
+    points = city_fleet(6, random.Random(1))
+    # ~300 km away
+    points[7] = (LON + 4.0, LAT + 0.5)
+    index = build(points)
+    started = time.perf_counter()
+    result = index.nearest(LON, LAT, 8)
+    assert time.perf_counter() - started < 0.5
+    assert [item_id for item_id, _ in result] == brute_force(points, LON, LAT, 8)
+    assert result[-1][0] == 7
+
+
+def test_unit_at_null_island_is_found_quickly():
+    points = city_fleet(6, random.Random(2))
+    # A zero or swapped coordinate
+    points[7] = (0.0, 0.0)
+    points[8] = (LAT, LON)
+    index = build(points)
+    started = time.perf_counter()
+    result = index.nearest(LON, LAT, 3)
+    assert time.perf_counter() - started < 0.5
+    assert [item_id for item_id, _ in result] == brute_force(points, LON, LAT, 3)
+
+
+def test_k_larger_than_fleet_returns_every_unit():
+    points = city_fleet(6, random.Random(4))
+    index = build(points)
+    result = index.nearest(LON, LAT, 20)
+    assert [item_id for item_id, _ in result] == brute_force(points, LON, LAT, 20)
+    assert [item_id for item_id, _ in index.nearest(LON, LAT, 20, allowed={1, 2, 99})] == brute_force(points, LON, LAT, 20, {1, 2})
+
+
+def test_moves_and_removals():
+    index = SpatialIndex()
+    index.upsert(1, LON, LAT)
+    index.upsert(2, LON + 0.2, LAT)
+    index.upsert(1, LON + 0.3, LAT)
+    assert [item_id for item_id, _ in index.nearest(LON, LAT, 1)] == [2]
+    index.remove(2)
+    index.upsert(3, None, None)
+    assert [item_id for item_id, _ in index.nearest(LON, LAT, 5)] == [1]
+    assert len(index) == 1 and 3 not in index
+    assert index.nearest(LON, LAT, 0) == []
+
+
+def test_empty_index():
+    assert SpatialIndex().nearest(LON, LAT, 3) == []
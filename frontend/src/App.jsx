@@ -4,44 +4,35 @@ import Sidebar from "./components/Sidebar";
 import Map from "./Map";
 import NewIncidentModal from "./components/NewIncidentModal";
 import "./App.css";
-import {
-  get_incidents,
-  get_ambulances,
-  get_hospitals,
-  get_emergency_centers,
-  get_logs,
-} from "./services/api";
+import { get_logs } from "./services/api";
+import { useLiveTable, useDriverMission } from "./services/live";
+import { useIncidentRoutes } from "./services/routes";
 import { FaPlus } from "react-icons/fa";
 import { toast, ToastContainer } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 import DriverMap from "./DriverMap";
 
 export default function App() {
+  const rawRole = localStorage.getItem("user_role");
+  const userRole = rawRole?.toLowerCase() || "";
+  const isDriver = userRole === "driver";
+
+  // Drivers only get their own mission pushed, the other roles the whole tables
   const [sidebarOpen, setSidebarOpen] = useState(false);
-  const [incidents, setIncidents] = useState([]);
-  const [ambulances, setAmbulances] = useState([]);
-  const [hospitals, setHospitals] = useState([]);
-  const [emergencyCenters, setEmergencyCenters] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [liveIncidents, incidentsReady] = useLiveTable(isDriver ? null : "incidents");
+  const incidents = useIncidentRoutes(liveIncidents);
+  const [ambulances, ambulancesReady] = useLiveTable(isDriver ? null : "ambulances");
+  const [hospitals] = useLiveTable(isDriver ? null : "hospitals");
+  const [emergencyCenters] = useLiveTable(isDriver ? null : "emergency_centers");
+  const [mission] = useDriverMission(isDriver ? localStorage.getItem("user_id") : null);
+  const loading = !incidentsReady || !ambulancesReady;
   const [newIncidentModalOpen, setNewIncidentModalOpen] = useState(false);
   const [lastSeenLog, setLastSeenLog] = useState("");
-  const [ambulance, setAmbulance] = useState([]);
-  const [incident, setIncident] = useState([]);
-  const [hospital, setHospital] = useState([]);
-
-  const rawRole = localStorage.getItem("user_role");
-  const userRole = rawRole?.toLowerCase() || "";
 
   const toggleSidebar = () => {
     setSidebarOpen(!sidebarOpen);
   };
 
-  useEffect(() => {
-    fetchData();
-    const interval = setInterval(fetchData, 1000); // Refresh every 1 second
-    return () => clearInterval(interval);
-  }, []);
-
   useEffect(() => {
     const fetchLogs = async () => {
       try {
@@ -63,45 +54,6 @@ export default function App() {
     return () => clearInterval(interval);
   }, [lastSeenLog]);
 
-  const fetchData = async () => {
-    try {
-      const [
-        incidentsData,
-        ambulancesData,
-        hospitalData,
-        emergencyCentersData,
-      ] = await Promise.all([
-        get_incidents(),
-        get_ambulances(),
-        get_hospitals(),
-        get_emergency_centers(),
-      ]);
-      setIncidents(incidentsData);
-      setAmbulances(ambulancesData);
-      setHospitals(hospitalData);
-      setEmergencyCenters(emergencyCentersData);
-
-      const userId = parseInt(localStorage.getItem("user_id"));
-      const myAmbulance = ambulancesData.find((a) => a.driver_id === userId);
-      const myIncident = incidentsData.find(
-        (i) =>
-          i.assigned_units?.includes(myAmbulance?.id) &&
-          i.status !== "Resolved",
-      );
-      const myHospital = hospitalData.find(
-        (h) => h.id === myIncident?.assigned_hospital,
-      );
-
-      setAmbulance(myAmbulance);
-      setIncident(myIncident);
-      setHospital(myHospital);
-    } catch (error) {
-      console.error("Error fetching data:", error);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   return (
     <div className="app-container">
       <Navbar onToggleSidebar={toggleSidebar} />
@@ -113,7 +65,6 @@ export default function App() {
           isOpen={newIncidentModalOpen}
           onClose={() => setNewIncidentModalOpen(false)}
           onSuccess={() => {
-            fetchData();
             setNewIncidentModalOpen(false);
           }}
         />
@@ -138,12 +89,14 @@ export default function App() {
           />
         )}
 
-        {userRole === "driver" && (
+        {isDriver && (
           <DriverMap
             sidebarOpen={sidebarOpen}
-            ambulance={ambulance}
-            incident={incident}
-            hospital={hospital}
+            ambulance={mission?.ambulance}
+            incident={mission?.incident}
+            hospital={mission?.hospital}
+            phase={mission?.phase}
+            route={mission?.route}
           />
         )}
         <ToastContainer
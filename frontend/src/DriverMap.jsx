@@ -138,121 +138,41 @@ function CameraFollower({ lat, lon, heading }) {
   return null;
 }
 
+// Route colour of each mission phase; the standing phases show the leg that comes next
+const PHASE_COLORS = {
+  to_incident: "#ff2222",
+  on_scene: "#2244ff",
+  to_hospital: "#2244ff",
+  at_hospital: "#888888",
+  returning: "#888888",
+};
+
 export default function DriverMap({
   sidebarOpen,
   incident,
   ambulance,
   hospital,
+  phase,
+  route,
 }) {
   const lastHeading = useRef(0);
-  const arrivalKey =
-    incident?.id && ambulance?.id
-      ? `arrived-${incident.id}-${ambulance.id}`
-      : null;
-
-  const [hasArrived, setHasArrived] = useState(() => {
-    if (arrivalKey) {
-      return localStorage.getItem(arrivalKey) === "true";
-    }
-    return false;
-  });
-
-  useEffect(() => {
-    if (arrivalKey) {
-      setHasArrived(localStorage.getItem(arrivalKey) === "true");
-    } else {
-      setHasArrived(false);
-    }
-  }, [arrivalKey]);
-
-  useEffect(() => {
-    if (hasArrived || !ambulance || !incident || !arrivalKey) return;
-
-    const ambKey = String(ambulance.id);
-    const routeInc = incident.route_to_incident?.[ambKey];
-
-    if (routeInc && routeInc.length > 0) {
-      const [lastLon, lastLat] = routeInc[routeInc.length - 1];
-      const dist = Math.hypot(ambulance.lat - lastLat, ambulance.lon - lastLon);
-
-      if (dist < 0.0003) {
-        setHasArrived(true);
-        localStorage.setItem(arrivalKey, "true");
-      }
-    }
-  }, [ambulance?.lat, ambulance?.lon, incident?.id, hasArrived, arrivalKey]);
-
-  useEffect(() => {
-    if (!ambulance?.id || !incident) return;
-    if (incident.status === "Resolved" || ambulance.status === "Available") {
-      const keysToRemove = [];
-      for (let i = 0; i < localStorage.length; i++) {
-        const key = localStorage.key(i);
-        if (
-          key &&
-          key.startsWith("arrived-") &&
-          key.endsWith(`-${ambulance.id}`)
-        ) {
-          keysToRemove.push(key);
-        }
-      }
-      keysToRemove.forEach((key) => localStorage.removeItem(key));
-      setHasArrived(false);
-    }
-  }, [incident, ambulance?.status, ambulance?.id]);
 
+  // The server sends the route ahead when the mission changes, positions in between
   const activeRoute = useMemo(() => {
-    const lines = [];
-    if (!incident || !ambulance?.id) return lines;
-
-    // Only show routes for active dispatches
-    if (incident.status !== "Assigned" && incident.status !== "Queued")
-      return lines;
-
-    const ambKey = String(ambulance.id);
-
-    // 3. Use the latched state to decide which route to process
-    if (!hasArrived) {
-      // EN ROUTE TO INCIDENT
-      const routeInc = incident.route_to_incident?.[ambKey];
-      const remainingToInc = getProgressiveRoute(
-        routeInc,
-        ambulance.lat,
-        ambulance.lon,
-      );
-
-      if (remainingToInc.length > 1) {
-        lines.push({
-          id: `inc-${incident.id}`,
-          positions: remainingToInc,
-          color: "#ff2222",
-          weight: 5,
-          opacity: 0.7,
-        });
-      }
-    } else {
-      // TRANSPORTING TO HOSPITAL
-      const routeHosp = incident.route_to_hospital?.[ambKey];
-      if (routeHosp) {
-        const hospitalPath = getProgressiveRoute(
-          routeHosp,
-          ambulance.lat,
-          ambulance.lon,
-        );
-        if (hospitalPath.length > 1) {
-          lines.push({
-            id: `hos-${incident.id}`,
-            positions: hospitalPath,
-            color: "#2244ff",
-            weight: 5,
-            opacity: 0.7,
-          });
-        }
-      }
-    }
-
-    return lines;
-  }, [incident, ambulance.lat, ambulance.lon, hasArrived]);
+    if (!incident || !ambulance?.id || !phase) return [];
+
+    const remaining = getProgressiveRoute(route, ambulance.lat, ambulance.lon);
+    if (remaining.length < 2) return [];
+    return [
+      {
+        id: `${phase}-${incident.id}`,
+        positions: remaining,
+        color: PHASE_COLORS[phase],
+        weight: 5,
+        opacity: 0.7,
+      },
+    ];
+  }, [incident, phase, route, ambulance?.lat, ambulance?.lon]);
 
   const heading = useMemo(() => {
     const currentLine = activeRoute[0];
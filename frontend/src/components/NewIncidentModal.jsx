@@ -2,6 +2,7 @@ import { useState, useEffect } from "react";
 import {
   create_incident,
   convert_address,
+  autocomplete_address,
   dispatch_ambulance,
   get_patients,
   create_patient,
@@ -23,6 +24,7 @@ export default function NewIncidentModal({ isOpen, onClose, onSuccess }) {
   const [isPatientSelectionModalOpen, setIsPatientSelectionModalOpen] =
     useState(false);
   const [currentPatientSlotIndex, setCurrentPatientSlotIndex] = useState(null);
+  const [addressSuggestions, setAddressSuggestions] = useState([]);
 
   useEffect(() => {
     if (isOpen) {
@@ -51,6 +53,22 @@ export default function NewIncidentModal({ isOpen, onClose, onSuccess }) {
     }
   }, [formData.nr_patients, selectedPatients.length]);
 
+  // Addresses entered before (and gazetteer streets), served from the backend's geocode cache
+  useEffect(() => {
+    if (formData.address.trim().length < 2) {
+      setAddressSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        setAddressSuggestions(await autocomplete_address(formData.address));
+      } catch (error) {
+        setAddressSuggestions([]);
+      }
+    }, 200);
+    return () => clearTimeout(timer);
+  }, [formData.address]);
+
   const handleInputChange = (e) => {
     const { name, value } = e.target;
     let finalValue = value;
@@ -159,7 +177,14 @@ export default function NewIncidentModal({ isOpen, onClose, onSuccess }) {
               placeholder="e.g. Bulevardul Traian 2"
               value={formData.address}
               onChange={handleInputChange}
+              list="address-suggestions"
+              autoComplete="off"
             />
+            <datalist id="address-suggestions">
+              {addressSuggestions.map((suggestion) => (
+                <option key={suggestion.address} value={suggestion.address} />
+              ))}
+            </datalist>
           </div>
 
           <div className="form-group">
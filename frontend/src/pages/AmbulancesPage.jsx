@@ -15,6 +15,7 @@ import {
   get_users,
   get_emergency_centers,
 } from "../services/api";
+import { useLiveTable } from "../services/live";
 import { FaEdit, FaTrash } from "react-icons/fa";
 
 export default function AmbulancesPage() {
@@ -43,21 +44,13 @@ export default function AmbulancesPage() {
     }
   }, []);
 
+  // Real-time updates pushed by the server
+  const [liveAmbulances, liveReady] = useLiveTable("ambulances");
   useEffect(() => {
-    fetchData();
-    const interval = setInterval(fetchData, 1000);
-    return () => clearInterval(interval);
-  }, []);
-
-  const fetchData = async () => {
-    try {
-      const data = await get_ambulances();
-      setAmbulances(data);
-      setFilteredAmbulances(data);
-    } catch (error) {
-      console.error("Error fetching data:", error);
-    }
-  };
+    if (!liveReady) return;
+    setAmbulances(liveAmbulances);
+    setFilteredAmbulances(liveAmbulances);
+  }, [liveAmbulances, liveReady]);
 
   const handleSearch = (filtered, query) => {
     setFilteredAmbulances(filtered);
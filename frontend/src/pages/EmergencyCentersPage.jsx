@@ -12,6 +12,7 @@ import {
   delete_emergency_center, 
   convert_address 
 } from '../services/api'
+import { useLiveTable } from '../services/live'
 import { FaEdit, FaTrash } from 'react-icons/fa'
 
 export default function EmergencyCentersPage() {
@@ -41,22 +42,13 @@ export default function EmergencyCentersPage() {
     }
   }, [])
 
-  // 2. Real-time Polling
+  // 2. Real-time updates pushed by the server
+  const [liveCenters, liveReady] = useLiveTable('emergency_centers')
   useEffect(() => {
-    fetchData()
-    const interval = setInterval(fetchData, 1000) 
-    return () => clearInterval(interval)
-  }, [])
-  
-  const fetchData = async () => {
-    try {
-        const data = await get_emergency_centers()
-        setCenters(data)
-        setFilteredCenters(data) 
-      } catch (error) {
-        console.error('Error fetching data:', error)
-      }
-  }
+    if (!liveReady) return
+    setCenters(liveCenters)
+    setFilteredCenters(liveCenters)
+  }, [liveCenters, liveReady])
 
   const handleSearch = (filtered, query) => {
     setFilteredCenters(filtered)
@@ -12,6 +12,7 @@ import {
   delete_hospital, 
   convert_address 
 } from '../services/api'
+import { useLiveTable } from '../services/live'
 import { FaEdit, FaTrash } from 'react-icons/fa'
 
 export default function HospitalsPage() {
@@ -41,22 +42,13 @@ export default function HospitalsPage() {
     }
   }, [])
 
-  // 2. Real-time Polling
+  // 2. Real-time updates pushed by the server
+  const [liveHospitals, liveReady] = useLiveTable('hospitals')
   useEffect(() => {
-    fetchData()
-    const interval = setInterval(fetchData, 1000) 
-    return () => clearInterval(interval)
-  }, [])
-  
-  const fetchData = async () => {
-    try {
-        const data = await get_hospitals()
-        setHospitals(data)
-        setFilteredHospitals(data) 
-      } catch (error) {
-        console.error('Error fetching data:', error)
-      }
-  }
+    if (!liveReady) return
+    setHospitals(liveHospitals)
+    setFilteredHospitals(liveHospitals)
+  }, [liveHospitals, liveReady])
 
   const handleSearch = (filtered, query) => {
     setFilteredHospitals(filtered)
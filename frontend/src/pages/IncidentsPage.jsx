@@ -10,7 +10,7 @@ import "./IncidentsPage.css";
 import "../components/NewIncidentModal.css";
 import {
   create_incident,
-  get_incidents,
+  sync_incidents,
   update_incident,
   delete_incident,
   convert_address,
@@ -40,7 +40,7 @@ export default function IncidentsPage() {
   };
 
   useEffect(() => {
-    get_incidents().then((data) => {
+    sync_incidents().then((data) => {
       setIncidents(data);
       setFilteredIncidents(data);
     });
@@ -82,7 +82,7 @@ export default function IncidentsPage() {
 
   const fetchData = async () => {
     try {
-      const incidentsData = await get_incidents();
+      const incidentsData = await sync_incidents();
       setIncidents(incidentsData);
       setFilteredIncidents(incidentsData);
     } catch (error) {
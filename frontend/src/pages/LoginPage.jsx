@@ -33,6 +33,7 @@ export default function LoginPage() {
       if (response.msg === "Login successful") {
         localStorage.setItem("user_role", response.role);
         localStorage.setItem("user_id", response.user_id);
+        localStorage.setItem("session_token", response.token);
         navigate("/");
       } else {
         setError("Invalid username or password.");
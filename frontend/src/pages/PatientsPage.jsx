@@ -6,6 +6,7 @@ import SearchBar from '../components/Searchbar'
 import Modal from '../components/Modal'
 import './PatientsPage.css'
 import { get_patients, create_patient, update_patient, delete_patient } from '../services/api'
+import { useLiveTable } from '../services/live'
 import { FaEdit, FaTrash } from 'react-icons/fa'
 
 export default function PatientsPage() {
@@ -34,21 +35,13 @@ export default function PatientsPage() {
     }
   }, [])
 
+  // Real-time updates pushed by the server
+  const [livePatients, liveReady] = useLiveTable('patients')
   useEffect(() => {
-    fetchData()
-    const interval = setInterval(fetchData, 1000) 
-    return () => clearInterval(interval)
-  }, [])
-  
-  const fetchData = async () => {
-    try {
-        const data = await get_patients()
-        setPatients(data)
-        setFilteredPatients(data) 
-      } catch (error) {
-        console.error('Error fetching data:', error)
-      }
-  }
+    if (!liveReady) return
+    setPatients(livePatients)
+    setFilteredPatients(livePatients)
+  }, [livePatients, liveReady])
 
   const handleSearch = (filtered, query) => {
     setFilteredPatients(filtered)
@@ -13,7 +13,7 @@ import {
 } from "chart.js";
 import Navbar from "../components/Navbar";
 import Sidebar from "../components/Sidebar";
-import { get_incidents, health_check } from "../services/api";
+import { get_statistics, health_check } from "../services/api";
 import "./StatisticsPage.css";
 
 ChartJS.register(
@@ -29,7 +29,7 @@ ChartJS.register(
 export default function StatisticsPage() {
   const navigate = useNavigate();
   const [sidebarOpen, setSidebarOpen] = useState(false);
-  const [incidents, setIncidents] = useState([]);
+  const [stats, setStats] = useState(null);
   const userId = parseInt(localStorage.getItem("user_id"));
   const [filter, setFilter] = useState("day");
   const [isRefreshingHealth, setIsRefreshingHealth] = useState(false);
@@ -37,10 +37,10 @@ export default function StatisticsPage() {
 
   const fetchData = async () => {
     try {
-      const data = await get_incidents();
-      setIncidents(data);
+      const data = await get_statistics(filter);
+      setStats(data);
     } catch (error) {
-      console.error("Error fetching incidents:", error);
+      console.error("Error fetching statistics:", error);
     }
   };
 
@@ -61,71 +61,55 @@ export default function StatisticsPage() {
       navigate("/login_page");
       return;
     }
-    fetchData();
     fetchHealthStatus();
+  }, [userId, navigate]);
 
+  useEffect(() => {
+    if (!userId) return;
+    fetchData();
     const interval = setInterval(fetchData, 30000); // 30s refresh
     return () => clearInterval(interval);
-  }, [userId, navigate]);
+  }, [userId, filter]);
 
   // --- Data Transformation ---
   const chartData = useMemo(() => {
-    const now = new Date();
-
-    const filtered = incidents.filter((inc) => {
-      if (!inc.processing_time_seconds || !inc.started_at) return false;
+    const buckets = stats?.buckets || [];
 
-      const incDate = new Date(inc.started_at);
-      const diffInMs = now - incDate;
-
-      // Safety check: if diff is negative (future), we still show it in 'day'
-      if (filter === "day")
-        return diffInMs <= 24 * 60 * 60 * 1000 || diffInMs < 0;
-      if (filter === "week") return diffInMs <= 7 * 24 * 60 * 60 * 1000;
-      if (filter === "month") return diffInMs <= 30 * 24 * 60 * 60 * 1000;
-      return true;
-    });
-
-    const sorted = filtered.sort(
-      (a, b) => new Date(a.started_at) - new Date(b.started_at),
-    );
-
-    const labels = sorted.map((inc) => {
-      const d = new Date(inc.started_at);
-      const isToday = d.toDateString() === new Date().toDateString();
-
-      return isToday
+    const labels = buckets.map((bucket) => {
+      const d = new Date(bucket.start);
+      return stats.bucket === "hour"
         ? d.toLocaleTimeString([], {
             hour: "2-digit",
             minute: "2-digit",
             hour12: false,
           })
-        : d.toLocaleDateString([], { day: "numeric", month: "short" }) +
-            " " +
-            d.toLocaleTimeString([], {
-              hour: "2-digit",
-              minute: "2-digit",
-              hour12: false,
-            });
+        : d.toLocaleDateString([], { day: "numeric", month: "short" });
     });
 
-    const dataPoints = sorted.map((inc) => Number(inc.processing_time_seconds));
-
     return {
       labels,
       datasets: [
         {
-          label: `Response Time (Seconds)`,
-          data: dataPoints,
+          label: `Response Time (Seconds, mean)`,
+          data: buckets.map((bucket) => bucket.processing_time_seconds.mean),
           borderColor: "#ff4444",
           backgroundColor: "rgba(255, 68, 68, 0.2)",
           tension: 0.3,
           fill: true,
           pointRadius: 4,
         },
+        {
+          label: `Response Time (Seconds, p90)`,
+          data: buckets.map((bucket) => bucket.processing_time_seconds.p90),
+          borderColor: "#ff9f40",
+          backgroundColor: "rgba(255, 159, 64, 0.1)",
+          tension: 0.3,
+          fill: false,
+          pointRadius: 3,
+        },
       ],
     };
-  }, [incidents, filter]);
+  }, [stats]);
 
   const chartOptions = {
     responsive: true,
@@ -253,7 +237,7 @@ export default function StatisticsPage() {
           {/* Chart */}
           <div className="stats-grid">
             <div className="chart-container">
-              {incidents.length > 0 ? (
+              {stats?.buckets.length > 0 ? (
                 <Line data={chartData} options={chartOptions} />
               ) : (
                 <div className="loading-placeholder">
@@ -11,6 +11,7 @@ import {
   update_user,
   delete_user,
 } from "../services/api";
+import { useLiveTable } from "../services/live";
 import { FaEdit, FaTrash } from "react-icons/fa";
 
 export default function UsersPage() {
@@ -41,23 +42,13 @@ export default function UsersPage() {
     });
   }, []);
 
+  // Real-time updates pushed by the server
+  const [liveUsers, liveReady] = useLiveTable("users");
   useEffect(() => {
-    if (userRole !== "admin") return;
-
-    fetchData();
-    const interval = setInterval(fetchData, 1000);
-    return () => clearInterval(interval);
-  }, []);
-
-  const fetchData = async () => {
-    try {
-      const data = await get_users();
-      setUsers(data);
-      setFilteredUsers(data);
-    } catch (error) {
-      console.error("Error fetching data:", error);
-    }
-  };
+    if (!liveReady || userRole !== "admin") return;
+    setUsers(liveUsers);
+    setFilteredUsers(liveUsers);
+  }, [liveUsers, liveReady]);
 
   const handleSearch = (filtered, query) => {
     setFilteredUsers(filtered);
@@ -10,12 +10,64 @@ const api = axios.create({
   },
 })
 
+// Every request carries the session token issued at login, so the backend never re-checks the password
+api.interceptors.request.use((config) => {
+  const token = localStorage.getItem('session_token')
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`
+  }
+  return config
+})
+
+// An expired or revoked session sends the user back to the login page
+api.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    if (error.response?.status === 401 && error.config?.url !== '/login' && localStorage.getItem('session_token')) {
+      localStorage.clear()
+      window.location.href = '/login_page'
+    }
+    return Promise.reject(error)
+  },
+)
+
 // Incidents
-export const get_incidents = async () => {
-  const response = await api.get('/incidents')
+// params: limit, cursor, sort, status, severity_min, severity_max, started_after, started_before, bbox
+export const get_incidents = async (params = {}) => {
+  const response = await api.get('/incidents', { params })
   return response.data
 }
 
+// Keeps a copy of a table and after the first load only asks for what changed since then
+const create_table_sync = (path) => {
+  let rows = null
+  let version = null
+  return async () => {
+    if (rows === null) {
+      const response = await api.get(path)
+      rows = response.data
+      version = response.headers['x-change-version']
+      return rows
+    }
+    const response = await api.get(path, { params: { since: version } })
+    const { changed, deleted } = response.data
+    if (changed.length > 0 || deleted.length > 0) {
+      const updates = new Map(changed.map((row) => [row.id, row]))
+      const removed = new Set(deleted)
+      const kept = rows.filter((row) => !removed.has(row.id))
+      const known = new Set(kept.map((row) => row.id))
+      rows = [
+        ...kept.map((row) => updates.get(row.id) ?? row),
+        ...changed.filter((row) => !known.has(row.id)),
+      ]
+    }
+    version = response.data.version
+    return rows
+  }
+}
+
+export const sync_incidents = create_table_sync('/incidents')
+
 export const create_incident = async (incident) => {
   const response = await api.post('/create_incident', incident)
   return response.data
@@ -26,6 +78,11 @@ export const update_incident = async (incident) => {
   return response.data
 }
 
+export const get_incident_routes = async (incidentId, params = {}) => {
+  const response = await api.get(`/incidents/${incidentId}/routes`, { params })
+  return response.data
+}
+
 export const delete_incident = async (incidentId) => {
   const response = await api.delete('/delete_incident', { 
     params: { incident_id: incidentId } 
@@ -56,6 +113,11 @@ export const delete_ambulance = async (ambulanceId) => {
   return response.data
 }
 
+export const get_driver_mission = async (userId) => {
+  const response = await api.get(`/driver/${userId}/mission`)
+  return response.data
+}
+
 // Hospitals
 export const get_hospitals = async () => {
   const response = await api.get('/hospitals')
@@ -129,6 +191,13 @@ export const convert_address = async (address) => {
   return response.data
 }
 
+export const autocomplete_address = async (q, limit = 8) => {
+  const response = await api.get('/autocomplete_address', {
+    params: { q, limit }
+  })
+  return response.data
+}
+
 export const get_route_geometry = async (startLat, startLon, endLat, endLon) => {
   const response = await api.get('/get_route_geometry', {
     params: {
@@ -216,6 +285,12 @@ export const get_logs = async () => {
   return response.data.logs
 }
 
+// window: day | week | month, aggregated on the server from hourly rollups
+export const get_statistics = async (window = 'day') => {
+  const response = await api.get('/statistics', { params: { window } })
+  return response.data
+}
+
 export const health_check = async () => {
   const response = await api.get('/health')
   return response.data
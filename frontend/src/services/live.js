@@ -0,0 +1,158 @@
+import { useEffect, useState } from 'react'
+import { decode_polyline } from './routes'
+
+const LIVE_URL = 'ws://localhost:8000/ws/live'
+const DRIVER_URL = 'ws://localhost:8000/ws/driver'
+// Closed by the server when the handshake's token is missing or not valid for the socket
+const POLICY_VIOLATION = 1008
+
+// Browsers cannot set headers on a websocket, so the session token rides in the subprotocols
+const openSocket = (url) => {
+  const token = localStorage.getItem('session_token')
+  return token ? new WebSocket(url, ['bearer', token]) : new WebSocket(url)
+}
+
+// One socket per tab, shared by every component that listens to a topic
+let socket = null
+let reconnectDelay = 1000
+const listeners = {}
+
+const activeTopics = () => Object.keys(listeners).filter((topic) => listeners[topic].size > 0)
+
+const send = (message) => {
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify(message))
+  }
+}
+
+const connect = () => {
+  socket = openSocket(LIVE_URL)
+
+  socket.onopen = () => {
+    reconnectDelay = 1000
+    send({ action: 'subscribe', topics: activeTopics() })
+  }
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data)
+    listeners[message.topic]?.forEach((handler) => handler(message))
+  }
+
+  socket.onclose = (event) => {
+    socket = null
+    // A refused token stays refused; the next subscribe after logging in again reconnects
+    if (event.code !== POLICY_VIOLATION && activeTopics().length > 0) {
+      // The server sends a fresh snapshot on every subscribe, so nothing is lost while away
+      setTimeout(() => {
+        if (!socket && activeTopics().length > 0) connect()
+      }, reconnectDelay)
+      reconnectDelay = Math.min(reconnectDelay * 2, 30000)
+    }
+  }
+}
+
+export const subscribe_live = (topic, handler) => {
+  if (!listeners[topic]) listeners[topic] = new Set()
+  const isFirst = listeners[topic].size === 0
+  listeners[topic].add(handler)
+
+  if (!socket) {
+    connect()
+  } else if (isFirst) {
+    send({ action: 'subscribe', topics: [topic] })
+  }
+
+  return () => {
+    listeners[topic].delete(handler)
+    if (listeners[topic].size === 0) {
+      send({ action: 'unsubscribe', topics: [topic] })
+    }
+    if (activeTopics().length === 0 && socket) {
+      socket.close()
+      socket = null
+    }
+  }
+}
+
+export const apply_live_message = (rows, message) => {
+  switch (message.type) {
+    case 'snapshot':
+      return message.data
+    case 'upsert': {
+      const index = rows.findIndex((row) => row.id === message.data.id)
+      if (index === -1) return [...rows, message.data]
+      const next = [...rows]
+      next[index] = { ...rows[index], ...message.data }
+      return next
+    }
+    case 'delete':
+      return rows.filter((row) => row.id !== message.id)
+    case 'positions': {
+      const positions = new Map(message.data.map(([id, lon, lat]) => [id, { lon, lat }]))
+      return rows.map((row) => (positions.has(row.id) ? { ...row, ...positions.get(row.id) } : row))
+    }
+    default:
+      return rows
+  }
+}
+
+// Rows of a table kept up to date by the live channel, plus whether the first snapshot arrived
+export const useLiveTable = (topic) => {
+  const [rows, setRows] = useState([])
+  const [ready, setReady] = useState(false)
+
+  useEffect(() => {
+    if (!topic) return
+    return subscribe_live(topic, (message) => {
+      setRows((current) => apply_live_message(current, message))
+      if (message.type === 'snapshot') setReady(true)
+    })
+  }, [topic])
+
+  return [rows, ready]
+}
+
+// The driver's own mission pushed by /ws/driver: ambulance, incident, hospital and the route
+// still ahead (decoded), then only the ambulance's position until something else changes
+export const useDriverMission = (userId) => {
+  const [mission, setMission] = useState(null)
+  const [ready, setReady] = useState(false)
+
+  useEffect(() => {
+    if (!userId) return
+    let driverSocket = null
+    let closed = false
+    let delay = 1000
+
+    const open = () => {
+      driverSocket = openSocket(`${DRIVER_URL}/${userId}`)
+      driverSocket.onopen = () => {
+        delay = 1000
+      }
+      driverSocket.onmessage = (event) => {
+        const message = JSON.parse(event.data)
+        if (message.type === 'mission') {
+          const data = message.data
+          setMission(data && { ...data, route: data.route ? decode_polyline(data.route) : [] })
+          setReady(true)
+        } else if (message.type === 'position') {
+          setMission((current) => current && { ...current, ambulance: { ...current.ambulance, ...message.data } })
+        }
+      }
+      driverSocket.onclose = (event) => {
+        if (closed || event.code === POLICY_VIOLATION) return
+        // Every connect starts with the full mission, so nothing is lost while away
+        setTimeout(() => !closed && open(), delay)
+        delay = Math.min(delay * 2, 30000)
+      }
+    }
+
+    open()
+    return () => {
+      closed = true
+      driverSocket?.close()
+    }
+  }, [userId])
+
+  return [mission, ready]
+}
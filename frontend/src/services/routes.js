@@ -0,0 +1,82 @@
+import { useEffect, useMemo, useRef, useState } from 'react'
+import { get_incident_routes } from './api'
+
+const routesKey = (incident) => incident.assigned_units.join(',')
+
+// Encoded polyline (Google / ORS format) to [[lon, lat], ...] like the rest of the app
+export const decode_polyline = (encoded, precision = 5) => {
+  const factor = 10 ** precision
+  const points = []
+  let index = 0
+  let lat = 0
+  let lon = 0
+  const next = () => {
+    let result = 0
+    let shift = 0
+    let b
+    do {
+      b = encoded.charCodeAt(index++) - 63
+      result |= (b & 0x1f) << shift
+      shift += 5
+    } while (b >= 0x20)
+    return result & 1 ? ~(result >> 1) : result >> 1
+  }
+  while (index < encoded.length) {
+    lat += next()
+    lon += next()
+    points.push([lon / factor, lat / factor])
+  }
+  return points
+}
+
+const decodeRoutes = (routes) =>
+  Object.fromEntries(Object.entries(routes || {}).map(([ambId, route]) => [ambId, route ? decode_polyline(route) : route]))
+
+// Route geometry is not part of the incident rows. It is fetched for the incidents that
+// have units on the way and attached to them, again only when their assigned units change.
+export const useIncidentRoutes = (incidents) => {
+  const [routes, setRoutes] = useState({})
+  const requested = useRef({})
+
+  const active = incidents.filter(
+    (incident) => incident.status !== 'Resolved' && incident.assigned_units?.length > 0,
+  )
+  const activeKey = active.map((incident) => `${incident.id}:${routesKey(incident)}`).join('|')
+
+  useEffect(() => {
+    const wanted = new Set(active.map((incident) => incident.id))
+    setRoutes((current) => {
+      const kept = Object.fromEntries(Object.entries(current).filter(([id]) => wanted.has(Number(id))))
+      return Object.keys(kept).length === Object.keys(current).length ? current : kept
+    })
+
+    active.forEach((incident) => {
+      const key = routesKey(incident)
+      if (requested.current[incident.id] === key) return
+      requested.current[incident.id] = key
+      get_incident_routes(incident.id, { format: 'encoded' })
+        .then(({ route_to_incident, route_to_hospital }) => {
+          if (requested.current[incident.id] !== key) return
+          setRoutes((current) => ({
+            ...current,
+            [incident.id]: {
+              route_to_incident: decodeRoutes(route_to_incident),
+              route_to_hospital: decodeRoutes(route_to_hospital),
+            },
+          }))
+        })
+        .catch((error) => {
+          delete requested.current[incident.id]
+          console.error(`Error fetching routes of incident ${incident.id}:`, error)
+        })
+    })
+    Object.keys(requested.current).forEach((id) => {
+      if (!wanted.has(Number(id))) delete requested.current[id]
+    })
+  }, [activeKey])
+
+  return useMemo(
+    () => incidents.map((incident) => (routes[incident.id] ? { ...incident, ...routes[incident.id] } : incident)),
+    [incidents, routes],
+  )
+}